@@ -0,0 +1,152 @@
+#! usr/bin/env python3
+
+'''
+This module classifies the reviews in steam_reviews with a model from the model registry.
+Only reviews with classified=0 are read, a chunk at a time in id order. Each chunk is
+vectorized and predicted in one call, then its predictions are written to review_predictions,
+and its reviews marked as classified, in one transaction.
+Because finished chunks are marked as they go, a stopped job continues where it left off,
+and running it again only classifies reviews that have been added since.
+The id range can be split between processes, which each classify their own part.
+Texts the same model has classified before take their prediction from the prediction cache.
+'''
+
+import datetime
+from multiprocessing import Pool
+
+import numpy as np
+
+from application import database_manager, model_registry, prediction_cache, profiler
+
+
+def predict_with_confidence(classifier, vectors):
+    '''
+    Returns the predicted classes and how confident the classifier is in each.
+    Classifiers without predict_proba, like LinearSVC, give a decision function instead,
+    which is squashed to a confidence between 0.5 and 1.
+    '''
+
+    if hasattr(classifier, 'predict_proba'):
+        probabilities = classifier.predict_proba(vectors)
+        predictions = classifier.classes_[np.argmax(probabilities, axis=1)]
+        confidences = np.max(probabilities, axis=1)
+        return predictions, confidences
+
+    predictions = classifier.predict(vectors)
+    decisions = classifier.decision_function(vectors)
+    if decisions.ndim > 1:
+        decisions = np.max(decisions, axis=1)
+    confidences = 1 / (1 + np.exp(-np.abs(decisions)))
+    return predictions, confidences
+
+
+def predict_with_cache(cache, vectorizer, classifier, model_version, documents):
+    '''
+    Like predict_with_confidence, but from the documents rather than vectors. Documents whose
+    text is in the cache, or repeated in the batch, aren't vectorized or predicted again.
+    '''
+
+    normalize = prediction_cache.keys_normalized_text(vectorizer)
+    text_hashes = [prediction_cache.text_key(document, normalize) for document in documents]
+    cached = cache.lookup(model_version, list(set(text_hashes)))
+
+    # The first document with each text that isn't cached
+    documents_to_predict = {}
+    for text_hash, document in zip(text_hashes, documents):
+        if text_hash not in cached and text_hash not in documents_to_predict:
+            documents_to_predict[text_hash] = document
+    cache.hits += len(documents) - len(documents_to_predict)
+    cache.misses += len(documents_to_predict)
+
+    if documents_to_predict:
+        with profiler.phase('vectorize'):
+            vectors = vectorizer.transform(list(documents_to_predict.values()))
+        with profiler.phase('predict'):
+            new_predictions, new_confidences = predict_with_confidence(classifier, vectors)
+        predicted = {text_hash: (str(prediction), float(confidence)) for text_hash, prediction, confidence
+                     in zip(documents_to_predict, new_predictions, new_confidences)}
+        cache.store(model_version, predicted)
+        cached.update(predicted)
+
+    predictions = [cached[text_hash][0] for text_hash in text_hashes]
+    confidences = [cached[text_hash][1] for text_hash in text_hashes]
+    return predictions, confidences
+
+
+def classify_chunk(db_location, vectorizer, classifier, model_version, rows, cache=None):
+    '''
+    Takes a chunk of (id, user_review_text) rows, predicts them all at once and saves the predictions.
+    If a PredictionCache is given, it's checked before vectorizing.
+    '''
+
+    review_ids = [row[0] for row in rows]
+    documents = [row[1] for row in rows]
+
+    if cache is not None:
+        predictions, confidences = predict_with_cache(cache, vectorizer, classifier, model_version, documents)
+    else:
+        with profiler.phase('vectorize'):
+            vectors = vectorizer.transform(documents)
+        with profiler.phase('predict'):
+            predictions, confidences = predict_with_confidence(classifier, vectors)
+
+    date_classified = str(datetime.datetime.now())
+    prediction_rows = [(review_id, str(prediction), float(confidence), model_version, date_classified)
+                       for review_id, prediction, confidence in zip(review_ids, predictions, confidences)]
+    database_manager.insert_review_predictions(db_location, prediction_rows)
+
+    return len(prediction_rows)
+
+
+def classify_range(db_location, start_id, end_id, chunk_size=1000, version=None,
+                   registry_location=model_registry.REGISTRY_LOCATION, use_cache=True):
+    '''
+    Classifies the unclassified reviews with ids from start_id to end_id, inclusive.
+    The model is loaded here, rather than passed in, so each process maps it in itself.
+    Each process has its own cache in memory, and they share the one in the db.
+    '''
+
+    vectorizer, classifier, metadata = model_registry.load_model(version, registry_location)
+    cache = prediction_cache.PredictionCache(db_location) if use_cache else None
+
+    reviews_classified = 0
+    for rows in database_manager.stream_unclassified_steam_reviews(db_location, chunk_size, start_id - 1, end_id):
+        reviews_classified += classify_chunk(db_location, vectorizer, classifier, metadata['version'], rows, cache)
+
+    if cache is not None:
+        print('Reviews %s to %s: %s' %(start_id, end_id, cache.summary_line()))
+    return reviews_classified
+
+
+def classify_data(db_location, chunk_size=1000, workers=1, version=None,
+                  registry_location=model_registry.REGISTRY_LOCATION, use_cache=True):
+    '''
+    The controlling function for classifying the stored reviews. The promoted model is used
+    unless a version is given. Unless use_cache is False, texts that have been classified by the
+    same model before take their prediction from the prediction cache.
+    Accessed from run_app.py
+    '''
+
+    database_manager.create_steam_reviews(db_location)
+    database_manager.create_review_predictions(db_location)
+
+    first_id, last_id = database_manager.retrieve_unclassified_id_range(db_location)
+    if first_id is None:
+        print('There are no unclassified reviews')
+        return 0
+
+    # Every process must use the same model, even if another is promoted while this runs
+    version = model_registry.resolve_version(version, registry_location)
+
+    id_ranges = database_manager.split_id_range(first_id, last_id, workers)
+    jobs = [(db_location, start_id, end_id, chunk_size, version, registry_location, use_cache)
+            for start_id, end_id in id_ranges]
+
+    if workers == 1:
+        reviews_classified = sum(classify_range(*job) for job in jobs)
+    else:
+        with Pool(workers) as pool:
+            reviews_classified = sum(pool.starmap(classify_range, jobs))
+
+    print('Classified %s reviews' %(reviews_classified))
+    return reviews_classified
@@ -0,0 +1,180 @@
+#! usr/bin/env python3
+
+'''
+This module scores the classifiers with k-fold cross-validation, rather than one fixed
+holdout, so the accuracies come with how much they vary between folds.
+
+The reviews are split into stratified folds once, so every fold has the same share of each
+class. Each fold's training and test reviews are vectorized once, in parallel, and the
+vectors are kept for every classifier. Then every (classifier, fold) pair is fitted and
+scored in parallel across a process pool. joblib maps the cached vectors into the workers'
+memory rather than copying them to each one. With a core for each pair, the whole run takes
+about as long as vectorizing and fitting once.
+
+Given a registered vectorizer's version, the reviews' vectors are read from the feature store
+instead, and every fold uses that vectorizer, so it's the classifiers that are scored on it.
+'''
+
+import time
+
+import numpy as np
+from joblib import Parallel, delayed
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.model_selection import StratifiedKFold
+
+from archive import data_prep, train_classify_data
+from application import feature_store, model_registry
+from application.text_normalizer import PRETOKENIZED_VECTORIZER_PARAMS
+
+DEFAULT_CLASSIFIERS = ('mnb', 'linear_svc', 'logistic_regression')
+
+
+def make_folds(classes, n_folds=5, seed=0):
+    '''
+    Returns the training and test indices of each fold. The reviews are shuffled first,
+    since they come out of the db sorted by class.
+    '''
+
+    splitter = StratifiedKFold(n_splits=n_folds, shuffle=True, random_state=seed)
+    return list(splitter.split(np.zeros(len(classes)), classes))
+
+
+def vectorize_fold(documents, training_indices, testing_indices, vectorizer_params):
+    '''
+    Fits a vectorizer on the fold's training reviews. Returns the training and test vectors,
+    and how long it took. This runs in the worker processes.
+    '''
+
+    started = time.perf_counter()
+    vectorizer = TfidfVectorizer(**vectorizer_params)
+    training_vectors = vectorizer.fit_transform([documents[index] for index in training_indices])
+    test_vectors = vectorizer.transform([documents[index] for index in testing_indices])
+    return training_vectors, test_vectors, time.perf_counter() - started
+
+
+def slice_fold(vectors, training_indices, testing_indices):
+    '''
+    Takes the fold's rows out of vectors that were made already. Returns them like vectorize_fold.
+    '''
+
+    started = time.perf_counter()
+    return vectors[training_indices], vectors[testing_indices], time.perf_counter() - started
+
+
+def fit_and_predict(classifier_name, training_vectors, training_classes, test_vectors, testing_classes):
+    '''
+    Fits one classifier on one fold. Returns its accuracy as a percentage, and the seconds
+    taken to fit and to predict. This runs in the worker processes.
+    '''
+
+    trainer = dict(train_classify_data.CLASSIFIER_TRAINERS)[classifier_name]
+
+    fit_started = time.perf_counter()
+    classifier = trainer(training_vectors, training_classes)
+    fit_seconds = time.perf_counter() - fit_started
+
+    predict_started = time.perf_counter()
+    predictions = classifier.predict(test_vectors)
+    predict_seconds = time.perf_counter() - predict_started
+
+    accuracy = np.mean(predictions == testing_classes) * 100
+    return accuracy, fit_seconds, predict_seconds
+
+
+def cross_validate(documents, classes, classifier_names=DEFAULT_CLASSIFIERS, n_folds=5, n_jobs=-1, seed=0, vectors=None,
+                   **vectorizer_params):
+    '''
+    Scores each classifier on each fold. Returns a dict with the seconds each fold took to
+    vectorize, and for each classifier, its accuracy, fit and predict seconds on each fold.
+    If vectors are given, a row for each document, the folds are sliced out of them rather than vectorized.
+    '''
+
+    unknown_names = set(classifier_names) - set(dict(train_classify_data.CLASSIFIER_TRAINERS))
+    if unknown_names:
+        raise ValueError('Unknown classifiers: %s' %(', '.join(sorted(unknown_names))))
+
+    classes = np.asarray(classes)
+    folds = make_folds(classes, n_folds, seed)
+
+    started = time.perf_counter()
+    with Parallel(n_jobs=n_jobs) as parallel:
+        if vectors is None:
+            fold_vectors = parallel(delayed(vectorize_fold)(documents, training_indices, testing_indices, vectorizer_params)
+                                    for training_indices, testing_indices in folds)
+        else:
+            fold_vectors = [slice_fold(vectors, training_indices, testing_indices) for training_indices, testing_indices in folds]
+
+        pairs = [(name, fold) for name in classifier_names for fold in range(n_folds)]
+        scores = parallel(delayed(fit_and_predict)(name, fold_vectors[fold][0], classes[folds[fold][0]],
+                                                   fold_vectors[fold][1], classes[folds[fold][1]])
+                          for name, fold in pairs)
+
+    results = {
+        'n_reviews': len(documents),
+        'n_folds': n_folds,
+        'seconds': time.perf_counter() - started,
+        'vectorize_seconds': [seconds for _training_vectors, _test_vectors, seconds in fold_vectors],
+        'classifiers': {name: {'accuracies': [], 'fit_seconds': [], 'predict_seconds': []} for name in classifier_names},
+    }
+    for (name, _fold), (accuracy, fit_seconds, predict_seconds) in zip(pairs, scores):
+        results['classifiers'][name]['accuracies'].append(accuracy)
+        results['classifiers'][name]['fit_seconds'].append(fit_seconds)
+        results['classifiers'][name]['predict_seconds'].append(predict_seconds)
+
+    for result in results['classifiers'].values():
+        result['mean_accuracy'] = float(np.mean(result['accuracies']))
+        result['std_accuracy'] = float(np.std(result['accuracies']))
+
+    return results
+
+
+def cross_validation_summary(results):
+    serial_seconds = sum(results['vectorize_seconds']) + sum(sum(result['fit_seconds']) + sum(result['predict_seconds'])
+                                                             for result in results['classifiers'].values())
+    lines = ['%s-fold cross-validation of %s reviews took %.1fs, for %.1fs of vectorizing, fitting and predicting added up' %(
+        results['n_folds'], results['n_reviews'], results['seconds'], serial_seconds)]
+    for name, result in results['classifiers'].items():
+        lines.append('%s: %.1f%% +/- %.1f, fit %.2fs and predict %.3fs per fold on average' %(
+            name, result['mean_accuracy'], result['std_accuracy'], np.mean(result['fit_seconds']),
+            np.mean(result['predict_seconds'])))
+
+    lines.append('fold, vectorize seconds, %s' %(', '.join('%s %% (fit, predict seconds)' %(name)
+                                                         for name in results['classifiers'])))
+    for fold in range(results['n_folds']):
+        fold_results = ', '.join('%.1f (%.2fs, %.3fs)' %(result['accuracies'][fold], result['fit_seconds'][fold],
+                                                          result['predict_seconds'][fold])
+                                 for result in results['classifiers'].values())
+        lines.append('%s, %.2fs, %s' %(fold + 1, results['vectorize_seconds'][fold], fold_results))
+
+    return '\n'.join(lines)
+
+
+def run_cross_validation(db_location, reviews_to_retrieve=5000, n_folds=5, classifier_names=None, n_jobs=-1,
+                         normalized=False, vectorizer_version=None, store_location=feature_store.FEATURE_STORE_LOCATION,
+                         registry_location=model_registry.REGISTRY_LOCATION):
+    '''
+    The controlling function for cross-validation. Takes a balanced set of reviews the same
+    way classify_reviews does, and returns the summary.
+    With a vectorizer_version, the reviews not in the feature store yet are vectorized into it, and
+    the vectors are read from there.
+    Accessed from run_app.py
+    '''
+
+    recommended_reviews, not_recommended_reviews = data_prep.retrieve_review_batches_balanced(db_location, reviews_to_retrieve,
+                                                                                             normalized)
+    reviews = recommended_reviews + not_recommended_reviews
+    documents, classes, review_ids = reviews.texts, reviews.classes(), reviews.ids
+    del recommended_reviews, not_recommended_reviews, reviews
+
+    vectors = None
+    if vectorizer_version is not None:
+        meta = feature_store.vectorize_to_store(db_location, vectorizer_version, store_location=store_location,
+                                                registry_location=registry_location)
+        stored_matrix = feature_store.open_matrix(store_location, meta['corpus_snapshot'], meta['vectorizer_version'],
+                                                  meta['last_row_id'])
+        vectors = feature_store.read_rows(stored_matrix, review_ids)
+
+    vectorizer_params = PRETOKENIZED_VECTORIZER_PARAMS if normalized else {}
+    results = cross_validate(documents, classes, classifier_names or DEFAULT_CLASSIFIERS, n_folds, n_jobs, vectors=vectors,
+                             **vectorizer_params)
+    return cross_validation_summary(results)
@@ -0,0 +1,196 @@
+#! usr/bin/env python3
+
+'''
+This module runs the scraper and classifier together in one long-running process, for the
+daemon command, so new reviews are classified soon after they're scraped, without cron
+jobs starting classify_data from cold each time.
+
+The promoted model is loaded once and kept in memory. It's only loaded again when another
+version is promoted. A scheduler picks the next task each time round:
+
+- classify a chunk, when the backlog of unclassified reviews is over backlog_high, so
+  classifying catches up before more reviews are scraped
+- scrape the next app, when the scraper's fetch controller is ready for the next request
+- classify a chunk, when there's a full chunk waiting, or classify_interval has passed
+  with some reviews waiting
+- otherwise wait until the next page is due
+
+Classifying only fills the time between pages until the backlog gets too big, so scraping
+keeps its pace unless classifying falls behind. The pace starts at one page every
+scrape_interval seconds, and the controller speeds it up or backs it off from Steam's responses.
+'''
+
+import time
+
+import requests
+
+from application import (classify_data, database_manager, fetch_controller, model_registry, prediction_cache, scraper,
+                         tfidf_statistics)
+
+
+def choose_task(backlog, seconds_until_scrape, seconds_since_classify, model_ready, classify_chunk_size,
+                backlog_high, classify_interval):
+    '''
+    Returns 'classify', 'scrape' or 'wait'. seconds_until_scrape is None when scraping is off.
+    '''
+
+    can_classify = model_ready and backlog > 0
+    if can_classify and backlog >= backlog_high:
+        return 'classify'
+    if seconds_until_scrape is not None and seconds_until_scrape <= 0:
+        return 'scrape'
+    if can_classify and (backlog >= classify_chunk_size or seconds_since_classify >= classify_interval):
+        return 'classify'
+    return 'wait'
+
+
+class ReviewDaemon:
+    '''
+    Keeps the model, the next app to scrape and the counts between tasks.
+    scrape_interval is the seconds between pages to start with, or None to only classify.
+    '''
+
+    def __init__(self, db_location, scrape_interval=scraper.SLEEP_TIME_BETWEEN_REQUESTS, classify_chunk_size=1000,
+                 backlog_high=5000, classify_interval=60, version=None,
+                 registry_location=model_registry.REGISTRY_LOCATION, base_url=scraper.STEAM_BASE_URL):
+        self.db_location = db_location
+        self.scrape_interval = scrape_interval
+        self.classify_chunk_size = classify_chunk_size
+        self.backlog_high = backlog_high
+        self.classify_interval = classify_interval
+        self.version = version
+        self.registry_location = registry_location
+        self.base_url = base_url
+
+        self.model = None
+        self.model_version = None
+        self.models_loaded = 0
+        self.last_model_check = None
+        self.controller = None
+        if scrape_interval is not None:
+            self.controller = fetch_controller.AimdController(initial_rate=1 / scrape_interval,
+                                                              max_rate=max(scraper.MAX_REQUESTS_PER_SECOND, 1 / scrape_interval))
+        self.last_classify = time.monotonic()
+        self.counts = {'pages_scraped': 0, 'reviews_scraped': 0, 'scrape_errors': 0, 'reviews_classified': 0}
+        self.pages_since_statistics = 0
+        self.cache = prediction_cache.PredictionCache(db_location)
+
+        database_manager.create_steam_reviews(db_location)
+        database_manager.create_review_predictions(db_location)
+        self.app_num = scraper.next_app_num(db_location)
+
+    def refresh_model(self):
+        '''
+        Loads the model if it isn't loaded, or if another version has been promoted since.
+        The registry index is only read every classify_interval seconds.
+        '''
+
+        now = time.monotonic()
+        if self.last_model_check is not None and now - self.last_model_check < self.classify_interval:
+            return
+        self.last_model_check = now
+
+        try:
+            version = model_registry.resolve_version(self.version, self.registry_location)
+        except ValueError as error:
+            if self.model is None:
+                print('%s, only scraping until a model is promoted' %(error))
+            return
+
+        if version != self.model_version:
+            vectorizer, classifier, metadata = model_registry.load_model(version, self.registry_location)
+            self.model = (vectorizer, classifier)
+            self.model_version = metadata['version']
+            self.models_loaded += 1
+            print('Classifying with model %s' %(self.model_version))
+
+    def scrape(self):
+        try:
+            reviews_found = scraper.scrape_reviews_for_app(self.db_location, self.app_num, self.base_url, self.controller)
+        except requests.RequestException as error:
+            # The app is skipped after its retries, like a page without reviews, rather than stopping the daemon
+            print('Could not scrape app number %s: %s' %(self.app_num, error))
+            self.counts['scrape_errors'] += 1
+            reviews_found = 0
+
+        self.counts['pages_scraped'] += 1
+        self.counts['reviews_scraped'] += reviews_found
+        self.app_num += scraper.SCRAPER_INCREMENT
+
+        if reviews_found:
+            self.pages_since_statistics += 1
+        if self.pages_since_statistics >= scraper.STATISTICS_UPDATE_PAGES:
+            self.update_statistics()
+
+    def update_statistics(self):
+        tfidf_statistics.update_tfidf_statistics(self.db_location)
+        self.pages_since_statistics = 0
+
+    def classify(self):
+        self.last_classify = time.monotonic()
+        vectorizer, classifier = self.model
+        # One chunk at a time, so scraping gets a turn between chunks
+        rows = next(database_manager.stream_unclassified_steam_reviews(self.db_location, self.classify_chunk_size), None)
+        if rows:
+            reviews_classified = classify_data.classify_chunk(self.db_location, vectorizer, classifier,
+                                                              self.model_version, rows, self.cache)
+            self.counts['reviews_classified'] += reviews_classified
+            print('Classified %s reviews with model %s' %(reviews_classified, self.model_version))
+
+    def run_task(self):
+        '''
+        Picks and runs the next task, and returns its name.
+        '''
+
+        self.refresh_model()
+        now = time.monotonic()
+        backlog = database_manager.count_unclassified_steam_reviews(self.db_location)
+        seconds_until_scrape = None if self.controller is None else self.controller.seconds_until_ready()
+
+        task = choose_task(backlog, seconds_until_scrape, now - self.last_classify, self.model is not None,
+                           self.classify_chunk_size, self.backlog_high, self.classify_interval)
+
+        if task == 'classify':
+            self.classify()
+        elif task == 'scrape':
+            self.scrape()
+        else:
+            # Until the next page is due, or the waiting reviews are due to be classified
+            waits = [self.classify_interval]
+            if seconds_until_scrape is not None:
+                waits.append(seconds_until_scrape)
+            if self.model is not None and backlog > 0:
+                waits.append(self.last_classify + self.classify_interval - now)
+            time.sleep(max(min(waits), 0.01))
+
+        return task
+
+    def run(self, max_tasks=None):
+        '''
+        Runs tasks until it's stopped with ctrl+c, or max_tasks have been run. Returns the counts.
+        '''
+
+        tasks_run = 0
+        try:
+            while max_tasks is None or tasks_run < max_tasks:
+                self.run_task()
+                tasks_run += 1
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if self.pages_since_statistics:
+                self.update_statistics()
+
+        return self.counts
+
+
+def run_daemon(db_location, scrape_interval=scraper.SLEEP_TIME_BETWEEN_REQUESTS, classify_interval=60):
+    '''
+    Accessed from run_app.py
+    '''
+
+    review_daemon = ReviewDaemon(db_location, scrape_interval=scrape_interval, classify_interval=classify_interval)
+    counts = review_daemon.run()
+    return 'Scraped %s reviews from %s pages (%s errors), classified %s reviews\n%s' %(
+        counts['reviews_scraped'], counts['pages_scraped'], counts['scrape_errors'], counts['reviews_classified'],
+        review_daemon.cache.summary_line())
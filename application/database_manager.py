@@ -4,8 +4,21 @@
 This module handles the interaction between the database and the rest of this program.
 '''
 
+import math
 import sqlite3
 
+from application import profiler, review_records
+
+# Reviews are counted in 100 character buckets, with everything over 2000 in the last one
+REVIEW_LENGTH_BUCKET = 100
+REVIEW_LENGTH_BUCKETS = 20
+
+STEAM_REVIEWS_COLUMNS = review_records.STEAM_REVIEWS_COLUMNS
+
+# Tables keyed by the review id. Once steam_reviews is dropped its ids start again from 1, so
+# these are cleared with it, or their rows would belong to the new reviews with the same ids
+REVIEW_ID_TABLES = ('steam_review_tokens', 'review_predictions', 'review_minhashes', 'review_lsh_bands', 'review_near_duplicates')
+
 def create_steam_reviews(d_base_location):
     with sqlite3.connect(d_base_location, timeout=20) as d_base:
         cur = d_base.cursor()
@@ -13,12 +26,173 @@ def create_steam_reviews(d_base_location):
         url TEXT, app_num INTEGER, date_scraped TEXT, classified INTEGER,
         user_recommendation TEXT, user_review_text TEXT, user_name TEXT);'''
         cur.execute(query)
+        cur.execute('CREATE INDEX IF NOT EXISTS steam_reviews_classified ON steam_reviews (classified, id);')
+        create_review_summaries(d_base)
+
+def table_exists(cur, table_name):
+    cur.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?;", (table_name,))
+    return cur.fetchone() is not None
+
+def trigger_exists(cur, trigger_name):
+    cur.execute("SELECT 1 FROM sqlite_master WHERE type='trigger' AND name=?;", (trigger_name,))
+    return cur.fetchone() is not None
+
+def create_review_summaries(d_base):
+    '''
+    The report tables counting reviews by app, by day scraped and by length. Triggers keep
+    them up to date as reviews are inserted and deleted, so a report never scans steam_reviews.
+    Triggers are dropped with steam_reviews, so when they're missing, they're made again and
+    the counts are rebuilt with a scan, once.
+    '''
+
+    cur = d_base.cursor()
+    cur.execute('''CREATE TABLE IF NOT EXISTS report_app_counts (app_num INTEGER, user_recommendation TEXT,
+    review_count INTEGER, total_length INTEGER, PRIMARY KEY (app_num, user_recommendation));''')
+    cur.execute('''CREATE TABLE IF NOT EXISTS report_daily_counts (day TEXT, user_recommendation TEXT,
+    review_count INTEGER, PRIMARY KEY (day, user_recommendation));''')
+    cur.execute('''CREATE TABLE IF NOT EXISTS report_length_counts (length_bucket INTEGER, user_recommendation TEXT,
+    review_count INTEGER, PRIMARY KEY (length_bucket, user_recommendation));''')
+
+    if trigger_exists(cur, 'steam_reviews_report_insert'):
+        return
+
+    length_bucket = 'MIN(LENGTH(%%s.user_review_text) / %s, %s) * %s' %(REVIEW_LENGTH_BUCKET, REVIEW_LENGTH_BUCKETS,
+                                                                       REVIEW_LENGTH_BUCKET)
+    cur.execute('''CREATE TRIGGER steam_reviews_report_insert AFTER INSERT ON steam_reviews BEGIN
+    INSERT OR IGNORE INTO report_app_counts VALUES (NEW.app_num, NEW.user_recommendation, 0, 0);
+    UPDATE report_app_counts SET review_count = review_count + 1, total_length = total_length + LENGTH(NEW.user_review_text)
+    WHERE app_num = NEW.app_num AND user_recommendation = NEW.user_recommendation;
+    INSERT OR IGNORE INTO report_daily_counts VALUES (SUBSTR(NEW.date_scraped, 1, 10), NEW.user_recommendation, 0);
+    UPDATE report_daily_counts SET review_count = review_count + 1
+    WHERE day = SUBSTR(NEW.date_scraped, 1, 10) AND user_recommendation = NEW.user_recommendation;
+    INSERT OR IGNORE INTO report_length_counts VALUES (%s, NEW.user_recommendation, 0);
+    UPDATE report_length_counts SET review_count = review_count + 1
+    WHERE length_bucket = %s AND user_recommendation = NEW.user_recommendation;
+    END;''' %(length_bucket %('NEW'), length_bucket %('NEW')))
+    cur.execute('''CREATE TRIGGER steam_reviews_report_delete AFTER DELETE ON steam_reviews BEGIN
+    UPDATE report_app_counts SET review_count = review_count - 1, total_length = total_length - LENGTH(OLD.user_review_text)
+    WHERE app_num = OLD.app_num AND user_recommendation = OLD.user_recommendation;
+    UPDATE report_daily_counts SET review_count = review_count - 1
+    WHERE day = SUBSTR(OLD.date_scraped, 1, 10) AND user_recommendation = OLD.user_recommendation;
+    UPDATE report_length_counts SET review_count = review_count - 1
+    WHERE length_bucket = %s AND user_recommendation = OLD.user_recommendation;
+    END;''' %(length_bucket %('OLD')))
+
+    cur.execute('DELETE FROM report_app_counts;')
+    cur.execute('DELETE FROM report_daily_counts;')
+    cur.execute('DELETE FROM report_length_counts;')
+    cur.execute('''INSERT INTO report_app_counts SELECT app_num, user_recommendation, COUNT(*), SUM(LENGTH(user_review_text))
+    FROM steam_reviews GROUP BY app_num, user_recommendation;''')
+    cur.execute('''INSERT INTO report_daily_counts SELECT SUBSTR(date_scraped, 1, 10), user_recommendation, COUNT(*)
+    FROM steam_reviews GROUP BY 1, user_recommendation;''')
+    cur.execute('''INSERT INTO report_length_counts SELECT %s, user_recommendation, COUNT(*)
+    FROM steam_reviews GROUP BY 1, user_recommendation;''' %(length_bucket %('steam_reviews')))
+    d_base.commit()
+
+def create_classification_summaries(d_base):
+    '''
+    The report table counting predictions by model version, day classified, the review's own
+    recommendation and the predicted label, which gives each model's accuracy over time.
+    insert_review_predictions uses INSERT OR REPLACE, which doesn't fire delete triggers,
+    so a prediction being replaced is taken off its count before the insert.
+    '''
+
+    cur = d_base.cursor()
+    cur.execute('''CREATE TABLE IF NOT EXISTS report_classification_counts (model_version TEXT, day TEXT,
+    user_recommendation TEXT, predicted_label TEXT, review_count INTEGER,
+    PRIMARY KEY (model_version, day, user_recommendation, predicted_label));''')
+
+    if trigger_exists(cur, 'review_predictions_report_insert'):
+        return
+
+    prediction_key = '''(model_version, day, user_recommendation, predicted_label) IN
+    (SELECT review_predictions.model_version, SUBSTR(review_predictions.date_classified, 1, 10),
+    steam_reviews.user_recommendation, review_predictions.predicted_label
+    FROM review_predictions JOIN steam_reviews ON steam_reviews.id = review_predictions.review_id
+    WHERE review_predictions.review_id = %s.review_id)'''
+    cur.execute('''CREATE TRIGGER review_predictions_report_replace BEFORE INSERT ON review_predictions BEGIN
+    UPDATE report_classification_counts SET review_count = review_count - 1 WHERE %s;
+    END;''' %(prediction_key %('NEW')))
+    cur.execute('''CREATE TRIGGER review_predictions_report_insert AFTER INSERT ON review_predictions BEGIN
+    INSERT OR IGNORE INTO report_classification_counts SELECT NEW.model_version, SUBSTR(NEW.date_classified, 1, 10),
+    user_recommendation, NEW.predicted_label, 0 FROM steam_reviews WHERE id = NEW.review_id;
+    UPDATE report_classification_counts SET review_count = review_count + 1 WHERE %s;
+    END;''' %(prediction_key %('NEW')))
+    cur.execute('''CREATE TRIGGER review_predictions_report_delete BEFORE DELETE ON review_predictions BEGIN
+    UPDATE report_classification_counts SET review_count = review_count - 1 WHERE %s;
+    END;''' %(prediction_key %('OLD')))
+
+    cur.execute('DELETE FROM report_classification_counts;')
+    cur.execute('''INSERT INTO report_classification_counts SELECT review_predictions.model_version,
+    SUBSTR(review_predictions.date_classified, 1, 10), steam_reviews.user_recommendation,
+    review_predictions.predicted_label, COUNT(*)
+    FROM review_predictions JOIN steam_reviews ON steam_reviews.id = review_predictions.review_id
+    GROUP BY 1, 2, 3, 4;''')
+    d_base.commit()
+
+def retrieve_report_app_counts(d_base_location):
+    '''
+    Returns (app_num, user_recommendation, review_count, mean_length) rows from the report table.
+    '''
+
+    with sqlite3.connect(d_base_location, timeout=20) as d_base:
+        cur = d_base.cursor()
+        cur.execute('''SELECT app_num, user_recommendation, review_count, ROUND(1.0 * total_length / review_count, 1)
+        FROM report_app_counts WHERE review_count > 0 ORDER BY app_num, user_recommendation;''')
+        return cur.fetchall()
+
+def retrieve_report_daily_counts(d_base_location):
+    '''
+    Returns (day, user_recommendation, review_count) rows from the report table.
+    '''
+
+    with sqlite3.connect(d_base_location, timeout=20) as d_base:
+        cur = d_base.cursor()
+        cur.execute('''SELECT day, user_recommendation, review_count FROM report_daily_counts
+        WHERE review_count > 0 ORDER BY day, user_recommendation;''')
+        return cur.fetchall()
+
+def retrieve_report_length_counts(d_base_location):
+    '''
+    Returns (length_bucket, user_recommendation, review_count) rows from the report table.
+    '''
+
+    with sqlite3.connect(d_base_location, timeout=20) as d_base:
+        cur = d_base.cursor()
+        cur.execute('''SELECT length_bucket, user_recommendation, review_count FROM report_length_counts
+        WHERE review_count > 0 ORDER BY length_bucket, user_recommendation;''')
+        return cur.fetchall()
+
+def retrieve_report_classification_accuracy(d_base_location):
+    '''
+    Returns (model_version, day, reviews_classified, reviews_correct) rows from the report table.
+    '''
+
+    with sqlite3.connect(d_base_location, timeout=20) as d_base:
+        cur = d_base.cursor()
+        cur.execute('''SELECT model_version, day, SUM(review_count),
+        SUM(CASE WHEN user_recommendation = predicted_label THEN review_count ELSE 0 END)
+        FROM report_classification_counts GROUP BY model_version, day HAVING SUM(review_count) > 0
+        ORDER BY day, model_version;''')
+        return cur.fetchall()
 
 def drop_steam_reviews(d_base_location):
+    '''
+    Drops steam_reviews and clears the REVIEW_ID_TABLES, keeping their tables for the next reviews.
+    The TF-IDF statistics were counted from the dropped reviews, so they're started again from nothing.
+    '''
+
     with sqlite3.connect(d_base_location, timeout=20) as d_base:
         cur = d_base.cursor()
+        for table_name in REVIEW_ID_TABLES:
+            if table_exists(cur, table_name):
+                cur.execute('DELETE FROM %s;' %(table_name))
+        if table_exists(cur, 'tfidf_statistics'):
+            cur.execute('DELETE FROM term_document_frequencies;')
+            cur.execute('UPDATE tfidf_statistics SET value = 0;')
         cur.execute('DROP TABLE steam_reviews;')
 
+@profiler.timed('db')
 def insert_data_steam_reviews(d_base_location, url, app_num, date_scraped, classified,
                               user_recommendation, user_review_text, user_name):
     '''
@@ -33,6 +207,20 @@ def insert_data_steam_reviews(d_base_location, url, app_num, date_scraped, class
         cur.execute(query, data)
         d_base.commit()
 
+@profiler.timed('db')
+def insert_many_steam_reviews(d_base_location, reviews):
+    '''
+    Takes (url, app_num, date_scraped, classified, user_recommendation, user_review_text, user_name) rows,
+    as a list or any iterable, and inserts them all in one transaction, which is much faster than a commit per review.
+    '''
+
+    with sqlite3.connect(d_base_location, timeout=20) as d_base:
+        cur = d_base.cursor()
+        query = '''INSERT INTO steam_reviews (url, app_num, date_scraped, classified,
+        user_recommendation, user_review_text, user_name) VALUES (?,?,?,?,?,?,?);'''
+        cur.executemany(query, reviews)
+        d_base.commit()
+
 def remove_duplicates_steam_reviews(d_base_location):
     '''
     In theory, we should never need to do this, because the scraper would
@@ -48,28 +236,592 @@ def remove_duplicates_steam_reviews(d_base_location):
         cur.execute(query)
         d_base.commit()
 
-def retrieve_steam_reviews(d_base_location, user_recommendation, classified, review_quantity):
+@profiler.timed('db')
+def retrieve_steam_reviews(d_base_location, user_recommendation, classified, review_quantity,
+                           exclude_near_duplicates=False):
     '''
-    Retrives reviews for classification. Consider adding an argument to retrieve x amount.
+    Retrives reviews for classification, as review_records.ReviewRow. Consider adding an argument to retrieve x amount.
+    If classified is None, reviews are retrieved whether they've been classified or not.
+    If exclude_near_duplicates is True, reviews the near_duplicates module found to be copies are left out.
     '''
 
     with sqlite3.connect(d_base_location, timeout=20) as d_base:
         cur = d_base.cursor()
-        query = '''SELECT * FROM steam_reviews WHERE user_recommendation=? AND classified=?
-        ORDER BY id DESC LIMIT ?;'''
-        data = (user_recommendation, classified, review_quantity)
+        cur.row_factory = review_records.review_row_factory
+        query = '''SELECT * FROM steam_reviews WHERE user_recommendation=? %s %s
+        ORDER BY id DESC LIMIT ?;''' %(classified_condition(classified), near_duplicates_condition('id', exclude_near_duplicates))
+        data = [user_recommendation] + ([] if classified is None else [classified]) + [review_quantity]
         cur.execute(query, data)
         return cur.fetchall()
 
+@profiler.timed('db')
+def retrieve_steam_review_batch(d_base_location, user_recommendation, review_quantity,
+                                exclude_near_duplicates=False, normalized=False):
+    '''
+    The last reviews with this user_recommendation, whether they've been classified or not, but only
+    the columns training needs, read straight into a review_records.ReviewBatch.
+    If normalized is True, the texts are the normalized texts, and reviews that haven't been normalized yet are left out.
+    '''
+
+    text_column = 'user_review_text'
+    join = ''
+    if normalized:
+        text_column = 'steam_review_tokens.normalized_text'
+        join = 'JOIN steam_review_tokens ON steam_review_tokens.review_id = steam_reviews.id'
+
+    with sqlite3.connect(d_base_location, timeout=20) as d_base:
+        cur = d_base.cursor()
+        query = '''SELECT steam_reviews.id, app_num, user_recommendation, %s FROM steam_reviews %s
+        WHERE user_recommendation=? %s
+        ORDER BY steam_reviews.id DESC LIMIT ?;''' %(text_column, join,
+                                                     near_duplicates_condition('steam_reviews.id', exclude_near_duplicates))
+        data = (user_recommendation, review_quantity)
+        cur.execute(query, data)
+        return review_records.ReviewBatch.from_rows(cur)
+
+def classified_condition(classified):
+    '''
+    classify_data marks every review it classifies, so training takes reviews whatever they're marked as, with None.
+    '''
+
+    if classified is None:
+        return ''
+
+    return 'AND classified=?'
+
+def near_duplicates_condition(id_column, exclude_near_duplicates):
+    '''
+    The condition that leaves out near-duplicates: every later copy of a review, and the first
+    copy too when a copy has the opposite recommendation, since then it says nothing about either.
+    '''
+
+    if not exclude_near_duplicates:
+        return ''
+
+    return '''AND %s NOT IN (SELECT review_id FROM review_near_duplicates)
+        AND %s NOT IN (SELECT duplicate_of FROM review_near_duplicates WHERE conflicting=1)''' %(id_column, id_column)
+
+def count_steam_reviews(d_base_location):
+    with sqlite3.connect(d_base_location, timeout=20) as d_base:
+        cur = d_base.cursor()
+        cur.execute('SELECT COUNT(*) FROM steam_reviews;')
+        return cur.fetchone()[0]
+
+@profiler.timed('db')
 def retrieve_last_steam_review(d_base_location):
     '''
-    Gets the last review. Currently used to determine the last scraped review,
+    Gets the last review, as a review_records.ReviewRow. Currently used to determine the last scraped review,
     to continue the scraping.
     '''
 
     with sqlite3.connect(d_base_location, timeout=20) as d_base:
         cur = d_base.cursor()
+        cur.row_factory = review_records.review_row_factory
         query = 'SELECT * FROM steam_reviews ORDER BY id DESC LIMIT 1;'
         cur.execute(query)
         return cur.fetchone()
 
+def stream_steam_reviews(d_base_location, chunk_size, start_id=0, end_id=None):
+    '''
+    Yields lists of rows in id order, chunk_size rows at a time. Each chunk starts after the
+    last id of the chunk before, rather than using OFFSET, so every query is an index seek and
+    only one chunk is held in memory at a time.
+    The rows are plain tuples rather than ReviewRow, since they're read in loops over every
+    review, where a second object for each row adds up. Index them with review_records' column positions.
+    '''
+
+    with sqlite3.connect(d_base_location, timeout=20) as d_base:
+        cur = d_base.cursor()
+        last_id = start_id
+
+        while True:
+            if end_id is None:
+                query = 'SELECT * FROM steam_reviews WHERE id > ? ORDER BY id LIMIT ?;'
+                data = (last_id, chunk_size)
+            else:
+                query = 'SELECT * FROM steam_reviews WHERE id > ? AND id <= ? ORDER BY id LIMIT ?;'
+                data = (last_id, end_id, chunk_size)
+
+            with profiler.phase('db'):
+                cur.execute(query, data)
+                rows = cur.fetchall()
+            if not rows:
+                return
+
+            yield rows
+            last_id = rows[-1][0]
+
+def retrieve_steam_review_text(d_base_location, review_id):
+    '''
+    Returns the user_review_text of the review with this id, or None if there isn't one.
+    '''
+
+    with sqlite3.connect(d_base_location, timeout=20) as d_base:
+        cur = d_base.cursor()
+        cur.execute('SELECT user_review_text FROM steam_reviews WHERE id=?;', (review_id,))
+        row = cur.fetchone()
+        return None if row is None else row[0]
+
+def retrieve_steam_reviews_id_range(d_base_location):
+    '''
+    Returns the first and last ids in steam_reviews, or (None, None) if it's empty.
+    '''
+
+    with sqlite3.connect(d_base_location, timeout=20) as d_base:
+        cur = d_base.cursor()
+        cur.execute('SELECT MIN(id), MAX(id) FROM steam_reviews;')
+        return cur.fetchone()
+
+def split_id_range(first_id, last_id, parts):
+    '''
+    Splits the ids from first_id to last_id into this many ranges, with no gaps or overlaps,
+    so each worker process can stream its own range.
+    '''
+
+    range_size = math.ceil((last_id - first_id + 1) / parts)
+    id_ranges = []
+    for start_id in range(first_id, last_id + 1, range_size):
+        id_ranges.append((start_id, min(start_id + range_size - 1, last_id)))
+
+    return id_ranges
+
+def stream_filtered_steam_reviews(d_base_location, columns, chunk_size, start_id=0, end_id=None, app_range=None,
+                                  date_range=None, user_recommendation=None):
+    '''
+    Like stream_steam_reviews, but only the columns asked for, after the id, and only reviews in the
+    app_range and date_range, which are inclusive (first, last) pairs, with the user_recommendation.
+    Dates are compared by their first 10 characters, so they're given as 2017-01-31.
+    '''
+
+    unknown_columns = [column for column in columns if column not in STEAM_REVIEWS_COLUMNS]
+    if unknown_columns:
+        raise ValueError('steam_reviews has no column %s' %(', '.join(unknown_columns)))
+
+    conditions = ['id > ?']
+    filter_data = []
+    if end_id is not None:
+        conditions.append('id <= ?')
+        filter_data.append(end_id)
+    if app_range is not None:
+        conditions.append('app_num BETWEEN ? AND ?')
+        filter_data.extend(app_range)
+    if date_range is not None:
+        conditions.append('substr(date_scraped, 1, 10) BETWEEN ? AND ?')
+        filter_data.extend(date_range)
+    if user_recommendation is not None:
+        conditions.append('user_recommendation = ?')
+        filter_data.append(user_recommendation)
+
+    # The column names are checked against STEAM_REVIEWS_COLUMNS above, so they're safe to put in the query
+    query = 'SELECT id, %s FROM steam_reviews WHERE %s ORDER BY id LIMIT ?;' %(', '.join(columns), ' AND '.join(conditions))
+
+    with sqlite3.connect(d_base_location, timeout=20) as d_base:
+        cur = d_base.cursor()
+        last_id = start_id
+
+        while True:
+            with profiler.phase('db'):
+                cur.execute(query, [last_id] + filter_data + [chunk_size])
+                rows = cur.fetchall()
+            if not rows:
+                return
+
+            yield rows
+            last_id = rows[-1][0]
+
+def create_review_predictions(d_base_location):
+    '''
+    Predictions are kept in their own table, keyed by the review id, so steam_reviews keeps its columns.
+    '''
+
+    with sqlite3.connect(d_base_location, timeout=20) as d_base:
+        cur = d_base.cursor()
+        query = '''CREATE TABLE IF NOT EXISTS review_predictions (review_id INTEGER PRIMARY KEY,
+        predicted_label TEXT, confidence REAL, model_version TEXT, date_classified TEXT);'''
+        cur.execute(query)
+        create_classification_summaries(d_base)
+
+def retrieve_unclassified_id_range(d_base_location):
+    '''
+    Returns the first and last ids of the reviews that haven't been classified, or (None, None).
+    '''
+
+    with sqlite3.connect(d_base_location, timeout=20) as d_base:
+        cur = d_base.cursor()
+        cur.execute('SELECT MIN(id), MAX(id) FROM steam_reviews WHERE classified=0;')
+        return cur.fetchone()
+
+def count_unclassified_steam_reviews(d_base_location):
+    '''
+    Counts the reviews that haven't been classified, from the steam_reviews_classified index.
+    '''
+
+    with sqlite3.connect(d_base_location, timeout=20) as d_base:
+        cur = d_base.cursor()
+        cur.execute('SELECT COUNT(*) FROM steam_reviews WHERE classified=0;')
+        return cur.fetchone()[0]
+
+def stream_unclassified_steam_reviews(d_base_location, chunk_size, start_id=0, end_id=None):
+    '''
+    Yields lists of (id, user_review_text) for reviews that haven't been classified, in id order.
+    Like stream_steam_reviews, each chunk starts after the last id of the chunk before.
+    '''
+
+    with sqlite3.connect(d_base_location, timeout=20) as d_base:
+        cur = d_base.cursor()
+        last_id = start_id
+
+        while True:
+            if end_id is None:
+                query = '''SELECT id, user_review_text FROM steam_reviews WHERE classified=0 AND id > ?
+                ORDER BY id LIMIT ?;'''
+                data = (last_id, chunk_size)
+            else:
+                query = '''SELECT id, user_review_text FROM steam_reviews WHERE classified=0 AND id > ?
+                AND id <= ? ORDER BY id LIMIT ?;'''
+                data = (last_id, end_id, chunk_size)
+
+            with profiler.phase('db'):
+                cur.execute(query, data)
+                rows = cur.fetchall()
+            if not rows:
+                return
+
+            yield rows
+            last_id = rows[-1][0]
+
+@profiler.timed('db')
+def insert_review_predictions(d_base_location, predictions):
+    '''
+    Takes a list of (review_id, predicted_label, confidence, model_version, date_classified).
+    The predictions are saved and their reviews marked as classified in one transaction,
+    so a stopped job never leaves a review marked without its prediction.
+    '''
+
+    with sqlite3.connect(d_base_location, timeout=20) as d_base:
+        cur = d_base.cursor()
+        query = '''INSERT OR REPLACE INTO review_predictions (review_id, predicted_label, confidence,
+        model_version, date_classified) VALUES (?,?,?,?,?);'''
+        cur.executemany(query, predictions)
+        cur.executemany('UPDATE steam_reviews SET classified=1 WHERE id=?;',
+                        [(prediction[0],) for prediction in predictions])
+        d_base.commit()
+
+def reset_review_predictions(d_base_location):
+    '''
+    Clears every prediction and marks every review as not classified, to classify from scratch.
+    '''
+
+    with sqlite3.connect(d_base_location, timeout=20) as d_base:
+        cur = d_base.cursor()
+        cur.execute('DELETE FROM review_predictions;')
+        cur.execute('UPDATE steam_reviews SET classified=0 WHERE classified=1;')
+        d_base.commit()
+
+def create_prediction_cache(d_base_location):
+    '''
+    Cached predictions are keyed by the model version and a hash of the review text.
+    last_used is when each was last saved or found, so the least recently used go first.
+    '''
+
+    with sqlite3.connect(d_base_location, timeout=20) as d_base:
+        cur = d_base.cursor()
+        cur.execute('''CREATE TABLE IF NOT EXISTS prediction_cache (model_version TEXT, text_hash BLOB,
+        predicted_label TEXT, confidence REAL, last_used REAL, PRIMARY KEY (model_version, text_hash));''')
+        cur.execute('CREATE INDEX IF NOT EXISTS prediction_cache_last_used ON prediction_cache (last_used);')
+
+@profiler.timed('db')
+def retrieve_cached_predictions(d_base_location, model_version, text_hashes, last_used):
+    '''
+    Returns (text_hash, predicted_label, confidence) for each hash that's cached for the model,
+    and marks them as used at last_used.
+    '''
+
+    cached_predictions = []
+    with sqlite3.connect(d_base_location, timeout=20) as d_base:
+        cur = d_base.cursor()
+        # SQLite limits how many values a query can have, so the hashes are looked up 500 at a time
+        for start in range(0, len(text_hashes), 500):
+            hashes_chunk = text_hashes[start:start + 500]
+            query = '''SELECT text_hash, predicted_label, confidence FROM prediction_cache
+            WHERE model_version=? AND text_hash IN (%s);''' %(', '.join('?' * len(hashes_chunk)))
+            cur.execute(query, [model_version] + hashes_chunk)
+            cached_predictions.extend(cur.fetchall())
+
+        cur.executemany('UPDATE prediction_cache SET last_used=? WHERE model_version=? AND text_hash=?;',
+                        [(last_used, model_version, row[0]) for row in cached_predictions])
+        d_base.commit()
+
+    return cached_predictions
+
+@profiler.timed('db')
+def insert_cached_predictions(d_base_location, predictions, max_entries=None):
+    '''
+    Takes a list of (model_version, text_hash, predicted_label, confidence, last_used). If max_entries
+    is given, then deletes the least recently used predictions until there are at most max_entries.
+    Counting them reads the whole index, so the cache only asks for it every so often.
+    '''
+
+    with sqlite3.connect(d_base_location, timeout=20) as d_base:
+        cur = d_base.cursor()
+        cur.executemany('''INSERT OR REPLACE INTO prediction_cache (model_version, text_hash, predicted_label,
+        confidence, last_used) VALUES (?,?,?,?,?);''', predictions)
+        if max_entries is None:
+            d_base.commit()
+            return
+        cur.execute('SELECT COUNT(*) FROM prediction_cache;')
+        entries_over = cur.fetchone()[0] - max_entries
+        if entries_over > 0:
+            cur.execute('''DELETE FROM prediction_cache WHERE rowid IN
+            (SELECT rowid FROM prediction_cache ORDER BY last_used LIMIT ?);''', (entries_over,))
+        d_base.commit()
+
+def create_steam_review_tokens(d_base_location):
+    '''
+    Holds each review's text after normalize_review_text, keyed by the review id, so reviews
+    are only lowercased and tokenized once.
+    '''
+
+    with sqlite3.connect(d_base_location, timeout=20) as d_base:
+        cur = d_base.cursor()
+        query = '''CREATE TABLE IF NOT EXISTS steam_review_tokens (review_id INTEGER PRIMARY KEY,
+        normalized_text TEXT);'''
+        cur.execute(query)
+
+@profiler.timed('db')
+def insert_steam_review_tokens(d_base_location, normalized_reviews):
+    '''
+    Takes a list of (review_id, normalized_text) and saves them in one transaction.
+    '''
+
+    with sqlite3.connect(d_base_location, timeout=20) as d_base:
+        cur = d_base.cursor()
+        query = 'INSERT OR REPLACE INTO steam_review_tokens (review_id, normalized_text) VALUES (?,?);'
+        cur.executemany(query, normalized_reviews)
+        d_base.commit()
+
+def retrieve_last_tokenized_review_id(d_base_location):
+    '''
+    Returns the id of the last review that has been normalized, or 0 if none have.
+    '''
+
+    with sqlite3.connect(d_base_location, timeout=20) as d_base:
+        cur = d_base.cursor()
+        cur.execute('SELECT MAX(review_id) FROM steam_review_tokens;')
+        last_id = cur.fetchone()[0]
+        return last_id if last_id is not None else 0
+
+def stream_untokenized_steam_reviews(d_base_location, chunk_size, start_id=0):
+    '''
+    Yields lists of (id, user_review_text) for reviews that haven't been normalized yet, in id order.
+    '''
+
+    with sqlite3.connect(d_base_location, timeout=20) as d_base:
+        cur = d_base.cursor()
+        last_id = start_id
+
+        while True:
+            query = '''SELECT steam_reviews.id, steam_reviews.user_review_text FROM steam_reviews
+            LEFT JOIN steam_review_tokens ON steam_review_tokens.review_id = steam_reviews.id
+            WHERE steam_review_tokens.review_id IS NULL AND steam_reviews.id > ?
+            ORDER BY steam_reviews.id LIMIT ?;'''
+            with profiler.phase('db'):
+                cur.execute(query, (last_id, chunk_size))
+                rows = cur.fetchall()
+            if not rows:
+                return
+
+            yield rows
+            last_id = rows[-1][0]
+
+def create_tfidf_statistics(d_base_location):
+    '''
+    term_document_frequencies counts the reviews each term is in. tfidf_statistics holds the
+    number of reviews counted and the id of the last review counted.
+    '''
+
+    with sqlite3.connect(d_base_location, timeout=20) as d_base:
+        cur = d_base.cursor()
+        cur.execute('''CREATE TABLE IF NOT EXISTS term_document_frequencies (term TEXT PRIMARY KEY,
+        document_frequency INTEGER);''')
+        cur.execute('CREATE TABLE IF NOT EXISTS tfidf_statistics (name TEXT PRIMARY KEY, value INTEGER);')
+        cur.execute('''INSERT OR IGNORE INTO tfidf_statistics (name, value) VALUES
+        ('document_count', 0), ('last_review_id', 0);''')
+
+def retrieve_tfidf_statistics(d_base_location):
+    '''
+    Returns the number of reviews counted and the id of the last review counted.
+    '''
+
+    with sqlite3.connect(d_base_location, timeout=20) as d_base:
+        cur = d_base.cursor()
+        cur.execute('SELECT name, value FROM tfidf_statistics;')
+        statistics = dict(cur.fetchall())
+        return statistics['document_count'], statistics['last_review_id']
+
+def stream_steam_review_tokens(d_base_location, chunk_size, start_id=0):
+    '''
+    Yields lists of (review_id, normalized_text) in review id order.
+    '''
+
+    with sqlite3.connect(d_base_location, timeout=20) as d_base:
+        cur = d_base.cursor()
+        last_id = start_id
+
+        while True:
+            query = '''SELECT review_id, normalized_text FROM steam_review_tokens WHERE review_id > ?
+            ORDER BY review_id LIMIT ?;'''
+            with profiler.phase('db'):
+                cur.execute(query, (last_id, chunk_size))
+                rows = cur.fetchall()
+            if not rows:
+                return
+
+            yield rows
+            last_id = rows[-1][0]
+
+@profiler.timed('db')
+def add_term_document_frequencies(d_base_location, term_counts, documents_counted, last_review_id):
+    '''
+    Adds a batch of counts to the statistics in one transaction, so the counts and the last
+    review id counted always agree.
+    '''
+
+    with sqlite3.connect(d_base_location, timeout=20) as d_base:
+        cur = d_base.cursor()
+        query = '''INSERT INTO term_document_frequencies (term, document_frequency) VALUES (?,?)
+        ON CONFLICT(term) DO UPDATE SET document_frequency = document_frequency + excluded.document_frequency;'''
+        cur.executemany(query, term_counts.items())
+        cur.execute("UPDATE tfidf_statistics SET value = value + ? WHERE name = 'document_count';", (documents_counted,))
+        cur.execute("UPDATE tfidf_statistics SET value = ? WHERE name = 'last_review_id';", (last_review_id,))
+        d_base.commit()
+
+@profiler.timed('db')
+def retrieve_term_document_frequencies(d_base_location, min_df=1):
+    '''
+    Returns (term, document_frequency) for terms in at least min_df reviews, sorted by term.
+    '''
+
+    with sqlite3.connect(d_base_location, timeout=20) as d_base:
+        cur = d_base.cursor()
+        query = '''SELECT term, document_frequency FROM term_document_frequencies
+        WHERE document_frequency >= ? ORDER BY term;'''
+        cur.execute(query, (min_df,))
+        return cur.fetchall()
+
+def create_near_duplicate_tables(d_base_location):
+    '''
+    review_minhashes holds each review's MinHash signature. review_lsh_bands holds the first review
+    to land in each bucket of each band, which later reviews in that bucket are compared with.
+    review_near_duplicates holds each later review that's a near-duplicate, with the first review of its cluster.
+    '''
+
+    with sqlite3.connect(d_base_location, timeout=20) as d_base:
+        cur = d_base.cursor()
+        cur.execute('CREATE TABLE IF NOT EXISTS review_minhashes (review_id INTEGER PRIMARY KEY, signature BLOB);')
+        cur.execute('CREATE TABLE IF NOT EXISTS review_lsh_bands (band INTEGER, bucket INTEGER, review_id INTEGER);')
+        cur.execute('CREATE INDEX IF NOT EXISTS review_lsh_bands_bucket ON review_lsh_bands (band, bucket);')
+        cur.execute('''CREATE TABLE IF NOT EXISTS review_near_duplicates (review_id INTEGER, duplicate_of INTEGER,
+        similarity REAL, conflicting INTEGER, PRIMARY KEY (review_id, duplicate_of));''')
+
+def retrieve_last_minhashed_review_id(d_base_location):
+    '''
+    Returns the id of the last review with a MinHash signature, or 0 if none have one.
+    '''
+
+    with sqlite3.connect(d_base_location, timeout=20) as d_base:
+        cur = d_base.cursor()
+        cur.execute('SELECT MAX(review_id) FROM review_minhashes;')
+        last_id = cur.fetchone()[0]
+        return last_id if last_id is not None else 0
+
+@profiler.timed('db')
+def insert_minhashes_find_candidates(d_base_location, signatures, bands):
+    '''
+    Takes a list of (review_id, signature) and a list of (band, bucket, review_id) and saves them.
+    Only the first review in a bucket is kept in review_lsh_bands. Returns the (review_id, candidate_id)
+    pairs, in review id order, where a new review shares a bucket with an earlier review, either already
+    saved or in this batch, and the candidate is the first review in that bucket.
+    So each new review has at most one candidate a band, however many copies there are of it.
+    '''
+
+    with sqlite3.connect(d_base_location, timeout=20) as d_base:
+        cur = d_base.cursor()
+        cur.executemany('INSERT OR REPLACE INTO review_minhashes (review_id, signature) VALUES (?,?);', signatures)
+
+        cur.execute('CREATE TEMP TABLE IF NOT EXISTS new_lsh_bands (band INTEGER, bucket INTEGER, review_id INTEGER);')
+        cur.execute('DELETE FROM new_lsh_bands;')
+        cur.executemany('INSERT INTO new_lsh_bands (band, bucket, review_id) VALUES (?,?,?);', bands)
+        cur.execute('''INSERT INTO review_lsh_bands (band, bucket, review_id)
+        SELECT band, bucket, MIN(review_id) FROM new_lsh_bands WHERE NOT EXISTS (SELECT 1 FROM review_lsh_bands
+        WHERE review_lsh_bands.band = new_lsh_bands.band AND review_lsh_bands.bucket = new_lsh_bands.bucket)
+        GROUP BY band, bucket;''')
+        query = '''SELECT DISTINCT new_lsh_bands.review_id, (SELECT MIN(review_lsh_bands.review_id) FROM review_lsh_bands
+        WHERE review_lsh_bands.band = new_lsh_bands.band AND review_lsh_bands.bucket = new_lsh_bands.bucket) AS candidate_id
+        FROM new_lsh_bands WHERE candidate_id < new_lsh_bands.review_id ORDER BY new_lsh_bands.review_id, candidate_id;'''
+        cur.execute(query)
+        candidates = cur.fetchall()
+        d_base.commit()
+        return candidates
+
+@profiler.timed('db')
+def retrieve_minhash_signatures(d_base_location, review_ids):
+    '''
+    Returns a dict of review id to signature, for these review ids.
+    '''
+
+    with sqlite3.connect(d_base_location, timeout=20) as d_base:
+        cur = d_base.cursor()
+        signatures = {}
+        review_ids = list(review_ids)
+        # SQLite limits the number of ? in one query
+        for start in range(0, len(review_ids), 500):
+            batch = review_ids[start:start + 500]
+            query = 'SELECT review_id, signature FROM review_minhashes WHERE review_id IN (%s);' %(','.join('?' * len(batch)))
+            cur.execute(query, batch)
+            signatures.update(cur.fetchall())
+        return signatures
+
+def retrieve_near_duplicate_clusters(d_base_location, review_ids):
+    '''
+    Returns a dict of review id to the first review of its cluster, for the reviews already flagged.
+    '''
+
+    with sqlite3.connect(d_base_location, timeout=20) as d_base:
+        cur = d_base.cursor()
+        clusters = {}
+        review_ids = list(review_ids)
+        # SQLite limits the number of ? in one query
+        for start in range(0, len(review_ids), 500):
+            batch = review_ids[start:start + 500]
+            query = 'SELECT review_id, duplicate_of FROM review_near_duplicates WHERE review_id IN (%s);' %(','.join('?' * len(batch)))
+            cur.execute(query, batch)
+            clusters.update(cur.fetchall())
+        return clusters
+
+@profiler.timed('db')
+def insert_near_duplicates(d_base_location, near_duplicates):
+    '''
+    Takes a list of (review_id, duplicate_of, similarity). Whether the two reviews have opposite
+    recommendations is worked out from steam_reviews as they're saved.
+    '''
+
+    with sqlite3.connect(d_base_location, timeout=20) as d_base:
+        cur = d_base.cursor()
+        query = '''INSERT OR REPLACE INTO review_near_duplicates (review_id, duplicate_of, similarity, conflicting)
+        SELECT ?, ?, ?, (SELECT later.user_recommendation != earlier.user_recommendation
+        FROM steam_reviews AS later, steam_reviews AS earlier WHERE later.id = ? AND earlier.id = ?);'''
+        cur.executemany(query, [(review_id, duplicate_of, similarity, review_id, duplicate_of)
+                                for review_id, duplicate_of, similarity in near_duplicates])
+        d_base.commit()
+
+def retrieve_near_duplicates(d_base_location):
+    '''
+    Returns every (review_id, duplicate_of, similarity, conflicting) row.
+    '''
+
+    with sqlite3.connect(d_base_location, timeout=20) as d_base:
+        cur = d_base.cursor()
+        cur.execute('''SELECT review_id, duplicate_of, similarity, conflicting FROM review_near_duplicates
+        ORDER BY review_id, duplicate_of;''')
+        return cur.fetchall()
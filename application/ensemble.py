@@ -0,0 +1,117 @@
+#! usr/bin/env python3
+
+'''
+This module puts trained classifiers together into one ensemble classifier, which votes
+between them. The classifiers must have been trained on the same vectors, so a batch of
+reviews is vectorized once and the one sparse matrix is given to each of them. Tokenizing is
+most of the cost of a prediction, so the ensemble costs little more than one classifier.
+
+With soft voting, each classifier's probabilities are averaged, weighted by its weight.
+LinearSVC has no probabilities, so its decision function is squashed into one, the same
+way classify_data does for its confidence. With hard voting, each classifier's prediction
+is a vote of its weight, and the share of the votes is used as the probability.
+
+The ensemble is saved to the model registry like any classifier, so classify_data and the
+inference service can use it without changes.
+'''
+
+import numpy as np
+from sklearn.base import BaseEstimator, ClassifierMixin, clone
+
+ENSEMBLE_MEMBERS = ('mnb', 'linear_svc', 'logistic_regression')
+VOTING = ('soft', 'hard')
+
+
+def member_probabilities(classifier, vectors):
+    '''
+    Returns the classifier's probability of each class, one row per review.
+    '''
+
+    if hasattr(classifier, 'predict_proba'):
+        return classifier.predict_proba(vectors)
+
+    decisions = classifier.decision_function(vectors)
+    if decisions.ndim == 1:
+        positive = 1 / (1 + np.exp(-decisions))
+        return np.column_stack((1 - positive, positive))
+
+    # A softmax of the decision function, for more than two classes
+    exponents = np.exp(decisions - decisions.max(axis=1, keepdims=True))
+    return exponents / exponents.sum(axis=1, keepdims=True)
+
+
+class EnsembleClassifier(ClassifierMixin, BaseEstimator):
+    '''
+    Votes between named classifiers trained on the same vectors.
+    estimators is a list of (name, classifier) pairs, and weights, if given, a list of the same length.
+    fit trains a copy of each, but already trained classifiers can be put together with from_fitted.
+    '''
+
+    def __init__(self, estimators, voting='soft', weights=None):
+        self.estimators = estimators
+        self.voting = voting
+        self.weights = weights
+
+    def check_settings(self):
+        if self.voting not in VOTING:
+            raise ValueError('voting must be one of %s, not %s' %(', '.join(VOTING), self.voting))
+        if not self.estimators:
+            raise ValueError('An ensemble needs at least one classifier')
+        if self.weights is not None and len(self.weights) != len(self.estimators):
+            raise ValueError('There are %s weights for %s classifiers' %(len(self.weights), len(self.estimators)))
+
+    def fit(self, vectors, classes):
+        self.check_settings()
+        self.estimators_ = [(name, clone(classifier).fit(vectors, classes)) for name, classifier in self.estimators]
+        self.classes_ = self.estimators_[0][1].classes_
+        return self
+
+    @classmethod
+    def from_fitted(cls, estimators, voting='soft', weights=None):
+        '''
+        Puts classifiers that have already been trained together, without training them again.
+        They must all have the same classes.
+        '''
+
+        ensemble = cls(estimators, voting, weights)
+        ensemble.check_settings()
+        classes = estimators[0][1].classes_
+        for name, classifier in estimators:
+            if list(classifier.classes_) != list(classes):
+                raise ValueError('%s has the classes %s, not %s' %(name, list(classifier.classes_), list(classes)))
+
+        ensemble.estimators_ = list(estimators)
+        ensemble.classes_ = classes
+        return ensemble
+
+    def member_weights(self):
+        if self.weights is None:
+            return np.ones(len(self.estimators_))
+        return np.asarray(self.weights, dtype=float)
+
+    def predict_proba(self, vectors):
+        '''
+        The weighted average of the classifiers' probabilities, or with hard voting, the weighted share of their votes.
+        '''
+
+        weights = self.member_weights()
+        combined = np.zeros((vectors.shape[0], len(self.classes_)))
+
+        for weight, (_name, classifier) in zip(weights, self.estimators_):
+            if self.voting == 'soft':
+                combined += weight * member_probabilities(classifier, vectors)
+            else:
+                predictions = classifier.predict(vectors)
+                combined += weight * (predictions[:, np.newaxis] == self.classes_[np.newaxis, :])
+
+        return combined / weights.sum()
+
+    def predict(self, vectors):
+        return self.classes_[np.argmax(self.predict_proba(vectors), axis=1)]
+
+    def member_predictions(self, vectors):
+        '''
+        Returns each classifier's own predictions, by name, for comparing them with the ensemble's.
+        '''
+
+        return {name: classifier.predict(vectors) for name, classifier in self.estimators_}
@@ -0,0 +1,208 @@
+#! usr/bin/env python3
+
+'''
+This module exports steam_reviews to JSONL, CSV or Parquet files, for the export command.
+
+Rows are read a chunk at a time with the same id-ordered queries as stream_steam_reviews, and
+each chunk is written before the next is read. Only one chunk is held in memory, however
+many reviews there are. Reviews can be filtered by app number, date scraped and
+recommendation, and only the columns asked for are read.
+
+JSONL and CSV are compressed with gzip or zstd as they're written. Parquet files compress
+each chunk's row group themselves. zstd needs Python 3.14's compression.zstd or the
+zstandard package, and Parquet needs pyarrow. They're imported only when they're used, so
+gzip JSONL and CSV work without either.
+
+With more than one worker, the id range is split into parts, and each process writes its own part file.
+'''
+
+import csv
+import gzip
+import json
+import os
+from multiprocessing import Pool
+
+from application import database_manager
+
+EXPORT_FORMATS = ('jsonl', 'csv', 'parquet')
+COMPRESSIONS = ('gzip', 'zstd', 'none')
+COMPRESSION_EXTENSIONS = {'gzip': '.gz', 'zstd': '.zst', 'none': ''}
+RECOMMENDATIONS = {'recommended': 'Recommended', 'not_recommended': 'Not Recommended'}
+EXPORT_LOCATION = os.path.join('export', 'steam_reviews')
+
+# The Parquet type of each column
+PARQUET_TYPES = {'id': 'int64', 'url': 'string', 'app_num': 'int64', 'date_scraped': 'string', 'classified': 'int64',
+                 'user_recommendation': 'string', 'user_review_text': 'string', 'user_name': 'string'}
+
+
+def export_file_location(output_location, export_format, compression, part=None, parts=None):
+    '''
+    Adds the format's extension, and the part number if the export is split, to output_location.
+    '''
+
+    if part is not None:
+        output_location = '%s-%05d-of-%05d' %(output_location, part, parts)
+    if export_format == 'parquet':
+        return '%s.parquet' %(output_location)
+    return '%s.%s%s' %(output_location, export_format, COMPRESSION_EXTENSIONS[compression])
+
+
+def open_text_file(file_location, compression):
+    '''
+    Opens a file to write text to, compressing it as it's written.
+    '''
+
+    if compression == 'gzip':
+        return gzip.open(file_location, 'wt', encoding='utf-8', newline='')
+    if compression == 'zstd':
+        # Imported here, since zstd is only in the standard library from Python 3.14
+        try:
+            from compression import zstd
+        except ImportError:
+            try:
+                import zstandard as zstd
+            except ImportError:
+                raise ValueError('zstd compression needs Python 3.14 or the zstandard package, use gzip instead')
+        return zstd.open(file_location, 'wt', encoding='utf-8', newline='')
+    return open(file_location, 'w', encoding='utf-8', newline='')
+
+
+def write_jsonl(chunks, columns, file_location, compression):
+    rows_written = 0
+    with open_text_file(file_location, compression) as export_file:
+        for rows in chunks:
+            export_file.writelines('%s\n' %(json.dumps(dict(zip(columns, row[1:])), ensure_ascii=False)) for row in rows)
+            rows_written += len(rows)
+
+    return rows_written
+
+
+def write_csv(chunks, columns, file_location, compression):
+    rows_written = 0
+    with open_text_file(file_location, compression) as export_file:
+        writer = csv.writer(export_file)
+        writer.writerow(columns)
+        for rows in chunks:
+            writer.writerows(row[1:] for row in rows)
+            rows_written += len(rows)
+
+    return rows_written
+
+
+def write_parquet(chunks, columns, file_location, compression):
+    '''
+    Writes each chunk as a row group, so the whole export is never in memory at once.
+    '''
+
+    # Imported here, so the other formats don't need pyarrow
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ValueError('Exporting to Parquet needs the pyarrow package')
+
+    schema = pyarrow.schema([(column, PARQUET_TYPES[column]) for column in columns])
+    rows_written = 0
+    with pyarrow.parquet.ParquetWriter(file_location, schema, compression=compression) as writer:
+        for rows in chunks:
+            table = pyarrow.Table.from_arrays([pyarrow.array([row[index + 1] for row in rows], type=schema.field(index).type)
+                                               for index in range(len(columns))], schema=schema)
+            writer.write_table(table)
+            rows_written += len(rows)
+
+    return rows_written
+
+
+EXPORT_WRITERS = {
+    'jsonl': write_jsonl,
+    'csv': write_csv,
+    'parquet': write_parquet,
+}
+
+
+def export_range(db_location, file_location, export_format, compression, columns, chunk_size, start_id, end_id,
+                 filters):
+    '''
+    Exports the reviews with ids after start_id, up to end_id, to one file. Returns the file and how many rows were written.
+    '''
+
+    chunks = database_manager.stream_filtered_steam_reviews(db_location, columns, chunk_size, start_id, end_id, **filters)
+    return file_location, EXPORT_WRITERS[export_format](chunks, columns, file_location, compression)
+
+
+def export_reviews(db_location, output_location=EXPORT_LOCATION, export_format='jsonl', compression='gzip',
+                   columns=None, chunk_size=10000, workers=1, app_range=None, date_range=None, user_recommendation=None):
+    '''
+    Exports steam_reviews to output_location, with the format's extension added, or to a part file
+    for each worker. columns defaults to every column. Returns a list of (file, rows written).
+    Accessed from run_app.py
+    '''
+
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError('The export format must be one of %s, not %s' %(', '.join(EXPORT_FORMATS), export_format))
+    if compression not in COMPRESSIONS:
+        raise ValueError('The compression must be one of %s, not %s' %(', '.join(COMPRESSIONS), compression))
+
+    columns = list(columns or database_manager.STEAM_REVIEWS_COLUMNS)
+    filters = {'app_range': app_range, 'date_range': date_range, 'user_recommendation': user_recommendation}
+    output_directory = os.path.dirname(output_location)
+    if output_directory:
+        os.makedirs(output_directory, exist_ok=True)
+
+    if workers == 1:
+        file_location = export_file_location(output_location, export_format, compression)
+        return [export_range(db_location, file_location, export_format, compression, columns, chunk_size, 0, None, filters)]
+
+    first_id, last_id = database_manager.retrieve_steam_reviews_id_range(db_location)
+    if first_id is None:
+        return []
+
+    id_ranges = database_manager.split_id_range(first_id, last_id, workers)
+    jobs = [(db_location, export_file_location(output_location, export_format, compression, part, len(id_ranges)),
+             export_format, compression, columns, chunk_size, start_id - 1, end_id, filters)
+            for part, (start_id, end_id) in enumerate(id_ranges, 1)]
+    with Pool(workers) as pool:
+        return pool.starmap(export_range, jobs)
+
+
+def parse_range(text, separator, convert=str):
+    first, _separator, last = text.partition(separator)
+    if not first or not last:
+        raise ValueError('%s is not a range, use first%slast' %(text, separator))
+    return (convert(first), convert(last))
+
+
+def parse_export_options(options):
+    '''
+    Turns the export command's key=value options into export_reviews' arguments, like
+    compression=zstd columns=app_num,user_review_text apps=300000-400000 dates=2017-01-01:2017-01-31
+    class=not_recommended workers=4 chunk_size=5000 output=export/reviews
+    Accessed from run_app.py
+    '''
+
+    export_arguments = {}
+    for option in options:
+        key, separator, value = option.partition('=')
+        if not separator or not value:
+            raise ValueError('Export options are key=value, not %s' %(option))
+
+        if key == 'compression':
+            export_arguments['compression'] = value
+        elif key == 'columns':
+            export_arguments['columns'] = value.split(',')
+        elif key == 'apps':
+            export_arguments['app_range'] = parse_range(value, '-', int)
+        elif key == 'dates':
+            export_arguments['date_range'] = parse_range(value, ':')
+        elif key == 'class':
+            if value not in RECOMMENDATIONS:
+                raise ValueError('class must be one of %s, not %s' %(', '.join(RECOMMENDATIONS), value))
+            export_arguments['user_recommendation'] = RECOMMENDATIONS[value]
+        elif key in ('workers', 'chunk_size'):
+            export_arguments[key] = int(value)
+        elif key == 'output':
+            export_arguments['output_location'] = value
+        else:
+            raise ValueError('There is no export option %s' %(key))
+
+    return export_arguments
@@ -0,0 +1,149 @@
+#! usr/bin/env python3
+
+'''
+This module shrinks the feature matrices between vectorizing and training.
+A default TfidfVectorizer keeps every token it sees, and a lot of the tokens in Steam reviews
+are typos, usernames and words used once, which make the matrices wide for little gain.
+
+A feature reduction is a dict of settings. min_df, max_df and max_features prune the
+vocabulary while vectorizing. selector, which is 'chi2' or 'mutual_info', and k then keep the
+k features that say most about the class. mutual_info scores whether a review has the term
+or not, since mutual information is counted over discrete values and tf-idf weights aren't.
+
+compare_feature_reductions reports the matrix size, stored values, fit time and accuracy for
+each reduction, so the smallest feature space that keeps the accuracy can be picked.
+train_classify_data uses this module, and runs the comparison on reviews from the db.
+'''
+
+import time
+
+from application import parallel_tfidf
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.feature_selection import SelectKBest, chi2, mutual_info_classif
+from sklearn.pipeline import make_pipeline
+
+FEATURE_REDUCTIONS = {
+    'none': {},
+    'df_pruned': {'min_df': 2, 'max_df': 0.5},
+    'max_features_10000': {'min_df': 2, 'max_df': 0.5, 'max_features': 10000},
+    'chi2_2000': {'min_df': 2, 'max_df': 0.5, 'selector': 'chi2', 'k': 2000},
+    'mutual_info_2000': {'min_df': 2, 'max_df': 0.5, 'selector': 'mutual_info', 'k': 2000},
+}
+
+
+def mutual_info_presence(vectors, classes):
+    '''
+    Scores each term by the mutual information between the class and whether the review has the term.
+    '''
+
+    return mutual_info_classif(vectors > 0, classes, discrete_features=True, random_state=0)
+
+
+SELECTOR_SCORES = {
+    'chi2': chi2,
+    'mutual_info': mutual_info_presence,
+}
+
+VECTORIZER_SETTINGS = ('min_df', 'max_df', 'max_features')
+
+
+def vectorizer_settings(feature_reduction, **vectorizer_params):
+    '''
+    Adds the reduction's min_df, max_df and max_features to the vectorizer's parameters.
+    '''
+
+    for setting in VECTORIZER_SETTINGS:
+        if setting in feature_reduction:
+            vectorizer_params[setting] = feature_reduction[setting]
+
+    return vectorizer_params
+
+
+def build_vectorizer(feature_reduction, **vectorizer_params):
+    '''
+    Returns a TfidfVectorizer that prunes its vocabulary with the reduction's min_df, max_df and max_features.
+    '''
+
+    return TfidfVectorizer(**vectorizer_settings(feature_reduction, **vectorizer_params))
+
+
+def build_selector(feature_reduction, n_features):
+    '''
+    Returns a SelectKBest for the reduction, or None if it doesn't select features.
+    k is capped at the number of features, so small corpora still work.
+    '''
+
+    if 'selector' not in feature_reduction:
+        return None
+
+    score_function = SELECTOR_SCORES[feature_reduction['selector']]
+    return SelectKBest(score_function, k=min(feature_reduction['k'], n_features))
+
+
+def reduce_features(feature_reduction, training_documents, training_classes, testing_documents, workers=1,
+                    **vectorizer_params):
+    '''
+    Vectorizes the reviews with the pruned vocabulary, then keeps the selected features.
+    With more than one worker, the vectorizer is fitted by parallel_tfidf, with the same result.
+    Returns the training and test vectors, the vectorizer and the selector, which may be None.
+    '''
+
+    if workers > 1:
+        training_vectors, vectorizer = parallel_tfidf.fit_transform_parallel(
+            training_documents, workers, **vectorizer_settings(feature_reduction, **vectorizer_params))
+    else:
+        vectorizer = build_vectorizer(feature_reduction, **vectorizer_params)
+        training_vectors = vectorizer.fit_transform(training_documents)
+    test_vectors = vectorizer.transform(testing_documents)
+
+    selector = build_selector(feature_reduction, training_vectors.shape[1])
+    if selector is not None:
+        training_vectors = selector.fit_transform(training_vectors, training_classes)
+        test_vectors = selector.transform(test_vectors)
+
+    return training_vectors, test_vectors, vectorizer, selector
+
+
+def with_selector(selector, classifier):
+    '''
+    Puts the selector in front of the classifier, so the pair can be saved and used as one classifier.
+    '''
+
+    if selector is None:
+        return classifier
+    return make_pipeline(selector, classifier)
+
+
+def compare_feature_reductions(training_documents, training_classes, testing_documents, testing_classes,
+                               trainers, feature_reductions=FEATURE_REDUCTIONS):
+    '''
+    Returns a report for each reduction and classifier with the matrix shape, the number of
+    stored values, the seconds taken to vectorize and select, and to fit, and the accuracy.
+    trainers is a list of (name, function) pairs, like train_classify_data.CLASSIFIER_TRAINERS.
+    '''
+
+    reports = []
+
+    for reduction_name, feature_reduction in feature_reductions.items():
+        reduce_started = time.perf_counter()
+        training_vectors, test_vectors, _vectorizer, _selector = reduce_features(feature_reduction, training_documents,
+                                                                                 training_classes, testing_documents)
+        reduce_seconds = time.perf_counter() - reduce_started
+
+        for classifier_name, trainer in trainers:
+            fit_started = time.perf_counter()
+            classifier = trainer(training_vectors, training_classes)
+            fit_seconds = time.perf_counter() - fit_started
+
+            reports.append({
+                'reduction': reduction_name,
+                'classifier': classifier_name,
+                'shape': training_vectors.shape,
+                'nnz': training_vectors.nnz,
+                'reduce_seconds': reduce_seconds,
+                'fit_seconds': fit_seconds,
+                'accuracy': classifier.score(test_vectors, testing_classes) * 100,
+            })
+
+    return reports
+
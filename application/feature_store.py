@@ -0,0 +1,262 @@
+#! usr/bin/env python3
+
+'''
+This module keeps vectorized reviews on disk, so training, evaluation and classifying can
+share one copy of them, even when the matrix is larger than memory.
+
+Each matrix is kept as the three arrays of a CSR matrix, data, indices and indptr, plus the
+review id of each row, in raw files that are mapped into memory with np.memmap. A matrix is
+keyed by the db it was made from, named after the file and a hash of its path so two dbs with
+the same name don't share one, and the version of the vectorizer in the model registry that
+made it. The rows are in review id order, so the corpus as it was at any last_review_id is the
+rows up to it, and open_matrix reads only those. If the db's reviews have been dropped since,
+so its ids no longer hold the same reviews, the matrix is made again.
+
+classify_reviews and run_cross_validation can read their vectors from here, rather than
+vectorizing the reviews themselves, when they're given a registered vectorizer's version.
+
+Any range of rows can be sliced out without reading the rest, since indptr says where each
+row starts in data and indices. New rows are appended to the end of the files, and
+meta.json, which says how many rows and values are valid, is only written after them, so a
+stopped append never leaves a broken matrix.
+'''
+
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from application import database_manager, model_registry
+from application.review_records import ID, USER_REVIEW_TEXT
+
+FEATURE_STORE_LOCATION = 'feature_store'
+
+ARRAY_DTYPES = {
+    'data': np.float64,
+    'indices': np.int32,
+    'indptr': np.int64,
+    'row_ids': np.int64,
+}
+
+
+def corpus_name(db_location):
+    '''
+    The db's file name, and a hash of its full path.
+    '''
+
+    db_name = os.path.splitext(os.path.basename(db_location))[0]
+    path_hash = hashlib.sha1(os.path.abspath(db_location).encode('utf-8')).hexdigest()[:8]
+    return '%s_%s' %(db_name, path_hash)
+
+
+def text_hash(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def store_key(corpus_snapshot, vectorizer_version):
+    return '%s__%s' %(corpus_snapshot, vectorizer_version)
+
+
+def matrix_location(store_location, corpus_snapshot, vectorizer_version):
+    return os.path.join(store_location, store_key(corpus_snapshot, vectorizer_version))
+
+
+def read_meta(location):
+    with open(os.path.join(location, 'meta.json')) as meta_file:
+        return json.load(meta_file)
+
+
+def write_meta(location, meta):
+    '''
+    Writes to a temporary file first, so meta.json is never left half written.
+    '''
+
+    meta_location = os.path.join(location, 'meta.json')
+    temporary_location = '%s.tmp' %(meta_location)
+    with open(temporary_location, 'w') as meta_file:
+        json.dump(meta, meta_file, indent=2)
+    os.replace(temporary_location, meta_location)
+
+
+def create_matrix(store_location, corpus_snapshot, vectorizer_version, n_features):
+    '''
+    Makes an empty matrix with no rows. indptr starts with the 0 every CSR matrix starts with.
+    '''
+
+    location = matrix_location(store_location, corpus_snapshot, vectorizer_version)
+    os.makedirs(location, exist_ok=True)
+
+    for name, dtype in ARRAY_DTYPES.items():
+        with open(os.path.join(location, '%s.bin' %(name)), 'wb') as array_file:
+            if name == 'indptr':
+                array_file.write(np.zeros(1, dtype=dtype).tobytes())
+
+    meta = {
+        'corpus_snapshot': corpus_snapshot,
+        'vectorizer_version': vectorizer_version,
+        'n_rows': 0,
+        'n_features': n_features,
+        'nnz': 0,
+        'last_row_id': 0,
+        'last_row_text_hash': None,
+    }
+    write_meta(location, meta)
+    return meta
+
+
+def truncate_to_meta(location, meta):
+    '''
+    Cuts off anything an append wrote without getting as far as updating meta.json.
+    '''
+
+    valid_lengths = {'data': meta['nnz'], 'indices': meta['nnz'], 'indptr': meta['n_rows'] + 1, 'row_ids': meta['n_rows']}
+    for name, dtype in ARRAY_DTYPES.items():
+        with open(os.path.join(location, '%s.bin' %(name)), 'r+b') as array_file:
+            array_file.truncate(valid_lengths[name] * np.dtype(dtype).itemsize)
+
+
+def append_rows(store_location, corpus_snapshot, vectorizer_version, matrix, row_ids, last_row_text=None):
+    '''
+    Adds the rows of a sparse matrix, and the review id of each row, to the end of the stored matrix.
+    The last row's review text is hashed, so vectorize_to_store can tell if the db still has that review.
+    '''
+
+    location = matrix_location(store_location, corpus_snapshot, vectorizer_version)
+    meta = read_meta(location)
+    truncate_to_meta(location, meta)
+
+    matrix = csr_matrix(matrix)
+    if matrix.shape[1] != meta['n_features']:
+        raise ValueError('The stored matrix has %s features, but these rows have %s' %(meta['n_features'], matrix.shape[1]))
+
+    new_arrays = {
+        'data': matrix.data,
+        'indices': matrix.indices,
+        'indptr': matrix.indptr[1:] + meta['nnz'],
+        'row_ids': np.asarray(row_ids),
+    }
+    for name, dtype in ARRAY_DTYPES.items():
+        with open(os.path.join(location, '%s.bin' %(name)), 'ab') as array_file:
+            array_file.write(np.ascontiguousarray(new_arrays[name], dtype=dtype).tobytes())
+
+    meta['n_rows'] += matrix.shape[0]
+    meta['nnz'] += matrix.nnz
+    if len(row_ids):
+        meta['last_row_id'] = int(row_ids[-1])
+        meta['last_row_text_hash'] = None if last_row_text is None else text_hash(last_row_text)
+    write_meta(location, meta)
+    return meta
+
+
+def map_array(location, name, length):
+    if length == 0:
+        return np.zeros(0, dtype=ARRAY_DTYPES[name])
+    return np.memmap(os.path.join(location, '%s.bin' %(name)), dtype=ARRAY_DTYPES[name], mode='r', shape=(length,))
+
+
+def open_matrix(store_location, corpus_snapshot, vectorizer_version, last_review_id=None):
+    '''
+    Maps the stored arrays into memory and returns them in a dict, with the meta data.
+    Nothing is read until it's sliced.
+    With a last_review_id, only the rows up to that review are in it, which is the corpus as it was then.
+    '''
+
+    location = matrix_location(store_location, corpus_snapshot, vectorizer_version)
+    meta = read_meta(location)
+
+    if last_review_id is not None:
+        if last_review_id > meta['last_row_id']:
+            raise ValueError('The stored matrix only has reviews up to %s, not %s, run vectorize_features first' %(
+                meta['last_row_id'], last_review_id))
+        row_ids = map_array(location, 'row_ids', meta['n_rows'])
+        meta['n_rows'] = int(np.searchsorted(row_ids, last_review_id, side='right'))
+        meta['nnz'] = int(map_array(location, 'indptr', meta['n_rows'] + 1)[meta['n_rows']])
+        meta['last_row_id'] = last_review_id
+
+    stored_matrix = dict(meta)
+    stored_matrix['data'] = map_array(location, 'data', meta['nnz'])
+    stored_matrix['indices'] = map_array(location, 'indices', meta['nnz'])
+    stored_matrix['indptr'] = map_array(location, 'indptr', meta['n_rows'] + 1)
+    stored_matrix['row_ids'] = map_array(location, 'row_ids', meta['n_rows'])
+    return stored_matrix
+
+
+def slice_rows(stored_matrix, start, stop):
+    '''
+    Returns rows start to stop, not including stop, as a CSR matrix. Only those rows' values are read.
+    '''
+
+    stop = min(stop, stored_matrix['n_rows'])
+    indptr = np.asarray(stored_matrix['indptr'][start:stop + 1])
+    first, last = indptr[0], indptr[-1]
+
+    return csr_matrix((stored_matrix['data'][first:last], stored_matrix['indices'][first:last], indptr - first),
+                      shape=(stop - start, stored_matrix['n_features']))
+
+
+def read_rows(stored_matrix, review_ids):
+    '''
+    Returns the rows of these reviews, in the order they're given, as a CSR matrix. Only those rows' values are read.
+    '''
+
+    review_ids = np.asarray(review_ids, dtype=np.int64)
+    positions = np.searchsorted(stored_matrix['row_ids'], review_ids)
+    found = positions < stored_matrix['n_rows']
+    if not found.all() or (stored_matrix['row_ids'][positions] != review_ids).any():
+        raise ValueError('Some of the reviews aren\'t in the stored matrix, run vectorize_features first')
+
+    starts = np.asarray(stored_matrix['indptr'][positions])
+    lengths = np.asarray(stored_matrix['indptr'][positions + 1]) - starts
+    indptr = np.concatenate(([0], np.cumsum(lengths)))
+    value_positions = np.repeat(starts - indptr[:-1], lengths) + np.arange(indptr[-1])
+
+    return csr_matrix((stored_matrix['data'][value_positions], stored_matrix['indices'][value_positions], indptr),
+                      shape=(len(review_ids), stored_matrix['n_features']))
+
+
+def matches_db(db_location, meta):
+    '''
+    Checks the db still has the stored matrix's last review, so the ids haven't started again since a drop.
+    '''
+
+    if meta['last_row_id'] == 0:
+        return True
+    review_text = database_manager.retrieve_steam_review_text(db_location, meta['last_row_id'])
+    return review_text is not None and text_hash(review_text) == meta['last_row_text_hash']
+
+
+def vectorize_to_store(db_location, vectorizer_version=None, corpus_snapshot=None, chunk_size=1000,
+                       store_location=FEATURE_STORE_LOCATION, registry_location=model_registry.REGISTRY_LOCATION):
+    '''
+    Vectorizes the reviews that aren't in the stored matrix yet with a vectorizer from the model
+    registry, the promoted one by default, and appends them a chunk at a time.
+    The corpus snapshot is named by corpus_name unless another name is given.
+    A stored matrix whose last review isn't in the db any more is made again from the start.
+    Accessed from run_app.py
+    '''
+
+    vectorizer, _classifier, metadata = model_registry.load_model(vectorizer_version, registry_location)
+    vectorizer_version = metadata['version']
+    if corpus_snapshot is None:
+        corpus_snapshot = corpus_name(db_location)
+
+    location = matrix_location(store_location, corpus_snapshot, vectorizer_version)
+    meta = None
+    if os.path.exists(os.path.join(location, 'meta.json')):
+        meta = read_meta(location)
+        if not matches_db(db_location, meta):
+            shutil.rmtree(location)
+            meta = None
+    if meta is None:
+        n_features = vectorizer.transform(['']).shape[1]
+        meta = create_matrix(store_location, corpus_snapshot, vectorizer_version, n_features)
+
+    for rows in database_manager.stream_steam_reviews(db_location, chunk_size, meta['last_row_id']):
+        vectors = vectorizer.transform([row[USER_REVIEW_TEXT] for row in rows])
+        meta = append_rows(store_location, corpus_snapshot, vectorizer_version, vectors, [row[ID] for row in rows],
+                           rows[-1][USER_REVIEW_TEXT])
+
+    return meta
@@ -0,0 +1,159 @@
+#! usr/bin/env python3
+
+'''
+This module paces the scraper's requests to what the server can take, rather than a fixed
+sleep between pages.
+
+AimdController works like TCP's congestion control. Each healthy response adds
+additive_increase to the request rate. A 429 or 5xx response, a timeout, or latency rising
+well over the lowest seen, multiplies the rate by multiplicative_decrease, at most once per
+round trip, so the responses already on their way don't cut it again. A Retry-After header
+holds every request back for that long. The rate settles just under what the server
+tolerates, going up slowly and backing off quickly.
+
+The requests allowed in flight at once follow from the rate and latency (Little's law), so
+concurrent scrapers share one controller and get more concurrency as the server allows it.
+
+fetch retries failed requests with exponential backoff and full jitter, so retrying
+scrapers don't all come back at once.
+'''
+
+import math
+import random
+import threading
+import time
+
+import requests
+
+REQUEST_TIMEOUT = 10
+
+
+class AimdController:
+    '''
+    Decides when the next request can go, from the responses so far. It's shared between threads.
+    '''
+
+    def __init__(self, initial_rate=1.0, min_rate=0.1, max_rate=20.0, additive_increase=0.1, multiplicative_decrease=0.5,
+                 latency_tolerance=2.0, latency_slack=0.05, max_concurrency=16, clock=time.monotonic):
+        self.rate = initial_rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.additive_increase = additive_increase
+        self.multiplicative_decrease = multiplicative_decrease
+        self.latency_tolerance = latency_tolerance
+        self.latency_slack = latency_slack
+        self.max_concurrency = max_concurrency
+        self.clock = clock
+
+        self.condition = threading.Condition()
+        self.in_flight = 0
+        self.next_send = clock()
+        self.last_backoff = None
+        self.lowest_latency = None
+        self.latency_average = None
+        self.counts = {'requests': 0, 'successes': 0, 'failures': 0, 'backoffs': 0, 'retries': 0}
+
+    def concurrency_limit(self):
+        if self.latency_average is None:
+            return 1
+        return max(1, min(self.max_concurrency, math.ceil(self.rate * self.latency_average)))
+
+    def seconds_until_ready(self):
+        with self.condition:
+            return max(0.0, self.next_send - self.clock())
+
+    def acquire(self):
+        '''
+        Waits until a request can be sent, and counts it as in flight. Call release when it's answered.
+        '''
+
+        with self.condition:
+            while True:
+                now = self.clock()
+                if now >= self.next_send and self.in_flight < self.concurrency_limit():
+                    self.in_flight += 1
+                    self.next_send = now + 1 / self.rate
+                    self.counts['requests'] += 1
+                    return
+                # Woken early by release when a request finishes or the rate changes
+                self.condition.wait(timeout=max(self.next_send - now, 0.001) if now < self.next_send else 0.05)
+
+    def release(self, latency=None, failed=False, retry_after=None):
+        with self.condition:
+            self.in_flight -= 1
+            if failed:
+                self.counts['failures'] += 1
+                self.back_off(retry_after)
+            else:
+                self.counts['successes'] += 1
+                self.record_latency(latency)
+            self.condition.notify_all()
+
+    def record_latency(self, latency):
+        self.lowest_latency = latency if self.lowest_latency is None else min(self.lowest_latency, latency)
+        self.latency_average = latency if self.latency_average is None else 0.8 * self.latency_average + 0.2 * latency
+
+        if self.latency_average > self.lowest_latency * self.latency_tolerance + self.latency_slack:
+            self.back_off()
+        else:
+            self.rate = min(self.max_rate, self.rate + self.additive_increase)
+
+    def back_off(self, retry_after=None):
+        now = self.clock()
+        round_trip = max(self.latency_average or 0.0, 1 / self.rate)
+        if self.last_backoff is None or now - self.last_backoff >= round_trip:
+            self.rate = max(self.min_rate, self.rate * self.multiplicative_decrease)
+            self.last_backoff = now
+            self.counts['backoffs'] += 1
+        self.next_send = max(self.next_send, now + (retry_after if retry_after is not None else 1 / self.rate))
+
+    def summary(self):
+        with self.condition:
+            return dict(self.counts, rate=self.rate, concurrency_limit=self.concurrency_limit(),
+                        latency_average_ms=None if self.latency_average is None else self.latency_average * 1000)
+
+
+def retry_after_seconds(response):
+    '''
+    The Retry-After header in seconds, or None. Dates aren't supported, those fall back to the controller's interval.
+    '''
+
+    try:
+        return float(response.headers['Retry-After'])
+    except (KeyError, ValueError):
+        return None
+
+
+def fetch(controller, url, max_attempts=4, timeout=REQUEST_TIMEOUT, backoff_base=0.5):
+    '''
+    Gets url when the controller allows it, retrying timeouts, connection errors and 429/5xx
+    responses after a jittered backoff. Raises the last error if every attempt fails, and
+    any other error straight away.
+    '''
+
+    for attempt in range(max_attempts):
+        controller.acquire()
+        started = time.perf_counter()
+        try:
+            response = requests.get(url, timeout=timeout)
+        except (requests.Timeout, requests.ConnectionError) as error:
+            controller.release(failed=True)
+            last_error = error
+        except BaseException:
+            # Too many redirects, a body that won't decode and the like aren't retried, but the slot is still given back
+            controller.release(failed=True)
+            raise
+        else:
+            if response.status_code == 429 or response.status_code >= 500:
+                controller.release(failed=True, retry_after=retry_after_seconds(response))
+                last_error = requests.HTTPError('%s response for %s' %(response.status_code, url), response=response)
+            else:
+                controller.release(time.perf_counter() - started)
+                return response
+
+        if attempt + 1 < max_attempts:
+            with controller.condition:
+                controller.counts['retries'] += 1
+            time.sleep(random.uniform(0, backoff_base * 2 ** attempt))
+
+    raise last_error
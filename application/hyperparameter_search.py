@@ -0,0 +1,248 @@
+#! usr/bin/env python3
+
+'''
+This module searches for better vectorizer and classifier parameters than the sklearn defaults.
+
+Every candidate is a set of vectorizer parameters with a classifier and its parameters.
+The vectorized reviews are cached, keyed by the vectorizer parameters and the number of
+reviews, so candidates that only change the classifier's parameters never tokenize the
+reviews again. The classifiers for one set of vectorized reviews are fitted in parallel.
+
+A grid search tries every candidate on all the training reviews. Successive halving tries
+every candidate on a small share of the reviews, keeps the best 1/factor of them, and gives
+those factor times as many reviews, until one is left or all the reviews are used.
+
+Candidates are chosen by their accuracy on validation reviews split off the training reviews.
+Only the best candidate is then fitted on all the training reviews and scored on the test
+reviews, which played no part in choosing it, so its test accuracy isn't flattered by the choice.
+'''
+
+import itertools
+import math
+import time
+
+import numpy as np
+from joblib import Parallel, delayed
+
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.model_selection import train_test_split
+from sklearn.naive_bayes import MultinomialNB
+from sklearn.svm import LinearSVC
+
+from archive import data_prep
+
+VECTORIZER_GRID = {
+    'ngram_range': [(1, 1), (1, 2)],
+    'min_df': [1, 2],
+    'sublinear_tf': [False, True],
+}
+
+CLASSIFIER_GRIDS = {
+    'mnb': (MultinomialNB, {'alpha': [0.01, 0.1, 0.5, 1.0]}),
+    'linear_svc': (LinearSVC, {'C': [0.1, 0.5, 1.0, 5.0]}),
+    'logistic_regression': (LogisticRegression, {'C': [0.5, 1.0, 5.0, 20.0]}),
+}
+
+
+def expand_grid(grid):
+    '''
+    Turns {'a': [1, 2], 'b': [3]} into [{'a': 1, 'b': 3}, {'a': 2, 'b': 3}].
+    '''
+
+    names = sorted(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*[grid[name] for name in names])]
+
+
+def make_candidates(vectorizer_grid=VECTORIZER_GRID, classifier_grids=CLASSIFIER_GRIDS):
+    candidates = []
+    for vectorizer_params in expand_grid(vectorizer_grid):
+        for classifier_name, (_classifier_class, classifier_grid) in sorted(classifier_grids.items()):
+            for classifier_params in expand_grid(classifier_grid):
+                candidates.append({
+                    'vectorizer_params': vectorizer_params,
+                    'classifier': classifier_name,
+                    'classifier_params': classifier_params,
+                })
+
+    return candidates
+
+
+def vectorizer_key(vectorizer_params, n_reviews):
+    return (tuple(sorted(vectorizer_params.items())), n_reviews)
+
+
+def new_vectorization_cache():
+    return {'vectors': {}, 'hits': 0, 'misses': 0}
+
+
+def vectorize_cached(cache, vectorizer_params, training_documents, validation_documents):
+    '''
+    Returns the training and validation vectors for these vectorizer parameters, only fitting a
+    vectorizer if these parameters haven't been used on this many reviews before.
+    '''
+
+    key = vectorizer_key(vectorizer_params, len(training_documents))
+    if key in cache['vectors']:
+        cache['hits'] += 1
+        return cache['vectors'][key]
+
+    cache['misses'] += 1
+    vectorizer = TfidfVectorizer(**vectorizer_params)
+    training_vectors = vectorizer.fit_transform(training_documents)
+    validation_vectors = vectorizer.transform(validation_documents)
+    cache['vectors'][key] = (training_vectors, validation_vectors)
+    return cache['vectors'][key]
+
+
+def fit_and_score(classifier_name, classifier_params, training_vectors, training_classes,
+                  validation_vectors, validation_classes, classifier_grids=CLASSIFIER_GRIDS):
+    '''
+    Fits one classifier and returns its accuracy on the validation reviews as a percentage, and how
+    long it took to fit. This runs in the worker processes.
+    '''
+
+    classifier_class = classifier_grids[classifier_name][0]
+    classifier = classifier_class(**classifier_params)
+
+    fit_started = time.perf_counter()
+    classifier.fit(training_vectors, training_classes)
+    fit_seconds = time.perf_counter() - fit_started
+
+    accuracy = classifier.score(validation_vectors, validation_classes) * 100
+    return accuracy, fit_seconds
+
+
+def evaluate_candidates(candidates, training_documents, training_classes, validation_documents,
+                        validation_classes, cache, n_jobs=-1, classifier_grids=CLASSIFIER_GRIDS):
+    '''
+    Scores each candidate, grouping them by their vectorizer parameters so each group is
+    vectorized once, then fitting a group's classifiers in parallel.
+    Returns a result dict for each candidate.
+    '''
+
+    groups = {}
+    for candidate in candidates:
+        key = vectorizer_key(candidate['vectorizer_params'], len(training_documents))
+        groups.setdefault(key, []).append(candidate)
+
+    results = []
+    with Parallel(n_jobs=n_jobs) as parallel:
+        for group in groups.values():
+            vectorizer_params = group[0]['vectorizer_params']
+            training_vectors, validation_vectors = vectorize_cached(cache, vectorizer_params, training_documents, validation_documents)
+
+            scores = parallel(delayed(fit_and_score)(candidate['classifier'], candidate['classifier_params'],
+                                                     training_vectors, training_classes, validation_vectors,
+                                                     validation_classes, classifier_grids)
+                              for candidate in group)
+
+            for candidate, (accuracy, fit_seconds) in zip(group, scores):
+                results.append(dict(candidate, accuracy=accuracy, fit_seconds=fit_seconds,
+                                    reviews_trained=len(training_documents)))
+
+    return results
+
+
+def grid_search(training_documents, training_classes, validation_documents, validation_classes,
+                candidates, n_jobs=-1, classifier_grids=CLASSIFIER_GRIDS):
+    '''
+    Tries every candidate on all the training reviews. Returns the results, best first.
+    '''
+
+    cache = new_vectorization_cache()
+    results = evaluate_candidates(candidates, training_documents, training_classes, validation_documents,
+                                  validation_classes, cache, n_jobs, classifier_grids)
+    return sorted(results, key=lambda result: result['accuracy'], reverse=True), cache
+
+
+def successive_halving(training_documents, training_classes, validation_documents, validation_classes,
+                       candidates, factor=3, min_reviews=100, n_jobs=-1, classifier_grids=CLASSIFIER_GRIDS):
+    '''
+    Tries every candidate on a small, shuffled share of the training reviews, keeps the best
+    1/factor of them and tries those on factor times as many reviews.
+    Returns the results of the last round, best first, and the results of every round.
+    '''
+
+    n_rounds = 1
+    if len(candidates) > 1:
+        n_rounds = math.ceil(math.log(len(candidates), factor)) + 1
+    n_reviews = max(min_reviews, int(len(training_documents) / (factor ** (n_rounds - 1))))
+
+    # The training reviews are sorted by class, so the subsets are taken from a shuffled order.
+    # The lists are reordered, rather than made into arrays, which would copy every review as wide as the longest
+    shuffled = np.random.RandomState(0).permutation(len(training_documents))
+    training_documents = [training_documents[index] for index in shuffled]
+    training_classes = [training_classes[index] for index in shuffled]
+
+    cache = new_vectorization_cache()
+    all_results = []
+    remaining = candidates
+
+    while True:
+        n_reviews = min(n_reviews, len(training_documents))
+        results = evaluate_candidates(remaining, training_documents[:n_reviews], training_classes[:n_reviews],
+                                      validation_documents, validation_classes, cache, n_jobs, classifier_grids)
+        results = sorted(results, key=lambda result: result['accuracy'], reverse=True)
+        all_results.append(results)
+
+        if len(results) == 1 or n_reviews == len(training_documents):
+            return results, all_results, cache
+
+        keep = max(1, math.ceil(len(results) / factor))
+        remaining = [{'vectorizer_params': result['vectorizer_params'], 'classifier': result['classifier'],
+                      'classifier_params': result['classifier_params']} for result in results[:keep]]
+        n_reviews *= factor
+
+
+def score_on_test(result, training_documents, training_classes, testing_documents, testing_classes,
+                  classifier_grids=CLASSIFIER_GRIDS):
+    '''
+    Fits the chosen candidate on all these training reviews and returns its result with its test_accuracy.
+    '''
+
+    vectorizer = TfidfVectorizer(**result['vectorizer_params'])
+    training_vectors = vectorizer.fit_transform(training_documents)
+    test_vectors = vectorizer.transform(testing_documents)
+    test_accuracy, _fit_seconds = fit_and_score(result['classifier'], result['classifier_params'], training_vectors,
+                                                training_classes, test_vectors, testing_classes, classifier_grids)
+    return dict(result, test_accuracy=test_accuracy)
+
+
+def describe_result(result):
+    return '%.1f%%  %.2fs  %s reviews  %s %s  %s' %(result['accuracy'], result['fit_seconds'],
+                                                   result['reviews_trained'], result['classifier'],
+                                                   result['classifier_params'], result['vectorizer_params'])
+
+
+def search(db_location, method='halving', reviews_to_retrieve=5000, reviews_to_test=500, n_jobs=-1):
+    '''
+    The controlling function for the search. Takes reviews the same way classify_reviews
+    does, and splits as many validation reviews as test reviews off the training reviews.
+    Searches the default grids on the validation reviews and returns a summary, best first,
+    with the best candidate's accuracy on the test reviews.
+    Accessed from run_app.py
+    '''
+
+    training_documents, testing_documents, training_classes, testing_classes = data_prep.prep_for_classifiers(db_location, reviews_to_retrieve, reviews_to_test)
+    search_documents, validation_documents, search_classes, validation_classes = train_test_split(
+        training_documents, training_classes, test_size=len(testing_documents), stratify=training_classes, random_state=0)
+    candidates = make_candidates()
+
+    started = time.perf_counter()
+    if method == 'grid':
+        results, cache = grid_search(search_documents, search_classes, validation_documents,
+                                     validation_classes, candidates, n_jobs)
+    else:
+        results, _all_results, cache = successive_halving(search_documents, search_classes, validation_documents,
+                                                          validation_classes, candidates, n_jobs=n_jobs)
+    best = score_on_test(results[0], training_documents, training_classes, testing_documents, testing_classes)
+    seconds = time.perf_counter() - started
+
+    lines = ['%s search of %s candidates took %.1fs, vectorizer cache %s hits, %s misses'
+             %(method, len(candidates), seconds, cache['hits'], cache['misses']),
+             'Best candidate, fitted on all %s training reviews: %.1f%% on %s held-out test reviews'
+             %(len(training_documents), best['test_accuracy'], len(testing_documents)),
+             'validation %, fit seconds, reviews, classifier, vectorizer']
+    lines.extend(describe_result(result) for result in results[:10])
+    return '\n'.join(lines)
@@ -0,0 +1,258 @@
+#! usr/bin/env python3
+
+'''
+This module runs a local HTTP service that classifies reviews with a model from the
+model registry. The model is loaded once, when the service starts.
+
+Requests that arrive at about the same time are put together into one micro-batch, so the
+vectorizer and classifier are called once for the whole batch, rather than once per request.
+A batch is sent as soon as it's full, or when its first request has waited max_wait seconds.
+Texts the model has classified before are answered from a prediction cache in memory,
+without being vectorized again.
+
+POST /classify with {"review": "..."} or {"reviews": ["...", "..."]}
+GET /stats for the p50/p99 latency and throughput so far
+'''
+
+import collections
+import json
+import queue
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from application import model_registry, prediction_cache, profiler
+from application.classify_data import predict_with_cache
+
+
+class PendingRequest:
+    '''
+    One request's reviews, waiting for the batch it's in to be predicted.
+    '''
+
+    __slots__ = ('documents', 'done', 'results', 'error')
+
+    def __init__(self, documents):
+        self.documents = documents
+        self.done = threading.Event()
+        self.results = None
+        self.error = None
+
+
+class LatencyStats:
+    '''
+    Keeps the latency of recent requests, and counts of requests, reviews and batches.
+    '''
+
+    def __init__(self, window=10000):
+        self.lock = threading.Lock()
+        self.latencies = collections.deque(maxlen=window)
+        self.started = time.perf_counter()
+        self.requests = 0
+        self.reviews = 0
+        self.batches = 0
+
+    def record_request(self, latency, reviews):
+        with self.lock:
+            self.latencies.append(latency)
+            self.requests += 1
+            self.reviews += reviews
+
+    def record_batch(self):
+        with self.lock:
+            self.batches += 1
+
+    def summary(self):
+        with self.lock:
+            latencies = sorted(self.latencies)
+            elapsed = time.perf_counter() - self.started
+            requests, reviews, batches = self.requests, self.reviews, self.batches
+
+        def percentile(percent):
+            if not latencies:
+                return None
+            return latencies[int(round((percent / 100) * (len(latencies) - 1)))] * 1000
+
+        return {
+            'requests': requests,
+            'reviews': reviews,
+            'batches': batches,
+            'mean_batch_size': (reviews / batches) if batches else None,
+            'p50_latency_ms': percentile(50),
+            'p99_latency_ms': percentile(99),
+            'requests_per_second': requests / elapsed,
+            'reviews_per_second': reviews / elapsed,
+        }
+
+
+class MicroBatcher:
+    '''
+    Collects requests from many threads on a queue. One thread takes them off the queue in
+    batches and predicts each batch with a single vectorize and predict call.
+    '''
+
+    def __init__(self, vectorizer, classifier, model_version, max_batch_size=256, max_wait=0.005, cache=None):
+        self.vectorizer = vectorizer
+        self.classifier = classifier
+        self.model_version = model_version
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.stats = LatencyStats()
+        # Only the batch thread uses the cache, so it doesn't need a lock
+        self.cache = cache if cache is not None else prediction_cache.PredictionCache()
+        self.pending = queue.Queue()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def classify(self, documents):
+        '''
+        Called by each request's thread. Blocks until the batch this request is in has been predicted.
+        '''
+
+        started = time.perf_counter()
+        request = PendingRequest(documents)
+        self.pending.put(request)
+        request.done.wait()
+
+        if request.error is not None:
+            raise request.error
+
+        self.stats.record_request(time.perf_counter() - started, len(documents))
+        return request.results
+
+    def next_batch(self):
+        '''
+        Waits for a request, then keeps taking requests until the batch is full or max_wait has passed.
+        '''
+
+        batch = [self.pending.get()]
+        batch_size = len(batch[0].documents)
+        deadline = time.perf_counter() + self.max_wait
+
+        while batch_size < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                request = self.pending.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(request)
+            batch_size += len(request.documents)
+
+        return batch
+
+    def predict_batch(self, batch):
+        documents = [document for request in batch for document in request.documents]
+
+        try:
+            predictions, confidences = predict_with_cache(self.cache, self.vectorizer, self.classifier,
+                                                          self.model_version, documents)
+        except Exception as error:
+            for request in batch:
+                request.error = error
+                request.done.set()
+            return
+
+        self.stats.record_batch()
+        position = 0
+        for request in batch:
+            request_size = len(request.documents)
+            request.results = [{'label': str(prediction), 'confidence': float(confidence)}
+                               for prediction, confidence in zip(predictions[position:position + request_size],
+                                                                 confidences[position:position + request_size])]
+            position += request_size
+            request.done.set()
+
+    def run(self):
+        while True:
+            self.predict_batch(self.next_batch())
+
+
+def make_request_handler(batcher):
+    '''
+    Returns a request handler class that sends its reviews to this batcher.
+    '''
+
+    class ReviewRequestHandler(BaseHTTPRequestHandler):
+
+        def send_json(self, status, body):
+            response = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(response)))
+            self.end_headers()
+            self.wfile.write(response)
+
+        def do_GET(self):
+            if self.path == '/stats':
+                self.send_json(200, dict(batcher.stats.summary(), model_version=batcher.model_version,
+                                         prediction_cache=batcher.cache.summary()))
+            else:
+                self.send_json(404, {'error': 'Unknown path %s' %(self.path)})
+
+        def do_POST(self):
+            if self.path != '/classify':
+                self.send_json(404, {'error': 'Unknown path %s' %(self.path)})
+                return
+
+            try:
+                content_length = int(self.headers.get('Content-Length', 0))
+                body = json.loads(self.rfile.read(content_length).decode('utf-8'))
+                documents = body['reviews'] if 'reviews' in body else [body['review']]
+                # A string is iterable too, but would be classified a character at a time
+                if not isinstance(documents, list) or not all(isinstance(document, str) for document in documents):
+                    raise TypeError('The reviews must be a list of strings')
+            except (ValueError, KeyError, TypeError):
+                self.send_json(400, {'error': 'Send {"review": "..."} or {"reviews": ["...", "..."]}'})
+                return
+
+            try:
+                predictions = batcher.classify(documents) if documents else []
+            except Exception as error:
+                self.send_json(500, {'error': 'Classifying failed: %s' %(error)})
+                return
+
+            self.send_json(200, {'model_version': batcher.model_version, 'predictions': predictions})
+
+        def log_message(self, format, *args):
+            # Logging every request to stderr would cost more than classifying it
+            pass
+
+    return ReviewRequestHandler
+
+
+def make_server(host='127.0.0.1', port=8000, max_batch_size=256, max_wait=0.005, version=None,
+                registry_location=model_registry.REGISTRY_LOCATION):
+    '''
+    Loads the model and returns a server that's ready to serve_forever.
+    Port 0 lets the operating system pick a free port.
+    '''
+
+    vectorizer, classifier, metadata = model_registry.load_model(version, registry_location)
+    batcher = MicroBatcher(vectorizer, classifier, metadata['version'], max_batch_size, max_wait)
+
+    server = ThreadingHTTPServer((host, port), make_request_handler(batcher))
+    server.daemon_threads = True
+    server.batcher = batcher
+    return server
+
+
+def run_service(host='127.0.0.1', port=8000, max_batch_size=256, max_wait=0.005, version=None,
+                registry_location=model_registry.REGISTRY_LOCATION):
+    '''
+    The controlling function for the service. Runs until it's stopped with ctrl+c.
+    Accessed from run_app.py
+    '''
+
+    server = make_server(host, port, max_batch_size, max_wait, version, registry_location)
+    print('Classifying reviews with model %s at http://%s:%s/classify' %(server.batcher.model_version,
+                                                                        host, server.server_address[1]))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+    return json.dumps(server.batcher.stats.summary(), indent=2)
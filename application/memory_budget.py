@@ -0,0 +1,312 @@
+#! usr/bin/env python3
+
+'''
+This module keeps training under a memory budget, for train_classifiers --memory-budget.
+
+Before anything large is loaded, a sample of reviews is vectorized to measure how big the
+rows are, how many terms each review has, and how fast the vocabulary grows. From those, the
+memory each stage needs is estimated for the full run: the rows, the TF-IDF matrix while it's
+built, and each classifier while it's fitted. If the estimate is over the budget, the plan
+caps the features, then the number of reviews, until it fits. If even the smallest run
+doesn't fit, it fails straight away with the estimate, rather than being killed an hour in.
+
+While training, a thread samples the resident set size (RSS) of this process and its child
+processes, like parallel_tfidf's workers with --vectorize-workers, and each stage's peak is
+reported at the end. A stage going over the budget stops the run then and there. Pages a
+forked child still shares with this process are counted in both, so the RSS errs high.
+
+The estimates are rough, they're meant to catch runs that are several times too big, not
+to be exact to the megabyte.
+'''
+
+import contextlib
+import gc
+import math
+import os
+import resource
+import sys
+import threading
+import time
+
+from archive import data_prep
+
+MEMORY_UNITS = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4}
+
+# Bytes for each review's text object, its place in the batch's columns and the classes list, beyond the text itself
+ROW_OVERHEAD_BYTES = 120
+# A sparse float64 value and its int32 column index
+MATRIX_VALUE_BYTES = 12
+# The vectorizer builds the matrix from Python arrays of values and indices, then sorts and
+# sums duplicates, so building it takes a few times the memory of the finished matrix
+VECTORIZE_FACTOR = 3
+# A term in the vocabulary dict, with its string
+VOCABULARY_ENTRY_BYTES = 120
+# SVC's default kernel cache
+SVC_CACHE_BYTES = 200 * 1024 ** 2
+NYSTROEM_COMPONENTS = 500
+# The feature caps the plan tries, most features first
+FEATURE_CAPS = (None, 200000, 100000, 50000, 20000, 10000, 5000)
+
+
+def parse_memory_size(memory_size):
+    '''
+    Turns '512M', '4G' or '4GB' into bytes. A plain number is bytes.
+    '''
+
+    text = memory_size.strip().upper().rstrip('B')
+    try:
+        if text and text[-1] in MEMORY_UNITS:
+            return int(float(text[:-1]) * MEMORY_UNITS[text[-1]])
+        return int(float(text))
+    except ValueError:
+        raise ValueError('%s is not a memory size, use something like 512M or 4G' %(memory_size))
+
+
+def format_bytes(n_bytes):
+    return '%.0f MiB' %(n_bytes / (1024 * 1024))
+
+
+def current_rss_bytes():
+    '''
+    The resident set size of this process now. Where /proc isn't there, the peak so far is
+    the best getrusage can do.
+    '''
+
+    try:
+        with open('/proc/self/statm') as statm_file:
+            return int(statm_file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return peak_rss_bytes()
+
+
+def child_pids(pid):
+    '''
+    The pids of the process's children, and their children, from the parent of each process in /proc.
+    '''
+
+    children = {}
+    try:
+        entries = os.listdir('/proc')
+    except OSError:
+        return []
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open('/proc/%s/stat' %(entry)) as stat_file:
+                # The name in brackets can have spaces, the parent pid is the second field after it
+                parent_pid = int(stat_file.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, ValueError, IndexError):
+            # The process finished while we looked
+            continue
+        children.setdefault(parent_pid, []).append(int(entry))
+
+    descendants = []
+    to_visit = [pid]
+    while to_visit:
+        for child_pid in children.get(to_visit.pop(), []):
+            descendants.append(child_pid)
+            to_visit.append(child_pid)
+    return descendants
+
+
+def rss_with_children_bytes(children):
+    '''
+    The resident set size of this process and the children with these pids, leaving out any that have finished.
+    '''
+
+    rss_bytes = current_rss_bytes()
+    for child_pid in children:
+        try:
+            with open('/proc/%s/statm' %(child_pid)) as statm_file:
+                rss_bytes += int(statm_file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+        except (OSError, ValueError):
+            continue
+    return rss_bytes
+
+
+def peak_rss_bytes():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS reports bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class RssMonitor(threading.Thread):
+    '''
+    Samples the RSS of this process and its children every interval seconds, and keeps the peak of each stage.
+    '''
+
+    def __init__(self, budget_bytes=None, interval=0.01, children_interval=0.5):
+        super().__init__(daemon=True)
+        self.budget_bytes = budget_bytes
+        self.interval = interval
+        # Finding the children reads every process in /proc, so it's done less often than sampling
+        self.children_interval = children_interval
+        self.children = []
+        self.children_found = None
+        self.stage_peak = self.rss_bytes()
+        self.stages = []
+        self.stopped = threading.Event()
+
+    def rss_bytes(self):
+        now = time.monotonic()
+        if self.children_found is None or now - self.children_found >= self.children_interval:
+            self.children = child_pids(os.getpid())
+            self.children_found = now
+        return rss_with_children_bytes(self.children)
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.stage_peak = max(self.stage_peak, self.rss_bytes())
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        '''
+        Records the RSS at the start of the with block and the peak during it. Garbage is
+        collected afterwards, so whatever the stage let go of is gone before the next one.
+        Raises ValueError if the stage went over the budget.
+        '''
+
+        start_bytes = self.rss_bytes()
+        self.stage_peak = start_bytes
+        try:
+            yield
+        finally:
+            peak_bytes = max(self.stage_peak, self.rss_bytes())
+            gc.collect()
+            self.stages.append({'stage': name, 'start_bytes': start_bytes, 'peak_bytes': peak_bytes,
+                                'end_bytes': self.rss_bytes()})
+
+        if self.budget_bytes is not None and peak_bytes > self.budget_bytes:
+            raise ValueError('Stage %s peaked at %s RSS, over the memory budget of %s'
+                             %(name, format_bytes(peak_bytes), format_bytes(self.budget_bytes)))
+
+    def summary(self):
+        lines = ['stage, start RSS, peak RSS, end RSS']
+        for stage in self.stages:
+            lines.append('%s, %s, %s, %s' %(stage['stage'], format_bytes(stage['start_bytes']),
+                                            format_bytes(stage['peak_bytes']), format_bytes(stage['end_bytes'])))
+        return '\n'.join(lines)
+
+
+def measure_corpus(db_location, sample_size=2000, normalized=False, **vectorizer_params):
+    '''
+    Vectorizes a sample of reviews and returns what the estimates need: the mean bytes of a
+    review's text, the mean terms per review, and Heaps' law K and beta for how the vocabulary
+    grows with the number of tokens, fitted on half the sample and all of it.
+    '''
+
+    # Imported here, so the budget can be parsed without loading sklearn
+    from sklearn.feature_extraction.text import CountVectorizer
+
+    recommended_reviews, not_recommended_reviews = data_prep.retrieve_review_batches_balanced(db_location, sample_size, normalized)
+    documents = (recommended_reviews + not_recommended_reviews).texts
+    if len(documents) < 2:
+        raise ValueError('There are too few reviews in %s to plan training' %(db_location))
+
+    vocabulary_sizes = []
+    token_counts = []
+    for sample in (documents[::2], documents):
+        counts = CountVectorizer(**vectorizer_params).fit_transform(sample)
+        vocabulary_sizes.append(max(counts.shape[1], 1))
+        token_counts.append(max(counts.sum(), 1))
+
+    if token_counts[1] > token_counts[0] and vocabulary_sizes[1] > vocabulary_sizes[0]:
+        heaps_beta = math.log(vocabulary_sizes[1] / vocabulary_sizes[0]) / math.log(token_counts[1] / token_counts[0])
+    else:
+        heaps_beta = 0.5
+    heaps_beta = min(max(heaps_beta, 0.3), 0.9)
+
+    return {
+        'mean_text_bytes': sum(len(document) for document in documents) / len(documents),
+        'terms_per_review': counts.nnz / len(documents),
+        'tokens_per_review': token_counts[1] / len(documents),
+        'heaps_k': vocabulary_sizes[1] / (token_counts[1] ** heaps_beta),
+        'heaps_beta': heaps_beta,
+    }
+
+
+def estimate_vocabulary(corpus, n_reviews):
+    return int(corpus['heaps_k'] * (corpus['tokens_per_review'] * n_reviews) ** corpus['heaps_beta'])
+
+
+def estimate_classifier_bytes(name, n_reviews, n_features, nnz):
+    '''
+    The memory a classifier needs while it's fitted.
+    '''
+
+    if name == 'mnb':
+        # Feature counts and log probabilities for each of the 2 classes
+        return 4 * n_features * 8
+    if name in ('linear_svc', 'logistic_regression'):
+        # liblinear copies the matrix into its own format, with a double and an int per value
+        return nnz * 16 + n_reviews * 16 + 2 * n_features * 8
+    if name == 'svc':
+        return nnz * 16 + min(SVC_CACHE_BYTES, n_reviews * n_reviews * 8)
+    if name == 'nystroem_svc':
+        # The dense kernel features, and LinearSVC's copy of them
+        return 2 * n_reviews * min(NYSTROEM_COMPONENTS, n_reviews) * 8
+    return nnz * 16
+
+
+def estimate_training_memory(corpus, n_reviews, max_features, classifier_names, baseline_bytes=0):
+    '''
+    Returns the estimated peak bytes of each stage of training on n_reviews reviews.
+    The rows are let go after vectorizing, and each classifier is fitted one at a time.
+    '''
+
+    n_features = estimate_vocabulary(corpus, n_reviews)
+    if max_features is not None:
+        n_features = min(n_features, max_features)
+    nnz = int(corpus['terms_per_review'] * n_reviews)
+
+    rows_bytes = int(n_reviews * (corpus['mean_text_bytes'] + ROW_OVERHEAD_BYTES))
+    matrix_bytes = nnz * MATRIX_VALUE_BYTES + (n_reviews + 1) * 8
+    # The full vocabulary is counted before max_features cuts it down
+    vocabulary_bytes = estimate_vocabulary(corpus, n_reviews) * VOCABULARY_ENTRY_BYTES
+
+    stages = {
+        'retrieve': baseline_bytes + rows_bytes,
+        'vectorize': baseline_bytes + rows_bytes + matrix_bytes * VECTORIZE_FACTOR + vocabulary_bytes,
+    }
+    for name in classifier_names:
+        stages['fit %s' %(name)] = (baseline_bytes + matrix_bytes + n_features * VOCABULARY_ENTRY_BYTES
+                                    + estimate_classifier_bytes(name, n_reviews, n_features, nnz))
+
+    return {'n_features': n_features, 'nnz': nnz, 'stages': stages, 'peak_bytes': max(stages.values())}
+
+
+def describe_estimate(n_reviews, max_features, estimate):
+    stages = ', '.join('%s %s' %(stage, format_bytes(n_bytes)) for stage, n_bytes in estimate['stages'].items())
+    return '%s reviews, %s features%s: peak about %s (%s)' %(
+        n_reviews, estimate['n_features'], '' if max_features is None else ' (capped at %s)' %(max_features),
+        format_bytes(estimate['peak_bytes']), stages)
+
+
+def plan_training(db_location, budget_bytes, classifier_names, training_sizes, normalized=False, **vectorizer_params):
+    '''
+    Returns the largest number of training reviews, from training_sizes, and the feature cap that
+    fit in the budget, with the estimate. Fewer features are tried before fewer reviews.
+    Raises ValueError with the smallest run's estimate if nothing fits.
+    '''
+
+    corpus = measure_corpus(db_location, normalized=normalized, **vectorizer_params)
+    # Measured after the sample, so sklearn's memory is counted
+    baseline_bytes = current_rss_bytes()
+
+    smallest = None
+    for n_reviews in sorted(training_sizes, reverse=True):
+        for max_features in FEATURE_CAPS:
+            estimate = estimate_training_memory(corpus, n_reviews, max_features, classifier_names, baseline_bytes)
+            if estimate['peak_bytes'] <= budget_bytes:
+                return {'reviews_to_train': n_reviews, 'max_features': max_features, 'estimate': estimate,
+                        'corpus': corpus, 'description': describe_estimate(n_reviews, max_features, estimate)}
+            smallest = (n_reviews, max_features, estimate)
+
+    raise ValueError('Training needs more than the memory budget of %s. The smallest run, %s'
+                     %(format_bytes(budget_bytes), describe_estimate(*smallest)))
+
@@ -0,0 +1,233 @@
+#! usr/bin/env python3
+
+'''
+This module saves trained vectorizer and classifier pairs, so they can be used again
+without retraining. Each pair is saved under a version, like v1, v2, v3, with the
+training manifest, its metrics and when it was saved. One version can be promoted,
+which is the version used for classifying unless another is asked for.
+
+The fitted vectorizer and the classifier are saved with joblib without compression, which
+keeps their arrays, like the IDF weights and the coefficients, mmap-able. Loading a model
+maps those into memory and unpickles the vocabulary dict in one go, which is much faster
+than training again, or than rebuilding the vocabulary a term at a time.
+
+Registering takes a lock on the index, so two processes registering at once never get the
+same version or lose each other's entry. A version is saved into a .partial directory and
+renamed into place once every file is written, so a save that fails partway doesn't leave
+a version behind that the index doesn't know about.
+
+joblib is imported in the functions that save and load models, so listing and promoting
+models, which only read the index, start quickly.
+'''
+
+import contextlib
+import datetime
+import json
+import os
+import shutil
+import time
+
+REGISTRY_LOCATION = 'model_registry'
+LOCK_TIMEOUT = 60
+
+
+def registry_index_location(registry_location):
+    return os.path.join(registry_location, 'registry.json')
+
+
+def read_registry_index(registry_location):
+    '''
+    The index lists every version and which one is promoted. An empty registry has no index yet.
+    '''
+
+    index_location = registry_index_location(registry_location)
+    if not os.path.exists(index_location):
+        return {'next_version': 1, 'promoted': None, 'versions': []}
+
+    with open(index_location) as index_file:
+        return json.load(index_file)
+
+
+def write_registry_index(registry_location, registry_index):
+    '''
+    Writes to a temporary file first, so the index is never left half written.
+    '''
+
+    index_location = registry_index_location(registry_location)
+    temporary_location = '%s.tmp' %(index_location)
+    with open(temporary_location, 'w') as index_file:
+        json.dump(registry_index, index_file, indent=2)
+    os.replace(temporary_location, index_location)
+
+
+@contextlib.contextmanager
+def registry_lock(registry_location, timeout=LOCK_TIMEOUT):
+    '''
+    Holds the registry's lock while the index is read and written. Making a directory either
+    succeeds or fails at once, on every platform, so only one process can hold it.
+    '''
+
+    os.makedirs(registry_location, exist_ok=True)
+    lock_location = os.path.join(registry_location, 'registry.lock')
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            os.mkdir(lock_location)
+            break
+        except FileExistsError:
+            if time.monotonic() > deadline:
+                raise ValueError('The registry in %s has been locked for %ss. If no model is being registered, '
+                                 'remove %s' %(registry_location, timeout, lock_location))
+            time.sleep(0.05)
+
+    try:
+        yield
+    finally:
+        os.rmdir(lock_location)
+
+
+def save_vectorizer(vectorizer, version_location):
+    '''
+    Saves the fitted vectorizer as it is. The vocabulary is a dict, which takes about as much
+    space as its terms, and the IDF weights are an array, which can be mapped into memory.
+    '''
+
+    import joblib
+
+    joblib.dump(vectorizer, os.path.join(version_location, 'vectorizer.joblib'))
+
+
+def load_vectorizer(version_location):
+    '''
+    Loads a fitted vectorizer, with its arrays mapped into memory, rather than read.
+    '''
+
+    import joblib
+
+    return joblib.load(os.path.join(version_location, 'vectorizer.joblib'), mmap_mode='r')
+
+
+def register_model(vectorizer, classifier, manifest, metrics, registry_location=REGISTRY_LOCATION):
+    '''
+    Saves a fitted vectorizer and classifier as a new version and returns the version.
+    The manifest should say how the model was trained, like the number of reviews and the
+    classifier used. The metrics should say how well it did, like its accuracy.
+    '''
+
+    import joblib
+
+    with registry_lock(registry_location):
+        registry_index = read_registry_index(registry_location)
+
+        version = 'v%s' %(registry_index['next_version'])
+        version_location = os.path.join(registry_location, version)
+        partial_location = version_location + '.partial'
+        # Left behind if a save was killed before it could clean up
+        shutil.rmtree(partial_location, ignore_errors=True)
+        os.makedirs(partial_location)
+
+        metadata = {
+            'version': version,
+            'timestamp': datetime.datetime.now().isoformat(),
+            'vectorizer': type(vectorizer).__name__,
+            'classifier': type(classifier).__name__,
+            'manifest': manifest,
+            'metrics': metrics,
+        }
+        try:
+            save_vectorizer(vectorizer, partial_location)
+            joblib.dump(classifier, os.path.join(partial_location, 'classifier.joblib'))
+            with open(os.path.join(partial_location, 'metadata.json'), 'w') as metadata_file:
+                json.dump(metadata, metadata_file, indent=2)
+        except BaseException:
+            shutil.rmtree(partial_location, ignore_errors=True)
+            raise
+        os.rename(partial_location, version_location)
+
+        registry_index['next_version'] += 1
+        registry_index['versions'].append(metadata)
+        write_registry_index(registry_location, registry_index)
+
+    return version
+
+
+def list_models(registry_location=REGISTRY_LOCATION):
+    '''
+    Returns the metadata of every version, oldest first, marking the promoted one.
+    '''
+
+    registry_index = read_registry_index(registry_location)
+    models = []
+    for metadata in registry_index['versions']:
+        model = dict(metadata)
+        model['promoted'] = metadata['version'] == registry_index['promoted']
+        models.append(model)
+
+    return models
+
+
+def promote_model(version, registry_location=REGISTRY_LOCATION):
+    '''
+    Makes this version the one that's used when no version is asked for.
+    '''
+
+    with registry_lock(registry_location):
+        registry_index = read_registry_index(registry_location)
+        known_versions = [metadata['version'] for metadata in registry_index['versions']]
+        if version not in known_versions:
+            raise ValueError('There is no model version %s in %s' %(version, registry_location))
+
+        registry_index['promoted'] = version
+        write_registry_index(registry_location, registry_index)
+
+
+def resolve_version(version=None, registry_location=REGISTRY_LOCATION):
+    '''
+    Returns the version asked for, or the promoted version if none was asked for.
+    '''
+
+    if version is None:
+        version = read_registry_index(registry_location)['promoted']
+        if version is None:
+            raise ValueError('No model has been promoted in %s' %(registry_location))
+
+    return version
+
+
+def load_model(version=None, registry_location=REGISTRY_LOCATION):
+    '''
+    Loads a vectorizer, classifier and their metadata. If no version is given, the promoted
+    version is loaded.
+    '''
+
+    import joblib
+
+    version = resolve_version(version, registry_location)
+    version_location = os.path.join(registry_location, version)
+    if not os.path.isdir(version_location):
+        raise ValueError('There is no model version %s in %s' %(version, registry_location))
+
+    with open(os.path.join(version_location, 'metadata.json')) as metadata_file:
+        metadata = json.load(metadata_file)
+
+    vectorizer = load_vectorizer(version_location)
+    classifier = joblib.load(os.path.join(version_location, 'classifier.joblib'), mmap_mode='r')
+
+    return vectorizer, classifier, metadata
+
+
+def models_summary(registry_location=REGISTRY_LOCATION):
+    '''
+    Returns a line for each version, for run_app.py to print.
+    '''
+
+    lines = []
+    for model in list_models(registry_location):
+        marker = '*' if model['promoted'] else ' '
+        metrics = ', '.join('%s %s' %(name, value) for name, value in sorted(model['metrics'].items()))
+        lines.append('%s %s  %s  %s + %s  %s' %(marker, model['version'], model['timestamp'],
+                                                model['vectorizer'], model['classifier'], metrics))
+
+    if not lines:
+        return 'No models have been registered yet.'
+    return '\n'.join(lines)
@@ -0,0 +1,193 @@
+#! usr/bin/env python3
+
+'''
+This module finds reviews that are copies, or near copies, of earlier reviews.
+remove_duplicates_steam_reviews only removes rows that are exactly the same, but the same
+review is often pasted with a word changed, or posted once as Recommended and once as
+Not Recommended (see issues/same_review_neg_pos.png).
+
+Comparing every pair of reviews grows with the square of the number of reviews, so each review
+gets a MinHash signature instead: the smallest hash of its 3 word shingles under each of
+NUM_PERMUTATIONS hash functions. Two signatures agree in about the same share of places as
+the reviews share shingles. The signature is cut into BANDS bands, and each band is hashed to a
+bucket. Only reviews sharing a bucket are compared, which finds pairs with a similarity of
+0.8 almost every time, and pairs below 0.5 almost never.
+
+Signatures and buckets are kept in the db, so each run only hashes new reviews and looks up
+their buckets. Only the first review in each bucket is kept, and a new review is compared with
+those, so a review pasted thousands of times costs a comparison a band for each copy, not one
+for every earlier copy. Each near-duplicate is flagged in review_near_duplicates once, against
+the first review of its cluster, and data_prep can leave them out of training.
+'''
+
+import hashlib
+import zlib
+
+import numpy as np
+
+from application import database_manager, text_normalizer
+from application.review_records import ID, USER_REVIEW_TEXT
+
+SHINGLE_SIZE = 3
+NUM_PERMUTATIONS = 64
+BANDS = 16
+ROWS_PER_BAND = NUM_PERMUTATIONS // BANDS
+SIMILARITY_THRESHOLD = 0.8
+
+# The largest prime below 2**32, so hashes of 32 bit shingles stay distinct
+MERSENNE_PRIME = 4294967291
+_permutations = np.random.RandomState(1).randint(1, MERSENNE_PRIME, size=(2, NUM_PERMUTATIONS), dtype=np.int64)
+PERMUTATION_A = _permutations[0].astype(np.uint64)
+PERMUTATION_B = _permutations[1].astype(np.uint64)
+
+
+def make_shingles(review_text):
+    '''
+    Returns the set of 3 word shingles of the normalized review. Reviews shorter than that are one shingle.
+    '''
+
+    tokens = text_normalizer.normalize_review_text(review_text).split()
+    if len(tokens) <= SHINGLE_SIZE:
+        return {' '.join(tokens)}
+
+    return {' '.join(tokens[index:index + SHINGLE_SIZE]) for index in range(len(tokens) - SHINGLE_SIZE + 1)}
+
+
+def minhash_signature(shingles):
+    '''
+    Returns the smallest (a * shingle + b) mod p of the shingles for each permutation, as uint32.
+    '''
+
+    shingle_hashes = np.array([zlib.crc32(shingle.encode('utf-8')) for shingle in shingles], dtype=np.uint64)
+    # a and shingle are both under 2**32, so a * shingle + b fits in 64 bits
+    hashes = (np.outer(shingle_hashes, PERMUTATION_A) + PERMUTATION_B) % MERSENNE_PRIME
+    return hashes.min(axis=0).astype(np.uint32)
+
+
+def band_buckets(signature):
+    '''
+    Returns a bucket for each band of the signature, as a signed 64 bit int for sqlite.
+    '''
+
+    buckets = []
+    for band in range(BANDS):
+        band_bytes = signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND].tobytes()
+        digest = hashlib.blake2b(band_bytes, digest_size=8).digest()
+        buckets.append(int.from_bytes(digest, 'little', signed=True))
+
+    return buckets
+
+
+def estimated_similarity(signature, other_signature):
+    '''
+    The share of places the signatures agree in, which estimates the Jaccard similarity of the shingles.
+    '''
+
+    return float(np.mean(signature == other_signature))
+
+
+def signature_from_blob(blob):
+    return np.frombuffer(blob, dtype=np.uint32)
+
+
+def find_new_near_duplicates(db_location, rows, threshold=SIMILARITY_THRESHOLD):
+    '''
+    Takes (id, user_review_text) rows, saves their signatures and buckets, and returns the
+    (review_id, duplicate_of, similarity) of each new review similar to an earlier one.
+    A review is matched with the most similar of the first reviews in its buckets, and duplicate_of
+    is the first review of that one's cluster. The similarity is to the review it was matched with.
+    '''
+
+    signatures = {review_id: minhash_signature(make_shingles(review_text)) for review_id, review_text in rows}
+    bands = [(band, bucket, review_id) for review_id, signature in signatures.items()
+             for band, bucket in enumerate(band_buckets(signature))]
+
+    candidates = database_manager.insert_minhashes_find_candidates(
+        db_location, [(review_id, signature.tobytes()) for review_id, signature in signatures.items()], bands)
+
+    earlier_ids = {candidate_id for _review_id, candidate_id in candidates if candidate_id not in signatures}
+    earlier_signatures = database_manager.retrieve_minhash_signatures(db_location, earlier_ids)
+    for review_id, blob in earlier_signatures.items():
+        signatures[review_id] = signature_from_blob(blob)
+
+    matches = {}
+    for review_id, candidate_id in candidates:
+        similarity = estimated_similarity(signatures[review_id], signatures[candidate_id])
+        if similarity >= threshold and similarity > matches.get(review_id, (None, 0))[1]:
+            matches[review_id] = (candidate_id, similarity)
+
+    clusters = database_manager.retrieve_near_duplicate_clusters(db_location, earlier_ids)
+    near_duplicates = []
+    # Earlier reviews come first, so a review in this batch has its cluster before later reviews are matched with it
+    for review_id in sorted(matches):
+        candidate_id, similarity = matches[review_id]
+        clusters[review_id] = clusters.get(candidate_id, candidate_id)
+        near_duplicates.append((review_id, clusters[review_id], similarity))
+
+    return near_duplicates
+
+
+def find_near_duplicates(db_location, chunk_size=1000, threshold=SIMILARITY_THRESHOLD):
+    '''
+    Hashes the reviews added since the last run and flags the ones that are near-duplicates
+    of earlier reviews. Returns the number of reviews hashed and the number flagged.
+    Accessed from run_app.py
+    '''
+
+    database_manager.create_near_duplicate_tables(db_location)
+    start_id = database_manager.retrieve_last_minhashed_review_id(db_location)
+
+    reviews_hashed = 0
+    duplicates_found = 0
+    for rows in database_manager.stream_steam_reviews(db_location, chunk_size, start_id):
+        near_duplicates = find_new_near_duplicates(db_location, [(row[ID], row[USER_REVIEW_TEXT]) for row in rows], threshold)
+        database_manager.insert_near_duplicates(db_location, near_duplicates)
+        reviews_hashed += len(rows)
+        duplicates_found += len(near_duplicates)
+
+    return reviews_hashed, duplicates_found
+
+
+def cluster_near_duplicates(near_duplicates):
+    '''
+    Groups the flagged reviews into clusters of reviews that are all copies of each other,
+    directly or through other copies. Returns a list of sorted id lists, largest first.
+    '''
+
+    parents = {}
+
+    def find(review_id):
+        parents.setdefault(review_id, review_id)
+        while parents[review_id] != review_id:
+            parents[review_id] = parents[parents[review_id]]
+            review_id = parents[review_id]
+        return review_id
+
+    for review_id, duplicate_of, *_rest in near_duplicates:
+        root, other_root = find(review_id), find(duplicate_of)
+        if root != other_root:
+            parents[max(root, other_root)] = min(root, other_root)
+
+    clusters = {}
+    for review_id in parents:
+        clusters.setdefault(find(review_id), []).append(review_id)
+
+    return sorted((sorted(cluster) for cluster in clusters.values()), key=lambda cluster: (-len(cluster), cluster[0]))
+
+
+def near_duplicates_summary(db_location):
+    '''
+    Returns how many reviews were flagged, how many of those contradict the review they copy,
+    and the largest clusters.
+    '''
+
+    near_duplicates = database_manager.retrieve_near_duplicates(db_location)
+    clusters = cluster_near_duplicates(near_duplicates)
+    conflicting = sum(1 for near_duplicate in near_duplicates if near_duplicate[3])
+
+    lines = ['%s near-duplicate reviews, %s with opposite recommendations, in %s clusters'
+             %(len(near_duplicates), conflicting, len(clusters))]
+    for cluster in clusters[:10]:
+        lines.append('%s reviews: %s' %(len(cluster), ', '.join(str(review_id) for review_id in cluster[:20])))
+
+    return '\n'.join(lines)
@@ -0,0 +1,265 @@
+#! usr/bin/env python3
+
+'''
+This module fits a TfidfVectorizer with worker processes, map-reduce style, since tokenizing
+and counting is the longest single step of a training run and TfidfVectorizer does it on one core.
+
+The documents are split into contiguous slices, one per worker. Each worker tokenizes and
+counts its slice with the vectorizer's own analyzer (the map), and sends back only its terms
+and their document and total counts. Those are merged into one vocabulary, pruned with min_df,
+max_df and max_features, and the IDF weights are worked out from the merged document
+frequencies (the reduce). The merged vocabulary is sent to each worker, which turns the counts
+it kept into tf-idf rows, and the rows are stacked in order. The count matrices never leave
+the workers, so only the vocabularies and the finished rows are pickled.
+
+The result is the same, to the last bit, as TfidfVectorizer.fit_transform, binary and dtype
+included. The terms are numbered in the order they're first seen across all the slices, as
+TfidfVectorizer numbers them, so the terms in each row are kept, and summed, in the same order too.
+A fixed vocabulary or use_idf=False aren't supported, and raise ValueError.
+'''
+
+from multiprocessing import Pipe, Process
+
+import numpy as np
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import TfidfTransformer, TfidfVectorizer
+
+PRUNING_SETTINGS = ('min_df', 'max_df', 'max_features')
+# Parameters the workers can't honour, with the value they have to keep
+UNSUPPORTED_SETTINGS = {'vocabulary': None, 'use_idf': True}
+
+
+def split_documents(documents, parts):
+    '''
+    Splits the documents into this many contiguous slices, as even as they can be.
+    '''
+
+    slice_size, remainder = divmod(len(documents), parts)
+    slices = []
+    start = 0
+    for part in range(parts):
+        end = start + slice_size + (part < remainder)
+        slices.append(documents[start:end])
+        start = end
+
+    return slices
+
+
+def count_terms(documents, vectorizer_params):
+    '''
+    The map. Counts the terms in each document, numbering them in the order they're first seen.
+    Returns the terms in that order, the counts as a CSR matrix, and each term's document and total counts.
+    With binary, each term counts once in a document, as TfidfVectorizer counts it.
+    '''
+
+    analyze = TfidfVectorizer(**vectorizer_params).build_analyzer()
+    vocabulary = {}
+    indices = []
+    values = []
+    indptr = [0]
+    for document in documents:
+        term_counts = {}
+        for term in analyze(document):
+            term_index = vocabulary.setdefault(term, len(vocabulary))
+            term_counts[term_index] = term_counts.get(term_index, 0) + 1
+        indices.extend(term_counts)
+        values.extend(term_counts.values())
+        indptr.append(len(indices))
+
+    counts = sp.csr_matrix((np.array(values, dtype=np.float64), np.array(indices, dtype=np.int64), np.array(indptr, dtype=np.int64)),
+                           shape=(len(documents), len(vocabulary)))
+    counts.sort_indices()
+    if vectorizer_params.get('binary', False):
+        counts.data.fill(1)
+    document_frequencies = np.bincount(counts.indices, minlength=len(vocabulary))
+    term_frequencies = np.asarray(counts.sum(axis=0)).ravel()
+    return list(vocabulary), counts, document_frequencies, term_frequencies
+
+
+def document_limit(setting, n_documents):
+    '''
+    min_df and max_df are counts of documents if they're ints, or shares of the documents if they're floats.
+    '''
+
+    return setting if isinstance(setting, (int, np.integer)) else setting * n_documents
+
+
+def merge_counts(term_lists, document_frequency_lists, term_frequency_lists, n_documents, min_df=1, max_df=1.0,
+                 max_features=None):
+    '''
+    The reduce. Merges each slice's counts into one vocabulary, numbered in the order the terms
+    are first seen, and prunes it with the same steps as TfidfVectorizer, so the columns and the
+    ties for max_features come out the same. Returns the kept terms, sorted, their document
+    frequencies, and the number each was first seen as, which orders the terms in each row.
+    '''
+
+    first_seen = {}
+    first_seen_numbers = [np.fromiter((first_seen.setdefault(term, len(first_seen)) for term in terms), dtype=np.int64,
+                                      count=len(terms))
+                          for terms in term_lists]
+    if not first_seen:
+        raise ValueError('empty vocabulary; perhaps the documents only contain stop words')
+
+    terms = list(first_seen)
+    document_frequencies = np.zeros(len(terms), dtype=np.int64)
+    term_frequencies = np.zeros(len(terms), dtype=np.float64)
+    for numbers, slice_document_frequencies, slice_term_frequencies in zip(first_seen_numbers, document_frequency_lists,
+                                                                           term_frequency_lists):
+        # Each term is only once in a slice's terms, so these don't collide
+        document_frequencies[numbers] += slice_document_frequencies
+        term_frequencies[numbers] += slice_term_frequencies
+
+    high = document_limit(max_df, n_documents)
+    low = document_limit(min_df, n_documents)
+    if high < low:
+        raise ValueError('max_df corresponds to < documents than min_df')
+
+    # With max_features, the terms are sorted before they're pruned, so ties go to the first alphabetically
+    if max_features is not None:
+        order = sorted(range(len(terms)), key=terms.__getitem__)
+        terms = [terms[number] for number in order]
+        document_frequencies = document_frequencies[order]
+        term_frequencies = term_frequencies[order]
+
+    mask = (document_frequencies <= high) & (document_frequencies >= low)
+    if max_features is not None and mask.sum() > max_features:
+        mask_indices = (-term_frequencies[mask]).argsort()[:max_features]
+        limited_mask = np.zeros(len(mask), dtype=bool)
+        limited_mask[np.where(mask)[0][mask_indices]] = True
+        mask = limited_mask
+    kept = np.where(mask)[0]
+    if len(kept) == 0:
+        raise ValueError('After pruning, no terms remain. Try a lower min_df or a higher max_df.')
+    terms = [terms[index] for index in kept]
+    document_frequencies = document_frequencies[kept]
+
+    # Without max_features, the kept terms are sorted after pruning
+    if max_features is None:
+        order = sorted(range(len(terms)), key=terms.__getitem__)
+        terms = [terms[index] for index in order]
+        document_frequencies = document_frequencies[order]
+
+    column_first_seen = np.fromiter((first_seen[term] for term in terms), dtype=np.int64, count=len(terms))
+    return terms, document_frequencies, column_first_seen
+
+
+def smooth_idf_weights(document_frequencies, n_documents, smooth_idf=True, dtype=np.float64):
+    '''
+    The IDF weights, worked out with the same steps as TfidfTransformer.fit, so they're the same to the last bit.
+    '''
+
+    document_frequencies = document_frequencies.astype(dtype)
+    document_frequencies += float(smooth_idf)
+    idf_weights = np.full_like(document_frequencies, fill_value=n_documents + int(smooth_idf), dtype=dtype)
+    idf_weights /= document_frequencies
+    np.log(idf_weights, out=idf_weights)
+    idf_weights += 1.0
+    return idf_weights
+
+
+def assemble_rows(terms, counts, vocabulary, column_first_seen, transformer, dtype=np.float64):
+    '''
+    Turns a slice's counts into tf-idf rows with the merged vocabulary, leaving out the pruned terms.
+    The terms in each row are put in the order they were first seen across all the slices, which
+    is the order TfidfVectorizer keeps them in, then numbered by their columns.
+    '''
+
+    local_columns = np.fromiter((vocabulary.get(term, -1) for term in terms), dtype=np.int64, count=len(terms))
+    entry_columns = local_columns[counts.indices]
+    kept = entry_columns >= 0
+    indptr = np.concatenate(([0], np.cumsum(kept)))[counts.indptr]
+
+    # Numbered by when they were first seen, the terms sort into TfidfVectorizer's order
+    first_seen_order = np.argsort(column_first_seen)
+    ranks = np.searchsorted(column_first_seen[first_seen_order], column_first_seen[entry_columns[kept]])
+    ordered = sp.csr_matrix((counts.data[kept].astype(dtype), ranks, indptr), shape=(counts.shape[0], len(column_first_seen)))
+    ordered.sort_indices()
+    ordered.indices = first_seen_order[ordered.indices].astype(ordered.indices.dtype)
+
+    return transformer.transform(ordered, copy=False)
+
+
+def count_and_assemble(documents, vectorizer_params, dtype, connection):
+    '''
+    Runs in each worker process. Counts the slice and sends its terms' totals, waits for the merged
+    vocabulary, then sends the slice's tf-idf rows. Anything that goes wrong is sent instead.
+    '''
+
+    try:
+        terms, counts, document_frequencies, term_frequencies = count_terms(documents, vectorizer_params)
+        connection.send((terms, document_frequencies, term_frequencies))
+        merged = connection.recv()
+        # None if the merge failed, so there's nothing to assemble
+        if merged is not None:
+            connection.send(assemble_rows(terms, counts, *merged, dtype=dtype))
+    except Exception as error:
+        connection.send(error)
+    finally:
+        connection.close()
+
+
+def receive(connection):
+    message = connection.recv()
+    if isinstance(message, Exception):
+        raise message
+    return message
+
+
+def fit_transform_parallel(documents, workers=2, **vectorizer_params):
+    '''
+    Fits a TfidfVectorizer on the documents with this many processes. Returns the vectors,
+    the same as TfidfVectorizer(**vectorizer_params).fit_transform would, and the vectorizer,
+    with its vocabulary and IDF weights, ready to transform.
+    '''
+
+    for setting, supported_value in UNSUPPORTED_SETTINGS.items():
+        if vectorizer_params.get(setting, supported_value) is not supported_value:
+            raise ValueError('Fitting with more than one worker doesn\'t support %s=%r' %(setting, vectorizer_params[setting]))
+
+    template = TfidfVectorizer(**vectorizer_params)
+    counting_params = {name: value for name, value in vectorizer_params.items() if name not in PRUNING_SETTINGS}
+    slices = split_documents(list(documents), workers)
+
+    connections = []
+    processes = []
+    for document_slice in slices:
+        connection, worker_connection = Pipe()
+        process = Process(target=count_and_assemble, args=(document_slice, counting_params, template.dtype, worker_connection),
+                          daemon=True)
+        process.start()
+        worker_connection.close()
+        connections.append(connection)
+        processes.append(process)
+
+    try:
+        counted = [receive(connection) for connection in connections]
+        term_lists, document_frequency_lists, term_frequency_lists = zip(*counted)
+
+        n_documents = len(documents)
+        try:
+            terms, document_frequencies, column_first_seen = merge_counts(
+                term_lists, document_frequency_lists, term_frequency_lists, n_documents, template.min_df, template.max_df,
+                template.max_features)
+        except ValueError:
+            for connection in connections:
+                connection.send(None)
+            raise
+
+        transformer = TfidfTransformer(norm=template.norm, use_idf=template.use_idf, smooth_idf=template.smooth_idf,
+                                       sublinear_tf=template.sublinear_tf)
+        transformer.idf_ = smooth_idf_weights(document_frequencies, n_documents, template.smooth_idf, template.dtype)
+        vocabulary = {term: column for column, term in enumerate(terms)}
+        for connection in connections:
+            connection.send((vocabulary, column_first_seen, transformer))
+        rows = [receive(connection) for connection in connections]
+    finally:
+        for connection in connections:
+            connection.close()
+        for process in processes:
+            process.join()
+
+    # The vocabulary is set as it is, rather than given as a list the vectorizer checks and turns into a dict itself
+    vectorizer = TfidfVectorizer(**counting_params)
+    vectorizer.vocabulary_ = vocabulary
+    vectorizer.idf_ = transformer.idf_
+    return sp.vstack(rows, format='csr'), vectorizer
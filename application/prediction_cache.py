@@ -0,0 +1,129 @@
+#! usr/bin/env python3
+
+'''
+This module caches predictions, so a review text that's been classified before isn't
+vectorized and predicted again. A lot of Steam reviews are the same few words, like
+"10/10" or "good game", or copies, or the same review scraped twice.
+
+A prediction is kept under the model version and a hash of the review's normalized text,
+so texts that only differ in case, punctuation or spacing share one prediction. The default
+vectorizer gives those texts the same vector anyway, and so does a saved model trained on
+normalized text, which normalizes the text itself. Vectorizers that tokenize differently are
+keyed on the raw text instead, so the cache never changes a prediction.
+
+Recently used predictions are kept in memory. If the cache has a db, predictions are saved
+to its prediction_cache table too, so they're kept between runs and shared between
+processes. Both are bounded, and the least recently used predictions are dropped first.
+The table is only counted and cut down to size every trim_interval predictions a cache saves,
+and the first time it saves, so it can go over max_entries by that many in between.
+'''
+
+import collections
+import hashlib
+import time
+
+from application import database_manager
+from application.text_normalizer import TOKEN_PATTERN, normalize_review_text
+
+
+def keys_normalized_text(vectorizer):
+    '''
+    Whether the vectorizer only sees the normalized text, so it's safe to key on that.
+    That's true of word vectorizers that lowercase and use the default token pattern,
+    and of those text_normalizer.for_raw_text made, which normalize the text and split it on spaces.
+    '''
+
+    if (getattr(vectorizer, 'analyzer', None) == 'word' and getattr(vectorizer, 'preprocessor', None) is normalize_review_text
+            and getattr(vectorizer, 'tokenizer', None) is str.split):
+        return True
+
+    return (getattr(vectorizer, 'analyzer', None) == 'word' and getattr(vectorizer, 'lowercase', False)
+            and getattr(vectorizer, 'token_pattern', None) == TOKEN_PATTERN.pattern
+            and getattr(vectorizer, 'tokenizer', None) is None and getattr(vectorizer, 'preprocessor', None) is None
+            and getattr(vectorizer, 'strip_accents', None) is None)
+
+
+def text_key(review_text, normalize=True):
+    if normalize:
+        review_text = normalize_review_text(review_text)
+    return hashlib.blake2b(review_text.encode('utf-8'), digest_size=16).digest()
+
+
+class PredictionCache:
+    '''
+    An LRU cache of (predicted_label, confidence) by model version and text hash, in memory
+    and, if db_location is given, in the db. Counts hits and misses for the hit rate.
+    '''
+
+    def __init__(self, db_location=None, max_entries=1000000, memory_entries=100000, trim_interval=10000):
+        self.db_location = db_location
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self.trim_interval = trim_interval
+        # Other processes may have filled the table, so it's trimmed the first time this cache saves
+        self.stored_since_trim = trim_interval
+        self.memory = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+        if db_location is not None:
+            database_manager.create_prediction_cache(db_location)
+
+    def remember(self, model_version, text_hash, prediction):
+        self.memory[(model_version, text_hash)] = prediction
+        self.memory.move_to_end((model_version, text_hash))
+        while len(self.memory) > self.memory_entries:
+            self.memory.popitem(last=False)
+
+    def lookup(self, model_version, text_hashes):
+        '''
+        Returns the cached (predicted_label, confidence) by text hash, for the hashes that are cached.
+        '''
+
+        found = {}
+        not_in_memory = []
+        for text_hash in text_hashes:
+            prediction = self.memory.get((model_version, text_hash))
+            if prediction is None:
+                not_in_memory.append(text_hash)
+            else:
+                self.memory.move_to_end((model_version, text_hash))
+                found[text_hash] = prediction
+
+        if self.db_location is not None and not_in_memory:
+            for text_hash, predicted_label, confidence in database_manager.retrieve_cached_predictions(
+                    self.db_location, model_version, not_in_memory, time.time()):
+                found[text_hash] = (predicted_label, confidence)
+                self.remember(model_version, text_hash, found[text_hash])
+
+        return found
+
+    def store(self, model_version, predictions):
+        '''
+        Takes a dict of (predicted_label, confidence) by text hash.
+        '''
+
+        for text_hash, prediction in predictions.items():
+            self.remember(model_version, text_hash, prediction)
+
+        if self.db_location is not None and predictions:
+            last_used = time.time()
+            self.stored_since_trim += len(predictions)
+            trim = self.stored_since_trim >= self.trim_interval
+            database_manager.insert_cached_predictions(self.db_location, [
+                (model_version, text_hash, predicted_label, confidence, last_used)
+                for text_hash, (predicted_label, confidence) in predictions.items()], self.max_entries if trim else None)
+            if trim:
+                self.stored_since_trim = 0
+
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else None
+
+    def summary(self):
+        return {'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hit_rate(), 'memory_entries': len(self.memory)}
+
+    def summary_line(self):
+        hit_rate = self.hit_rate()
+        return 'Prediction cache: %s hits, %s misses (%s hit rate)' %(
+            self.hits, self.misses, 'no' if hit_rate is None else '%.1f%%' %(hit_rate * 100))
@@ -0,0 +1,239 @@
+#! usr/bin/env python3
+
+'''
+This module profiles a run_app.py command, when it's run with --profile.
+
+The whole command runs under cProfile, which is dumped to profile.prof for pstats or
+snakeviz, with the hottest functions written to summary.txt. tracemalloc runs alongside, so the
+peak memory of the command is in the summary too.
+
+The scraper, database_manager and the training and classifying modules mark their phases,
+fetch, parse, db, vectorize, fit and predict, with phase() or timed(). Each phase's calls,
+seconds and peak memory are added up, so time can be put down to a phase without reading
+the cProfile output. When profiling is off, phase() only checks one global, so the hooks can
+stay in the hot paths.
+
+tracemalloc only has one peak for the whole process, so a phase's peak memory counts what every
+thread allocated while it ran. Only phases in the thread that started profiling measure a peak,
+since resetting it from another thread, like load_test's workers, would cut the peaks of the
+phases running there short. Phases in other threads add their calls and seconds, which don't
+need a stack of running phases. Phases in child processes, like a Pool's workers, aren't counted.
+
+With --sample-stacks, a thread also records the main thread's stack every few milliseconds.
+That counts time spent waiting, like on Steam or a db lock, which cProfile only shows as the
+call that waited. The stacks are written to stacks.txt in the folded format flamegraph tools read.
+'''
+
+import cProfile
+import contextlib
+import functools
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+
+PHASES = ('fetch', 'parse', 'db', 'vectorize', 'fit', 'predict')
+PROFILE_LOCATION = 'profile'
+
+# None unless a command is being profiled
+_profile_state = None
+
+
+def new_profile_state():
+    return {
+        'phases': {name: {'calls': 0, 'seconds': 0.0, 'peak_bytes': 0} for name in PHASES},
+        # The peak memory of each phase that's running in the profiling thread, innermost last
+        'running_peaks': [],
+        # The peak memory of the whole command, kept as each phase resets tracemalloc's peak
+        'overall_peak': 0,
+        'thread_id': threading.get_ident(),
+        'pid': os.getpid(),
+        # Phases in other threads add to the totals too
+        'lock': threading.Lock(),
+    }
+
+
+@contextlib.contextmanager
+def phase(name):
+    '''
+    Adds the time and peak memory of the with block to the phase.
+    Phases can be nested, so a db call inside vectorizing counts towards both.
+    Outside the profiling thread only the time is added, and in a child process nothing is.
+    '''
+
+    profile_state = _profile_state
+    if profile_state is None or profile_state['pid'] != os.getpid():
+        yield
+        return
+
+    if profile_state['thread_id'] != threading.get_ident():
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            add_to_phase(profile_state, name, time.perf_counter() - started, 0)
+        return
+
+    running_peaks = profile_state['running_peaks']
+    # reset_peak below forgets the peak so far, so it's kept for the command and the phase outside this one
+    peak_so_far = tracemalloc.get_traced_memory()[1]
+    profile_state['overall_peak'] = max(profile_state['overall_peak'], peak_so_far)
+    if running_peaks:
+        running_peaks[-1] = max(running_peaks[-1], peak_so_far)
+    tracemalloc.reset_peak()
+    running_peaks.append(0)
+    started = time.perf_counter()
+
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - started
+        peak_bytes = max(running_peaks.pop(), tracemalloc.get_traced_memory()[1])
+        if running_peaks:
+            running_peaks[-1] = max(running_peaks[-1], peak_bytes)
+        profile_state['overall_peak'] = max(profile_state['overall_peak'], peak_bytes)
+        add_to_phase(profile_state, name, seconds, peak_bytes)
+
+
+def add_to_phase(profile_state, name, seconds, peak_bytes):
+    with profile_state['lock']:
+        phase_totals = profile_state['phases'].setdefault(name, {'calls': 0, 'seconds': 0.0, 'peak_bytes': 0})
+        phase_totals['calls'] += 1
+        phase_totals['seconds'] += seconds
+        phase_totals['peak_bytes'] = max(phase_totals['peak_bytes'], peak_bytes)
+
+
+def timed(name):
+    '''
+    A decorator that runs the function in phase(name).
+    Don't use it on generators, it would only time making the generator.
+    '''
+
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if _profile_state is None:
+                return function(*args, **kwargs)
+            with phase(name):
+                return function(*args, **kwargs)
+        return wrapper
+
+    return decorator
+
+
+class StackSampler(threading.Thread):
+    '''
+    Records the stack of a thread every interval seconds, counting how often each stack is seen.
+    '''
+
+    def __init__(self, thread_id, interval=0.005):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stack_counts = {}
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append('%s (%s:%s)' %(code.co_name, os.path.basename(code.co_filename), code.co_firstlineno))
+                frame = frame.f_back
+            if stack:
+                folded = ';'.join(reversed(stack))
+                self.stack_counts[folded] = self.stack_counts.get(folded, 0) + 1
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+    def folded_stacks(self):
+        return '\n'.join('%s %s' %(stack, count) for stack, count
+                         in sorted(self.stack_counts.items(), key=lambda item: item[1], reverse=True))
+
+
+def format_bytes(n_bytes):
+    return '%.1f MiB' %(n_bytes / (1024 * 1024))
+
+
+def phases_summary(phases):
+    lines = ['phase, calls, seconds, peak memory']
+    for name, totals in phases.items():
+        if totals['calls']:
+            lines.append('%s, %s, %.3f, %s' %(name, totals['calls'], totals['seconds'], format_bytes(totals['peak_bytes'])))
+    return '\n'.join(lines)
+
+
+def hot_functions(profile, top_n):
+    '''
+    Returns the pstats listing of the top_n functions by their own time, then by cumulative time.
+    '''
+
+    stream = io.StringIO()
+    stats = pstats.Stats(profile, stream=stream)
+    stats.sort_stats('tottime').print_stats(top_n)
+    stats.sort_stats('cumulative').print_stats(top_n)
+    return stream.getvalue()
+
+
+def profile_command(function, *args, output_location=PROFILE_LOCATION, top_n=25, sample_stacks=False,
+                    sample_interval=0.005):
+    '''
+    Runs function(*args) under cProfile and tracemalloc, with the phase hooks on, and writes
+    profile.prof, summary.txt and, if sample_stacks is True, stacks.txt to output_location.
+    The files are written when the function is stopped with ctrl+c too, since the scraper
+    only stops that way. Returns the function's result.
+    Accessed from run_app.py
+    '''
+
+    global _profile_state
+
+    os.makedirs(output_location, exist_ok=True)
+    sampler = None
+    if sample_stacks:
+        sampler = StackSampler(threading.get_ident(), sample_interval)
+        sampler.start()
+
+    _profile_state = new_profile_state()
+    tracemalloc.start()
+    profile = cProfile.Profile()
+    started = time.perf_counter()
+    result = None
+
+    try:
+        profile.enable()
+        try:
+            result = function(*args)
+        finally:
+            profile.disable()
+    except KeyboardInterrupt:
+        result = 'Stopped'
+    finally:
+        seconds = time.perf_counter() - started
+        peak_bytes = max([tracemalloc.get_traced_memory()[1], _profile_state['overall_peak']] + _profile_state['running_peaks'])
+        tracemalloc.stop()
+        phases = _profile_state['phases']
+        _profile_state = None
+        if sampler is not None:
+            sampler.stop()
+
+        profile.dump_stats(os.path.join(output_location, 'profile.prof'))
+        with open(os.path.join(output_location, 'summary.txt'), 'w') as summary_file:
+            summary_file.write('Took %.3f seconds, peak memory %s\n\n' %(seconds, format_bytes(peak_bytes)))
+            summary_file.write(phases_summary(phases))
+            summary_file.write('\n\n')
+            summary_file.write(hot_functions(profile, top_n))
+        if sampler is not None:
+            with open(os.path.join(output_location, 'stacks.txt'), 'w') as stacks_file:
+                stacks_file.write(sampler.folded_stacks())
+
+        print('Took %.3f seconds, peak memory %s' %(seconds, format_bytes(peak_bytes)))
+        print(phases_summary(phases))
+        print('Profile written to %s' %(output_location))
+
+    return result
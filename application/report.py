@@ -0,0 +1,103 @@
+#! usr/bin/env python3
+
+'''
+This module makes the report for the make_report command. Everything in it comes from the
+report tables database_manager keeps up to date with triggers as reviews are scraped and
+classified: reviews by app, by day and by length, and each model's accuracy by day. Those
+tables grow with the number of apps, days and models, not reviews, so making a report
+takes the same time however many reviews have been scraped.
+
+The report is written as a CSV file for each table and one HTML page, which can be opened
+without the database.
+'''
+
+import csv
+import html
+import os
+
+from application import database_manager, model_registry
+
+REPORT_LOCATION = 'report'
+
+
+def collect_report(db_location, registry_location=model_registry.REGISTRY_LOCATION):
+    '''
+    Returns a list of (name, title, header, rows) for each table in the report.
+    '''
+
+    database_manager.create_steam_reviews(db_location)
+    database_manager.create_review_predictions(db_location)
+
+    accuracy_rows = [(model_version, day, classified, correct, round(100.0 * correct / classified, 1))
+                     for model_version, day, classified, correct
+                     in database_manager.retrieve_report_classification_accuracy(db_location)]
+
+    training_rows = []
+    if os.path.exists(registry_location):
+        for model in model_registry.list_models(registry_location):
+            # Streaming models only have the accuracy of testing each chunk before training on it
+            accuracy = model['metrics'].get('accuracy', model['metrics'].get('running_accuracy', ''))
+            training_rows.append((model['version'], model['timestamp'], model['classifier'], accuracy,
+                                  '*' if model['promoted'] else ''))
+
+    return [
+        ('apps', 'Reviews by app', ('app_num', 'user_recommendation', 'reviews', 'mean_length'),
+         database_manager.retrieve_report_app_counts(db_location)),
+        ('days', 'Reviews by day scraped', ('day', 'user_recommendation', 'reviews'),
+         database_manager.retrieve_report_daily_counts(db_location)),
+        ('lengths', 'Reviews by length in characters', ('length_from', 'user_recommendation', 'reviews'),
+         database_manager.retrieve_report_length_counts(db_location)),
+        ('classification_accuracy', 'Accuracy of classified reviews by model and day',
+         ('model_version', 'day', 'reviews_classified', 'reviews_correct', 'accuracy'), accuracy_rows),
+        ('training_accuracy', 'Accuracy of registered models when trained',
+         ('model_version', 'timestamp', 'classifier', 'accuracy', 'promoted'), training_rows),
+    ]
+
+
+def write_csv_report(report, output_location):
+    for name, _title, header, rows in report:
+        with open(os.path.join(output_location, '%s.csv' %(name)), 'w', newline='') as csv_file:
+            writer = csv.writer(csv_file)
+            writer.writerow(header)
+            writer.writerows(rows)
+
+
+def render_html_report(report):
+    '''
+    Returns the report as one HTML page, with a table for each part.
+    '''
+
+    parts = ['<!DOCTYPE html>', '<html><head><meta charset="utf-8"><title>Steam reviews report</title></head><body>',
+             '<h1>Steam reviews report</h1>']
+
+    for _name, title, header, rows in report:
+        parts.append('<h2>%s</h2>' %(html.escape(title)))
+        if not rows:
+            parts.append('<p>Nothing yet.</p>')
+            continue
+
+        parts.append('<table border="1">')
+        parts.append('<tr>%s</tr>' %(''.join('<th>%s</th>' %(html.escape(column)) for column in header)))
+        for row in rows:
+            parts.append('<tr>%s</tr>' %(''.join('<td>%s</td>' %(html.escape(str(value))) for value in row)))
+        parts.append('</table>')
+
+    parts.append('</body></html>')
+    return '\n'.join(parts)
+
+
+def make_report(db_location, output_location=REPORT_LOCATION, registry_location=model_registry.REGISTRY_LOCATION):
+    '''
+    Writes the CSV files and report.html to output_location, and returns where they are.
+    Accessed from run_app.py
+    '''
+
+    report = collect_report(db_location, registry_location)
+
+    os.makedirs(output_location, exist_ok=True)
+    write_csv_report(report, output_location)
+    with open(os.path.join(output_location, 'report.html'), 'w') as html_file:
+        html_file.write(render_html_report(report))
+
+    total_reviews = sum(row[2] for row in report[0][3])
+    return 'Report of %s reviews written to %s' %(total_reviews, os.path.join(output_location, 'report.html'))
@@ -0,0 +1,94 @@
+#! usr/bin/env python3
+
+'''
+This module has the records reviews are kept in, from the scraper to the db and back out to data_prep.
+
+A ScrapedReview is one review taken off a store page. It's a named tuple, so it has no dict
+of its own, and it's hashable, so duplicates can be found without converting it first.
+
+A ReviewRow is a row of steam_reviews, with its fields named after STEAM_REVIEWS_COLUMNS.
+It's still a tuple, so rows can be indexed and sliced like before, but nothing needs to know
+the user_review_text is at position 6.
+
+A ReviewBatch keeps many reviews as columns instead of rows. The ids and app numbers are
+arrays of 64 bit ints and the labels an array of bytes, rather than a Python object for each
+value, and the texts are a list. Training only needs the texts and labels, so data_prep reads
+those columns from the db straight into a batch, and slices and joins the batches, without
+a tuple for every review or transposing them into columns afterwards.
+'''
+
+import array
+import collections
+
+STEAM_REVIEWS_COLUMNS = ('id', 'url', 'app_num', 'date_scraped', 'classified', 'user_recommendation',
+                         'user_review_text', 'user_name')
+# The position of each column in a steam_reviews row
+ID, URL, APP_NUM, DATE_SCRAPED, CLASSIFIED, USER_RECOMMENDATION, USER_REVIEW_TEXT, USER_NAME = range(len(STEAM_REVIEWS_COLUMNS))
+
+# The labels the scraper gives reviews, stored as their position here
+LABELS = ('Not Recommended', 'Recommended', 'Issue detecting recommendation')
+LABEL_CODES = {label: code for code, label in enumerate(LABELS)}
+
+ScrapedReview = collections.namedtuple('ScrapedReview', ('user_recommendation', 'user_review_text', 'user_name'))
+ReviewRow = collections.namedtuple('ReviewRow', STEAM_REVIEWS_COLUMNS)
+
+
+def review_row_factory(_cursor, row):
+    '''
+    A sqlite3 row_factory, for cursors selecting every column of steam_reviews.
+    '''
+
+    return ReviewRow._make(row)
+
+
+class ReviewBatch:
+    '''
+    Reviews as columns: ids, app_nums and labels in arrays, and texts in a list.
+    Slicing a batch or adding two together gives a new batch, like a list of rows would.
+    '''
+
+    __slots__ = ('ids', 'app_nums', 'labels', 'texts')
+
+    def __init__(self, ids=None, app_nums=None, labels=None, texts=None):
+        self.ids = ids if ids is not None else array.array('q')
+        self.app_nums = app_nums if app_nums is not None else array.array('q')
+        self.labels = labels if labels is not None else array.array('b')
+        self.texts = texts if texts is not None else []
+
+    @classmethod
+    def from_rows(cls, rows):
+        '''
+        Takes (id, app_num, user_recommendation, user_review_text) rows, like a cursor, one at a time.
+        '''
+
+        batch = cls()
+        append_id = batch.ids.append
+        append_app_num = batch.app_nums.append
+        append_label = batch.labels.append
+        append_text = batch.texts.append
+        for review_id, app_num, user_recommendation, user_review_text in rows:
+            append_id(review_id)
+            append_app_num(app_num)
+            append_label(LABEL_CODES[user_recommendation])
+            append_text(user_review_text)
+
+        return batch
+
+    def __len__(self):
+        return len(self.texts)
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            raise TypeError('A ReviewBatch can only be sliced, use its columns for single reviews')
+        return ReviewBatch(self.ids[index], self.app_nums[index], self.labels[index], self.texts[index])
+
+    def __add__(self, other):
+        return ReviewBatch(self.ids + other.ids, self.app_nums + other.app_nums, self.labels + other.labels,
+                           self.texts + other.texts)
+
+    def classes(self):
+        '''
+        The labels as strings, the way the classifiers are trained on them.
+        '''
+
+        return [LABELS[code] for code in self.labels]
@@ -1,26 +1,39 @@
 #! usr/bin/env python3
 
 import datetime
-import time
 import requests
 from bs4 import BeautifulSoup
-from application import database_manager
+from application import database_manager, fetch_controller, profiler, tfidf_statistics
+from application.review_records import ScrapedReview
 
 '''
 This module scrapes Steam. It has an app_num that increases. For each game, this sends the data
 to the datababase_manager. This can continue if the scraper is stopped.
 '''
 
+STEAM_BASE_URL = 'http://store.steampowered.com/app/'
+SLEEP_TIME_BETWEEN_REQUESTS = 1 # So Steam can't complain this is a burden on their scrapers. The controller starts at this pace.
+MAX_REQUESTS_PER_SECOND = 5 # However well Steam copes, the controller doesn't go faster than this
+SCRAPER_INCREMENT = 5 # app_num increases this much every scraper request
+START_SCRAPING_APP_NUM = 300000 # If the database contains no reviews, start with this app_num
+STATISTICS_UPDATE_PAGES = 50 # The TF-IDF statistics are brought up to date after this many pages with reviews, not after each one
 
-def scrape_app_page(base_url, app_num):
+
+def scrape_app_page(base_url, app_num, controller=None):
     '''
     Fetches page and parses it to an HTML tree. BeautifulSoup will always receive valid
     html, since Steam will redirect the user on an invalid request.
+    With a fetch_controller.AimdController, the request waits its turn and failed requests are retried.
     '''
 
     url_to_scrape = '%s%s/' %(base_url, app_num)
-    req = requests.get(url_to_scrape)
-    soup = BeautifulSoup(req.content, 'html.parser')
+    with profiler.phase('fetch'):
+        if controller is None:
+            req = requests.get(url_to_scrape, timeout=fetch_controller.REQUEST_TIMEOUT)
+        else:
+            req = fetch_controller.fetch(controller, url_to_scrape)
+    with profiler.phase('parse'):
+        soup = BeautifulSoup(req.content, 'html.parser')
     return soup
 
 
@@ -60,31 +73,17 @@ def string_parser(soup_to_parse):
 
 def remove_duplicates(review_data):
     '''
-    The intention here is to convert each dict to a tuple, so we can use set() to remove duplicates.
-    Dictionaries are not hashable, which is a requirement of the set() function.
+    Removes any later copies of a review, keeping the reviews in order.
+    Each review is a ScrapedReview, which is hashable, so they can be the keys of a dict as they are.
     '''
 
-    seen = set()
-    indeces_of_duplicates = []
-
-    # Find the indices of duplicate dicts
-    for i, data in enumerate(review_data):
-        tuple_of_dict = tuple(data.items())
-        if tuple_of_dict not in seen:
-            seen.add(tuple_of_dict)
-        else:
-            indeces_of_duplicates.append(i)
-
-    # Go through original list of dicts backwards and remove those
-    for i in sorted(indeces_of_duplicates, reverse=True):
-        del review_data[i]
-
-    return review_data
+    return list(dict.fromkeys(review_data))
 
 
+@profiler.timed('parse')
 def get_reviews_on_page(html_from_page):
     '''
-    For each review, turn that into a dict, and place in an array of dicts
+    For each review, turn that into a ScrapedReview, and place in an array of them
     This should be accessed once the app has verified the page has reviews on it.
     '''
 
@@ -100,68 +99,97 @@ def get_reviews_on_page(html_from_page):
         user_review_text = one_review.find('div', {'class': 'content'})
         user_name = one_review.find('div', {'class': 'persona_name'})
 
-        data_for_one_review = {
-            "user_recommendation": user_recommendation,
-            "user_review_text": string_parser(user_review_text),
-            "user_name": string_parser(user_name)
-        }
-
-        review_data.append(data_for_one_review)
+        review_data.append(ScrapedReview(user_recommendation, string_parser(user_review_text), string_parser(user_name)))
 
     review_data_unique = remove_duplicates(review_data)
     return review_data_unique
 
 
-def get_reviews(db_location):
+def next_app_num(db_location):
     '''
-    The controlling function for the process that scrapes reviews from steam.
-    Accessed from run_app.py
+    Returns the app_num to scrape next, after the last review's app, or the first if there are no reviews.
     '''
 
-    sleep_time_between_requests = 1 # So Steam can't complain this is a burden on their scrapers.
-    scraper_increment = 5 # app_num increases this much every scraper request
-    start_scraping_app_num = 300000 # If the database contains no reviews, start with this app_num
-
     database_manager.create_steam_reviews(db_location)
-
     last_record = database_manager.retrieve_last_steam_review(db_location)
 
     if last_record is None:
-        last_app_num = start_scraping_app_num
-    else:
-        last_app_num = last_record[2]
+        return START_SCRAPING_APP_NUM + SCRAPER_INCREMENT
+    return last_record.app_num + SCRAPER_INCREMENT
 
-    while True:
-        '''
-        This process of scraping Steam continues until it is disrupted.
-        '''
 
-        time.sleep(sleep_time_between_requests)
+def make_controller():
+    return fetch_controller.AimdController(initial_rate=1 / SLEEP_TIME_BETWEEN_REQUESTS, max_rate=MAX_REQUESTS_PER_SECOND)
 
-        last_app_num += scraper_increment
 
-        base_url = 'http://store.steampowered.com/app/'
+def scrape_reviews_for_app(db_location, app_num, base_url=STEAM_BASE_URL, controller=None):
+    '''
+    Scrapes one app's page and saves its reviews. Returns how many reviews were found.
+    '''
 
-        content_from_steam = scrape_app_page(base_url, last_app_num)
-        date_scraped = datetime.datetime.now()
+    content_from_steam = scrape_app_page(base_url, app_num, controller)
+    date_scraped = datetime.datetime.now()
 
-        if page_has_reviews(content_from_steam) == True:
-            reviews_on_page = get_reviews_on_page(content_from_steam)
-            number_of_reviews = len(reviews_on_page)
-            print('Found %s reviews for app number %s' %(number_of_reviews, last_app_num))
-        else:
-            reviews_on_page = []
-            print('No review element found for number %s' %(last_app_num))
+    if page_has_reviews(content_from_steam) == True:
+        reviews_on_page = get_reviews_on_page(content_from_steam)
+        number_of_reviews = len(reviews_on_page)
+        print('Found %s reviews for app number %s' %(number_of_reviews, app_num))
+    else:
+        reviews_on_page = []
+        print('No review element found for number %s' %(app_num))
+
+    url = '%s%s/' %(base_url, app_num)
+    classified = 0
+    # A ScrapedReview is a tuple in the order of the columns that follow these
+    page_fields = (url, app_num, date_scraped, classified)
+    rows_to_insert = [page_fields + review for review in reviews_on_page]
+
+    if reviews_on_page:
+        # The page's reviews are inserted in one transaction, rather than a commit each
+        database_manager.insert_many_steam_reviews(db_location, rows_to_insert)
 
-        for review in reviews_on_page:
-            url = '%s%s/' %(base_url, last_app_num)
-            classified = 0
-            user_recommendation = review['user_recommendation']
-            user_review_text = review['user_review_text']
-            user_name = review['user_name']
+    return len(rows_to_insert)
 
-            database_manager.insert_data_steam_reviews(db_location, url, last_app_num,
-                                                       date_scraped, classified,
-                                                       user_recommendation, user_review_text,
-                                                       user_name)
 
+def get_reviews(db_location, base_url=STEAM_BASE_URL, controller=None, max_pages=None):
+    '''
+    The controlling function for the process that scrapes reviews from steam.
+    base_url can point at another store, like benchmarks.fake_steam, and max_pages stops it
+    after that many pages. Returns how many reviews were found.
+    The controller paces the requests, speeding up while Steam answers quickly and backing
+    off when it doesn't. A page that still fails after its retries is skipped.
+    The TF-IDF statistics are updated every STATISTICS_UPDATE_PAGES pages with reviews, and when it stops.
+    Accessed from run_app.py
+    '''
+
+    controller = controller or make_controller()
+    app_num = next_app_num(db_location)
+    pages_scraped = 0
+    reviews_found = 0
+    pages_since_statistics = 0
+
+    try:
+        while max_pages is None or pages_scraped < max_pages:
+            '''
+            This process of scraping Steam continues until it is disrupted.
+            '''
+
+            try:
+                reviews_on_page = scrape_reviews_for_app(db_location, app_num, base_url, controller)
+            except requests.RequestException as error:
+                print('Could not scrape app number %s: %s' %(app_num, error))
+                reviews_on_page = 0
+            reviews_found += reviews_on_page
+            app_num += SCRAPER_INCREMENT
+            pages_scraped += 1
+
+            if reviews_on_page:
+                pages_since_statistics += 1
+            if pages_since_statistics >= STATISTICS_UPDATE_PAGES:
+                tfidf_statistics.update_tfidf_statistics(db_location)
+                pages_since_statistics = 0
+    finally:
+        if pages_since_statistics:
+            tfidf_statistics.update_tfidf_statistics(db_location)
+
+    return reviews_found
@@ -0,0 +1,223 @@
+#! usr/bin/env python3
+
+'''
+This module trains classifiers out-of-core. The reviews are read from the db in chunks,
+each chunk is vectorized with a HashingVectorizer, which keeps no vocabulary, and then
+partial_fit is called on each classifier. Only one chunk is ever in memory, so the whole
+steam_reviews table can be used for training, however large it gets.
+Each chunk is also used to test the classifiers before they learn from it, which gives a
+running accuracy without needing a separate test set.
+The checkpoint keeps the db it was made from and a hash of the last review's text, so a
+checkpoint for another db, or from before the reviews were dropped and the ids started
+again, is started over rather than skipping the new reviews up to its last id.
+'''
+
+import os
+import pickle
+
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.linear_model import SGDClassifier
+from sklearn.naive_bayes import MultinomialNB
+
+from application import database_manager, feature_store, model_registry, profiler
+from application.review_records import ID, USER_RECOMMENDATION, USER_REVIEW_TEXT
+
+REVIEW_CLASSES = ['Not Recommended', 'Recommended']
+
+
+def make_hashing_vectorizer(n_features=2 ** 20):
+    '''
+    The vectorizer is stateless, so every chunk is vectorized the same way without a fit.
+    MultinomialNB can't take negative values, so alternate_sign is turned off.
+    '''
+
+    return HashingVectorizer(n_features=n_features, alternate_sign=False, norm='l2')
+
+
+def make_incremental_classifiers():
+    '''
+    These are the classifiers that support partial_fit. The SGD classifiers with hinge and log
+    loss stand in for Linear SVC and Logistic Regression.
+    '''
+
+    return {
+        'mnb': MultinomialNB(),
+        'sgd_linear_svc': SGDClassifier(loss='hinge'),
+        'sgd_logistic_regression': SGDClassifier(loss='log_loss'),
+    }
+
+
+def extract_labelled_reviews(rows):
+    '''
+    Takes db rows and returns the documents and classes, leaving out any rows the scraper
+    couldn't detect a recommendation for.
+    '''
+
+    documents = []
+    classes = []
+    for row in rows:
+        if row[USER_RECOMMENDATION] in REVIEW_CLASSES:
+            documents.append(row[USER_REVIEW_TEXT])
+            classes.append(row[USER_RECOMMENDATION])
+
+    return documents, classes
+
+
+def save_checkpoint(checkpoint_location, checkpoint):
+    '''
+    Writes to a temporary file first, so a crash while saving never leaves a broken checkpoint.
+    '''
+
+    temporary_location = '%s.tmp' %(checkpoint_location)
+    with open(temporary_location, 'wb') as checkpoint_file:
+        pickle.dump(checkpoint, checkpoint_file)
+    os.replace(temporary_location, checkpoint_location)
+
+
+def load_checkpoint(checkpoint_location):
+    '''
+    Returns the saved checkpoint, or None if there isn't one yet.
+    '''
+
+    if not os.path.exists(checkpoint_location):
+        return None
+
+    with open(checkpoint_location, 'rb') as checkpoint_file:
+        return pickle.load(checkpoint_file)
+
+
+def new_checkpoint(n_features, db_location):
+    return {
+        'classifiers': make_incremental_classifiers(),
+        'n_features': n_features,
+        'db_location': os.path.abspath(db_location),
+        'last_id': 0,
+        'last_row_text_hash': None,
+        'chunks_trained': 0,
+        'reviews_trained': 0,
+        'correct': {},
+        'tested': 0,
+    }
+
+
+def matches_db(db_location, checkpoint):
+    '''
+    Checks the checkpoint was made from this db, and the db still has its last review, so the ids
+    haven't started again since a drop.
+    '''
+
+    if checkpoint.get('db_location') != os.path.abspath(db_location):
+        return False
+    if checkpoint['last_id'] == 0:
+        return True
+    review_text = database_manager.retrieve_steam_review_text(db_location, checkpoint['last_id'])
+    return review_text is not None and feature_store.text_hash(review_text) == checkpoint.get('last_row_text_hash')
+
+
+def train_on_chunk(checkpoint, vectorizer, documents, classes):
+    '''
+    Tests each classifier on the chunk, then lets it learn from the chunk.
+    Classifiers that have seen no data yet are only trained.
+    '''
+
+    with profiler.phase('vectorize'):
+        chunk_vectors = vectorizer.transform(documents)
+    is_trained = checkpoint['chunks_trained'] > 0
+
+    for name, classifier in checkpoint['classifiers'].items():
+        if is_trained:
+            with profiler.phase('predict'):
+                predictions = classifier.predict(chunk_vectors)
+            correct = sum(1 for predicted, actual in zip(predictions, classes) if predicted == actual)
+            checkpoint['correct'][name] = checkpoint['correct'].get(name, 0) + correct
+
+        with profiler.phase('fit'):
+            classifier.partial_fit(chunk_vectors, classes, classes=REVIEW_CLASSES)
+
+    if is_trained:
+        checkpoint['tested'] += len(classes)
+
+    checkpoint['chunks_trained'] += 1
+    checkpoint['reviews_trained'] += len(classes)
+
+
+def running_accuracies(checkpoint):
+    '''
+    Returns the percentage of reviews each classifier got right before training on them.
+    '''
+
+    if checkpoint['tested'] == 0:
+        return {}
+
+    return {name: (correct / checkpoint['tested']) * 100
+            for name, correct in checkpoint['correct'].items()}
+
+
+def register_streaming_models(db_location, checkpoint, registry_location):
+    '''
+    Saves each classifier, with the hashing vectorizer, to the model registry.
+    '''
+
+    vectorizer = make_hashing_vectorizer(checkpoint['n_features'])
+    accuracies = running_accuracies(checkpoint)
+    manifest = {'db_location': db_location, 'reviews_trained': checkpoint['reviews_trained'],
+                'last_id': checkpoint['last_id']}
+
+    versions = {}
+    for name, classifier in checkpoint['classifiers'].items():
+        metrics = {}
+        if name in accuracies:
+            metrics['running_accuracy'] = round(accuracies[name], 1)
+        versions[name] = model_registry.register_model(vectorizer, classifier, dict(manifest, classifier=name),
+                                                       metrics, registry_location)
+
+    return versions
+
+
+def train_streaming(db_location, chunk_size=1000, checkpoint_every=10,
+                    checkpoint_location='streaming_checkpoint.pkl', n_features=2 ** 20,
+                    registry_location=model_registry.REGISTRY_LOCATION):
+    '''
+    The controlling function for streaming training. This continues from the last checkpoint if
+    there is one, so a stopped run picks up from the last review id it saved. A checkpoint
+    that doesn't match the db is started over.
+    When it's done, the classifiers are saved to the model registry, unless registry_location is None
+    or no reviews have been added since the last run, which would only save the same models again.
+    Accessed from run_app.py
+    '''
+
+    checkpoint = load_checkpoint(checkpoint_location)
+    if checkpoint is not None and not matches_db(db_location, checkpoint):
+        print('The checkpoint at %s is for another db, or its reviews have been dropped since, so training starts again'
+              %(checkpoint_location))
+        checkpoint = None
+    if checkpoint is None:
+        checkpoint = new_checkpoint(n_features, db_location)
+
+    vectorizer = make_hashing_vectorizer(checkpoint['n_features'])
+    chunks_since_checkpoint = 0
+    start_id = checkpoint['last_id']
+
+    for rows in database_manager.stream_steam_reviews(db_location, chunk_size, checkpoint['last_id']):
+        documents, classes = extract_labelled_reviews(rows)
+        if documents:
+            train_on_chunk(checkpoint, vectorizer, documents, classes)
+
+        checkpoint['last_id'] = rows[-1][ID]
+        checkpoint['last_row_text_hash'] = feature_store.text_hash(rows[-1][USER_REVIEW_TEXT])
+        chunks_since_checkpoint += 1
+
+        if chunks_since_checkpoint >= checkpoint_every:
+            save_checkpoint(checkpoint_location, checkpoint)
+            chunks_since_checkpoint = 0
+            accuracies = running_accuracies(checkpoint)
+            result_string = ', '.join('%s %.1f' %(name, accuracy) for name, accuracy in accuracies.items())
+            print('Trained on %s reviews up to id %s: %s' %(checkpoint['reviews_trained'],
+                                                             checkpoint['last_id'], result_string))
+
+    save_checkpoint(checkpoint_location, checkpoint)
+
+    if registry_location is not None and checkpoint['chunks_trained'] > 0 and checkpoint['last_id'] > start_id:
+        register_streaming_models(db_location, checkpoint, registry_location)
+
+    return checkpoint
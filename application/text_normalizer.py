@@ -0,0 +1,88 @@
+#! usr/bin/env python3
+
+'''
+This module normalizes review text once, when it's scraped, and keeps it in the
+steam_review_tokens table. Normalizing lowercases the text and splits it into tokens the same
+way TfidfVectorizer does by default, then joins the tokens with single spaces. That also
+removes the extra whitespace string_parser's ' '.join leaves between elements.
+
+A vectorizer made with PRETOKENIZED_VECTORIZER_PARAMS only splits on spaces, so on normalized
+text it gives the same features as a default vectorizer on the raw text, without tokenizing
+the reviews again for every experiment.
+
+Everything that classifies with a saved model hands it the raw review text, so a model trained
+on normalized text is saved with for_raw_text, which makes its vectorizer normalize the text itself.
+'''
+
+import re
+
+from application import database_manager
+from application.review_records import ID, USER_REVIEW_TEXT
+
+# The same token pattern as sklearn's vectorizers use by default
+TOKEN_PATTERN = re.compile(r'(?u)\b\w\w+\b')
+
+PRETOKENIZED_VECTORIZER_PARAMS = {'tokenizer': str.split, 'lowercase': False, 'token_pattern': None}
+
+
+def normalize_review_text(review_text):
+    '''
+    Returns the review's tokens, lowercased and joined by single spaces.
+    '''
+
+    return ' '.join(TOKEN_PATTERN.findall(review_text.lower()))
+
+
+def for_raw_text(vectorizer):
+    '''
+    Makes a vectorizer fitted with PRETOKENIZED_VECTORIZER_PARAMS normalize the text before it splits it,
+    and returns it. Normalizing normalized text changes nothing, so it gives the same vectors as before
+    on normalized text, and the same vectors on the raw text.
+    '''
+
+    return vectorizer.set_params(preprocessor=normalize_review_text)
+
+
+def normalize_reviews(rows):
+    '''
+    Takes (id, user_review_text) rows and returns (id, normalized_text) rows.
+    '''
+
+    return [(review_id, normalize_review_text(review_text)) for review_id, review_text in rows]
+
+
+def normalize_new_reviews(db_location, chunk_size=1000):
+    '''
+    Normalizes the reviews added since the last normalized review. This is what updating the
+    TF-IDF statistics calls as the scraper goes, so it only looks at new reviews.
+    '''
+
+    database_manager.create_steam_review_tokens(db_location)
+    start_id = database_manager.retrieve_last_tokenized_review_id(db_location)
+
+    reviews_normalized = 0
+    for rows in database_manager.stream_steam_reviews(db_location, chunk_size, start_id):
+        normalized_reviews = normalize_reviews([(row[ID], row[USER_REVIEW_TEXT]) for row in rows])
+        database_manager.insert_steam_review_tokens(db_location, normalized_reviews)
+        reviews_normalized += len(normalized_reviews)
+
+    return reviews_normalized
+
+
+def backfill_normalized_reviews(db_location, chunk_size=1000):
+    '''
+    Normalizes every review that doesn't have normalized text yet, wherever it is in the table.
+    Use this once for reviews scraped before normalizing was added.
+    Accessed from run_app.py
+    '''
+
+    database_manager.create_steam_review_tokens(db_location)
+
+    reviews_normalized = 0
+    for rows in database_manager.stream_untokenized_steam_reviews(db_location, chunk_size):
+        normalized_reviews = normalize_reviews(rows)
+        database_manager.insert_steam_review_tokens(db_location, normalized_reviews)
+        reviews_normalized += len(normalized_reviews)
+
+    print('Normalized %s reviews' %(reviews_normalized))
+    return reviews_normalized
@@ -0,0 +1,86 @@
+#! usr/bin/env python3
+
+'''
+This module keeps the statistics TF-IDF needs in the database: the number of reviews each
+term is in, and the number of reviews. They're counted from the normalized reviews in
+steam_review_tokens, a batch at a time, starting after the last review counted. So adding
+reviews only costs as much as the new reviews, not the whole table.
+
+load_tfidf_vectorizer builds a vectorizer from the statistics, with the same IDF weights
+TfidfVectorizer would fit on the same reviews, without fitting it.
+'''
+
+import collections
+import math
+
+from application import database_manager, text_normalizer
+
+
+def count_term_documents(rows):
+    '''
+    Takes (review_id, normalized_text) rows and counts how many of them each term is in.
+    '''
+
+    term_counts = collections.Counter()
+    for _review_id, normalized_text in rows:
+        term_counts.update(set(normalized_text.split()))
+
+    return term_counts
+
+
+def update_tfidf_statistics(db_location, chunk_size=1000):
+    '''
+    Counts the reviews added since the last update. Reviews are normalized first if they
+    haven't been. The scraper and the daemon call this every scraper.STATISTICS_UPDATE_PAGES
+    pages with reviews, rather than adding a transaction to every page.
+    Accessed from run_app.py
+    '''
+
+    database_manager.create_tfidf_statistics(db_location)
+    text_normalizer.normalize_new_reviews(db_location, chunk_size)
+    _document_count, last_review_id = database_manager.retrieve_tfidf_statistics(db_location)
+
+    reviews_counted = 0
+    for rows in database_manager.stream_steam_review_tokens(db_location, chunk_size, last_review_id):
+        term_counts = count_term_documents(rows)
+        database_manager.add_term_document_frequencies(db_location, term_counts, len(rows), rows[-1][0])
+        reviews_counted += len(rows)
+
+    return reviews_counted
+
+
+def smooth_idf(document_frequency, document_count):
+    '''
+    The IDF TfidfVectorizer uses by default, with smooth_idf=True.
+    '''
+
+    return math.log((1 + document_count) / (1 + document_frequency)) + 1
+
+
+def read_idf_weights(db_location, min_df=1):
+    '''
+    Returns the terms in at least min_df reviews, sorted the way a vectorizer sorts its
+    vocabulary, and the IDF weight of each.
+    '''
+
+    document_count, _last_review_id = database_manager.retrieve_tfidf_statistics(db_location)
+    term_frequencies = database_manager.retrieve_term_document_frequencies(db_location, min_df)
+
+    terms = [term for term, _document_frequency in term_frequencies]
+    idf_weights = [smooth_idf(document_frequency, document_count) for _term, document_frequency in term_frequencies]
+    return terms, idf_weights
+
+
+def load_tfidf_vectorizer(db_location, min_df=1):
+    '''
+    Returns a TfidfVectorizer for normalized reviews, using the current statistics, ready to transform.
+    '''
+
+    # Imported here, so the scraper can update the statistics without loading sklearn
+    import numpy as np
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    terms, idf_weights = read_idf_weights(db_location, min_df)
+    vectorizer = TfidfVectorizer(vocabulary=terms, **text_normalizer.PRETOKENIZED_VECTORIZER_PARAMS)
+    vectorizer.idf_ = np.array(idf_weights)
+    return vectorizer
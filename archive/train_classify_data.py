@@ -5,10 +5,15 @@ For some reason, these classifiers have performed badly. I don't know why that i
 I'm going to use the partial fit method with the MultinomialNB and save the instance 
 '''
 
-from archive import data_prep
+import contextlib
+import time
 
-from sklearn.feature_extraction.text import TfidfVectorizer
+from archive import data_prep
+from application import ensemble, model_registry, feature_selection, feature_store, memory_budget, profiler, text_normalizer
+from application.text_normalizer import PRETOKENIZED_VECTORIZER_PARAMS
 
+from sklearn.kernel_approximation import Nystroem
+from sklearn.pipeline import make_pipeline
 from sklearn.svm import SVC, LinearSVC
 from sklearn.naive_bayes import MultinomialNB
 from sklearn.linear_model import LogisticRegression
@@ -34,6 +39,31 @@ def train_svc(training_vectors, training_classes):
     classifier_svc.fit(training_vectors, training_classes)
     return classifier_svc
 
+def rbf_gamma_scale(training_vectors):
+    '''
+    The gamma SVC uses by default, 1 / (n_features * variance), worked out without making the vectors dense.
+    '''
+
+    n_samples, n_features = training_vectors.shape
+    mean = training_vectors.sum() / (n_samples * n_features)
+    variance = training_vectors.multiply(training_vectors).sum() / (n_samples * n_features) - mean ** 2
+    if variance == 0:
+        return 1.0
+    return 1.0 / (n_features * variance)
+
+def train_nystroem_svc(training_vectors, training_classes, n_components=500):
+    '''
+    Approximates the SVC's RBF kernel with Nystroem features, then trains a Linear SVC on those.
+    The exact SVC gets quadratically to cubically slower as the reviews increase, but this grows
+    linearly, because the kernel is only worked out against n_components sampled reviews.
+    '''
+
+    n_components = min(n_components, training_vectors.shape[0])
+    feature_map = Nystroem(kernel='rbf', gamma=rbf_gamma_scale(training_vectors), n_components=n_components, random_state=0)
+    classifier_nystroem_svc = make_pipeline(feature_map, LinearSVC())
+    classifier_nystroem_svc.fit(training_vectors, training_classes)
+    return classifier_nystroem_svc
+
 def train_linear_svc(training_vectors, training_classes):
     '''
     Trains the Linear Scaled Vector Machine classifier and returns the result, so we can test it.
@@ -68,34 +98,182 @@ def test_classifier(classifier, test_vectors, testing_classes, reviews_to_test):
     return (running_correct_number / reviews_to_test) * 100
 
 
-def classify_reviews(db_location):
+CLASSIFIER_TRAINERS = [
+    ('mnb', train_mnb),
+    ('svc', train_svc),
+    ('nystroem_svc', train_nystroem_svc),
+    ('linear_svc', train_linear_svc),
+    ('logistic_regression', train_logistic_regression),
+]
+
+
+def register_trained_models(vectorizer, trained_classifiers, results, manifest, registry_location=model_registry.REGISTRY_LOCATION):
+    '''
+    Saves each trained classifier, with the vectorizer it was trained with, to the model registry.
+    Returns the version each classifier was saved as.
+    '''
+
+    versions = {}
+    for name, classifier in trained_classifiers.items():
+        classifier_manifest = dict(manifest, classifier=name)
+        metrics = {'accuracy': round(results[name], 1)}
+        versions[name] = model_registry.register_model(vectorizer, classifier, classifier_manifest, metrics, registry_location)
+
+    return versions
+
+
+def classify_reviews(db_location, classifier_names=None, register=True, normalized=False, feature_reduction=None,
+                     exclude_near_duplicates=False, memory_budget_bytes=None, ensemble_voting=None, ensemble_weights=None,
+                     vectorize_workers=1, registry_location=model_registry.REGISTRY_LOCATION, vectorizer_version=None,
+                     store_location=feature_store.FEATURE_STORE_LOCATION):
     '''
     This is the function to control this module, but it would take some time to run through the data, and I'm not sure how to test it.
     Our database has 5000 records we can test, so do that.
+    Each classifier's accuracy and the seconds it took to train are printed side by side for each number of reviews.
+    classifier_names picks which of CLASSIFIER_TRAINERS to run, all of them by default.
+    If normalized is True, the reviews normalized by text_normalizer are used, so they aren't tokenized again.
+    The saved vectorizer normalizes the text itself, so the models classify raw reviews like any other.
+    feature_reduction names one of feature_selection.FEATURE_REDUCTIONS, to shrink the vectors before training.
+    If exclude_near_duplicates is True, reviews flagged by near_duplicates aren't trained or tested on.
+    If memory_budget_bytes is given, the number of reviews and features are planned to fit in it, the reviews
+    are let go once they're vectorized, and the peak RSS of each stage is printed at the end.
+    If ensemble_voting is 'soft' or 'hard', the ensemble.ENSEMBLE_MEMBERS that were trained are put together
+    into an ensemble, which is tested and saved too. ensemble_weights gives each member's weight by name.
+    Only the members are trained if no classifier_names are given.
+    With more than one vectorize_workers, the vectorizer is fitted by that many processes, with the same vectors.
+    With a vectorizer_version, no vectorizer is fitted. The reviews are vectorized into the feature store with that
+    registered vectorizer, if they aren't already, and the vectors are read from there and saved with it.
+    The classifiers from the last, largest, training run are saved to the model registry, so they can be used without retraining.
     '''
 
     end_interval = 4500 #Put this in the run_app module, which is the user's interface.
     reviews_to_test = 500
 
-    for reviews_to_train in range(reviews_to_test, end_interval, reviews_to_test):
+    if ensemble_voting is not None and classifier_names is None:
+        classifier_names = ensemble.ENSEMBLE_MEMBERS
+    trainers = [(name, trainer) for name, trainer in CLASSIFIER_TRAINERS
+                if classifier_names is None or name in classifier_names]
+    result_names = [name for name, _trainer in trainers]
+    ensemble_members = []
+    if ensemble_voting is not None:
+        ensemble_members = [name for name in result_names if name in ensemble.ENSEMBLE_MEMBERS]
+        if not ensemble_members:
+            raise ValueError('An ensemble needs at least one of %s' %(', '.join(ensemble.ENSEMBLE_MEMBERS)))
+        result_names.append('ensemble')
+    vectorizer_params = PRETOKENIZED_VECTORIZER_PARAMS if normalized else {}
+    reduction_settings = feature_selection.FEATURE_REDUCTIONS[feature_reduction or 'none']
+
+    stored_vectorizer = None
+    if vectorizer_version is not None:
+        if feature_reduction is not None:
+            raise ValueError('The stored vectors are the registered vectorizer\'s, so they can\'t have a feature reduction')
+        stored_vectorizer, _classifier, vectorizer_metadata = model_registry.load_model(vectorizer_version, registry_location)
+        store_meta = feature_store.vectorize_to_store(db_location, vectorizer_metadata['version'], store_location=store_location,
+                                                      registry_location=registry_location)
+
+    monitor = None
+    stage = lambda name: contextlib.nullcontext()
+    if memory_budget_bytes is not None:
+        plan = memory_budget.plan_training(db_location, memory_budget_bytes, [name for name, _trainer in trainers],
+                                           range(reviews_to_test, end_interval, reviews_to_test), normalized,
+                                           **vectorizer_params)
+        print('Memory plan: %s' %(plan['description']))
+        end_interval = plan['reviews_to_train'] + 1
+        if plan['max_features'] is not None:
+            reduction_settings = dict(reduction_settings, max_features=min(plan['max_features'],
+                                                                           reduction_settings.get('max_features', plan['max_features'])))
+        monitor = memory_budget.RssMonitor(memory_budget_bytes)
+        monitor.start()
+        stage = monitor.stage
+
+    print('reviews, %s' %(', '.join('%s %% (fit seconds)' %(name) for name in result_names)))
+
+    try:
+        for reviews_to_train in range(reviews_to_test, end_interval, reviews_to_test):
 
-        reviews_to_retrieve = reviews_to_train + reviews_to_test
+            reviews_to_retrieve = reviews_to_train + reviews_to_test
+            # The last run's classifiers are let go before the next run starts
+            trained_classifiers = {}
 
-        training_documents, testing_documents, training_classes, testing_classes = data_prep.prep_for_classifiers(db_location, reviews_to_retrieve, reviews_to_test)
+            with stage('retrieve %s' %(reviews_to_retrieve)):
+                training_data, testing_data = data_prep.prep_batches_for_classifiers(db_location, reviews_to_retrieve, reviews_to_test,
+                                                                                     normalized, exclude_near_duplicates)
+                training_classes, testing_classes = training_data.classes(), testing_data.classes()
 
-        vectorizer = TfidfVectorizer()
-        training_vectors = vectorizer.fit_transform(training_documents)
-        test_vectors = vectorizer.transform(testing_documents)
+            with stage('vectorize %s' %(reviews_to_train)), profiler.phase('vectorize'):
+                if stored_vectorizer is None:
+                    training_vectors, test_vectors, vectorizer, selector = feature_selection.reduce_features(reduction_settings, training_data.texts, training_classes,
+                                                                                                             testing_data.texts, vectorize_workers,
+                                                                                                             **vectorizer_params)
+                else:
+                    stored_matrix = feature_store.open_matrix(store_location, store_meta['corpus_snapshot'], store_meta['vectorizer_version'],
+                                                              store_meta['last_row_id'])
+                    training_vectors = feature_store.read_rows(stored_matrix, training_data.ids)
+                    test_vectors = feature_store.read_rows(stored_matrix, testing_data.ids)
+                    vectorizer, selector = stored_vectorizer, None
+                del training_data, testing_data
 
-        trained_mnb = train_mnb(training_vectors, training_classes)
-        trained_svc = train_svc(training_vectors, training_classes)
-        trained_linear_svc = train_svc(training_vectors, training_classes)
-        trained_logistic_regression = train_logistic_regression(training_vectors, training_classes)
+            results = {}
+            fit_times = {}
+            for name, trainer in trainers:
+                with stage('fit %s %s' %(name, reviews_to_train)):
+                    fit_started = time.perf_counter()
+                    with profiler.phase('fit'):
+                        trained_classifiers[name] = trainer(training_vectors, training_classes)
+                    fit_times[name] = time.perf_counter() - fit_started
+                    with profiler.phase('predict'):
+                        results[name] = test_classifier(trained_classifiers[name], test_vectors, testing_classes, reviews_to_test)
+
+            if ensemble_members:
+                # The members are trained already, so the ensemble's fit time is theirs added up
+                weights = None if ensemble_weights is None else [ensemble_weights.get(name, 1.0) for name in ensemble_members]
+                trained_classifiers['ensemble'] = ensemble.EnsembleClassifier.from_fitted(
+                    [(name, trained_classifiers[name]) for name in ensemble_members], ensemble_voting, weights)
+                fit_times['ensemble'] = sum(fit_times[name] for name in ensemble_members)
+                with profiler.phase('predict'):
+                    results['ensemble'] = test_classifier(trained_classifiers['ensemble'], test_vectors, testing_classes, reviews_to_test)
+
+            result_string = ', '.join('%.1f (%.2fs)' %(results[name], fit_times[name]) for name in result_names)
+            print('%s, %s' %(reviews_to_train, result_string))
+
+        if register:
+            with stage('register'):
+                trained_classifiers = {name: feature_selection.with_selector(selector, classifier)
+                                       for name, classifier in trained_classifiers.items()}
+                manifest = {'db_location': db_location, 'reviews_trained': reviews_to_train, 'reviews_tested': reviews_to_test,
+                            'normalized': normalized, 'feature_reduction': feature_reduction}
+                if ensemble_members:
+                    manifest.update({'ensemble_voting': ensemble_voting, 'ensemble_members': ensemble_members,
+                                     'ensemble_weights': ensemble_weights})
+                if stored_vectorizer is not None:
+                    # The registered vectorizer takes raw text already
+                    manifest['feature_store'] = {'corpus_snapshot': store_meta['corpus_snapshot'],
+                                                 'vectorizer_version': store_meta['vectorizer_version'],
+                                                 'last_review_id': store_meta['last_row_id']}
+                elif normalized:
+                    vectorizer = text_normalizer.for_raw_text(vectorizer)
+                versions = register_trained_models(vectorizer, trained_classifiers, results, manifest, registry_location)
+            print('Registered models: %s' %(', '.join('%s %s' %(name, version) for name, version in versions.items())))
+    finally:
+        if monitor is not None:
+            monitor.stop()
+            print(monitor.summary())
+
+
+def feature_report(db_location, reviews_to_retrieve=5000, reviews_to_test=500, classifier_names=('mnb', 'linear_svc', 'logistic_regression')):
+    '''
+    Compares each of feature_selection.FEATURE_REDUCTIONS on the same reviews, and returns a table
+    of the matrix size, stored values, time taken and accuracy for each classifier.
+    '''
 
-        mnb_result = test_classifier(trained_mnb, test_vectors, testing_classes, reviews_to_test)
-        svc_result = test_classifier(trained_svc, test_vectors, testing_classes, reviews_to_test)
-        linear_svc_result = test_classifier(trained_linear_svc, test_vectors, testing_classes, reviews_to_test)
-        logistic_result = test_classifier(trained_logistic_regression, test_vectors, testing_classes, reviews_to_test)
+    training_documents, testing_documents, training_classes, testing_classes = data_prep.prep_for_classifiers(db_location, reviews_to_retrieve, reviews_to_test)
+    trainers = [(name, trainer) for name, trainer in CLASSIFIER_TRAINERS if name in classifier_names]
+    reports = feature_selection.compare_feature_reductions(training_documents, training_classes, testing_documents, testing_classes, trainers)
 
-        result_string = '%.1f, %.1f, %.1f, %.1f' %(mnb_result, svc_result, linear_svc_result, logistic_result)
-        print(result_string)
+    lines = ['reduction, classifier, rows x features, nnz, reduce seconds, fit seconds, accuracy %']
+    for report in reports:
+        lines.append('%s, %s, %s x %s, %s, %.2f, %.2f, %.1f' %(report['reduction'], report['classifier'],
+                                                               report['shape'][0], report['shape'][1], report['nnz'],
+                                                               report['reduce_seconds'], report['fit_seconds'],
+                                                               report['accuracy']))
+    return '\n'.join(lines)
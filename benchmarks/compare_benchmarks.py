@@ -0,0 +1,42 @@
+#! usr/bin/env python3
+
+'''
+This module compares two sets of results saved by run_benchmarks, marking the benchmarks
+that got slower. It only reads JSON, so it doesn't import sklearn like run_benchmarks does.
+
+    python3 run_app.py compare_benchmarks benchmarks/results/old.json benchmarks/results/new.json
+'''
+
+import json
+
+# A change is reported as a regression when it's this much slower
+REGRESSION_THRESHOLD = 0.1
+
+
+def compare_results(old_results, new_results, threshold=REGRESSION_THRESHOLD):
+    '''
+    Returns a line for each benchmark in both results, with the change in the best time,
+    marking those more than threshold slower as regressions.
+    '''
+
+    lines = ['%s (%s rows) -> %s (%s rows)' %(old_results['commit'], old_results['n_rows'],
+                                              new_results['commit'], new_results['n_rows'])]
+    for name, new_result in new_results['benchmarks'].items():
+        if name not in old_results['benchmarks']:
+            continue
+        old_seconds = old_results['benchmarks'][name]['best_seconds']
+        change = (new_result['best_seconds'] - old_seconds) / old_seconds if old_seconds else 0.0
+        marker = '  REGRESSION' if change > threshold else ''
+        lines.append('%s: %.4fs -> %.4fs (%+.1f%%)%s' %(name, old_seconds, new_result['best_seconds'],
+                                                       change * 100, marker))
+
+    return '\n'.join(lines)
+
+
+def compare_result_files(old_location, new_location, threshold=REGRESSION_THRESHOLD):
+    '''
+    Accessed from run_app.py
+    '''
+
+    with open(old_location) as old_file, open(new_location) as new_file:
+        return compare_results(json.load(old_file), json.load(new_file), threshold)
@@ -0,0 +1,205 @@
+#! usr/bin/env python3
+
+'''
+This module runs a local stand-in for the Steam store, so the scraper can be tested and load
+tested without the network.
+
+/app/<app_num>/ serves a store page. Whether an app has reviews is picked from the app
+number and seed, so the same app always gets the same page. review_density is the share of
+apps with reviews, and reviews_per_page how many they have. Like Steam, apps without reviews,
+and app numbers that aren't numbers, are redirected to the front page, which has none.
+A directory of recorded pages, named <app_num>.html, can be served instead of synthetic ones.
+
+Each request waits latency seconds, plus up to latency_jitter more. error_429_rate and
+error_5xx_rate are the shares of requests answered with 429 Too Many Requests or
+503 Service Unavailable instead. rate_limit, if set, is the requests per second the store
+takes before answering 429, like a real rate limiter, with a second's worth allowed at once.
+The server counts the responses it sent, by status.
+'''
+
+import collections
+import functools
+import hashlib
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from benchmarks import synthetic_data
+
+APP_PATH = re.compile(r'^/app/([^/]+)/?$')
+FRONT_PAGE = '''<html><head><title>Welcome to Steam</title></head><body>
+<div class="home_page_content">Featured and recommended</div>
+</body></html>'''
+
+
+class FakeSteamSettings:
+    '''
+    How the fake store behaves. Any setting can be changed while the server runs.
+    '''
+
+    def __init__(self, review_density=0.5, reviews_per_page=10, latency=0.0, latency_jitter=0.0,
+                 error_429_rate=0.0, error_5xx_rate=0.0, rate_limit=None, recorded_pages_location=None, seed=0):
+        self.review_density = review_density
+        self.reviews_per_page = reviews_per_page
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.error_429_rate = error_429_rate
+        self.error_5xx_rate = error_5xx_rate
+        self.rate_limit = rate_limit
+        self.recorded_pages_location = recorded_pages_location
+        self.seed = seed
+
+    def app_has_reviews(self, app_num):
+        '''
+        The same app and seed always give the same answer, so a load test knows which pages had reviews.
+        '''
+
+        app_hash = hashlib.blake2b(('%s %s' %(self.seed, app_num)).encode('utf-8'), digest_size=8).digest()
+        return int.from_bytes(app_hash, 'big') / 2 ** 64 < self.review_density
+
+
+@functools.lru_cache(maxsize=1024)
+def synthetic_store_page(app_num, reviews_per_page, seed):
+    return synthetic_data.make_store_page(reviews_per_page, seed=(app_num * 7919 + seed) % (2 ** 32))
+
+
+class FakeSteamStats:
+    '''
+    Counts the responses sent by status, and keeps the seconds each request was held for.
+    '''
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.statuses = collections.Counter()
+        self.review_pages = 0
+        self.seconds = []
+
+    def record(self, status, has_reviews, seconds):
+        with self.lock:
+            self.statuses[status] += 1
+            self.review_pages += has_reviews
+            self.seconds.append(seconds)
+
+    def summary(self):
+        with self.lock:
+            return {'requests': sum(self.statuses.values()), 'statuses': dict(self.statuses),
+                    'review_pages': self.review_pages}
+
+
+def make_request_handler(settings, stats, error_random):
+    '''
+    Returns a request handler class for these settings. error_random picks which requests fail.
+    '''
+
+    error_lock = threading.Lock()
+    bucket = {'tokens': None, 'refilled': time.monotonic()}
+
+    def over_rate_limit():
+        '''
+        A token bucket, refilled at rate_limit tokens a second. Called with error_lock held.
+        '''
+
+        if settings.rate_limit is None:
+            return False
+        now = time.monotonic()
+        if bucket['tokens'] is None:
+            bucket['tokens'] = settings.rate_limit
+        bucket['tokens'] = min(settings.rate_limit, bucket['tokens'] + (now - bucket['refilled']) * settings.rate_limit)
+        bucket['refilled'] = now
+        if bucket['tokens'] < 1:
+            return True
+        bucket['tokens'] -= 1
+        return False
+
+    class FakeSteamRequestHandler(BaseHTTPRequestHandler):
+
+        def send_page(self, status, page, headers=()):
+            body = page.encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            for name, value in headers:
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            started = time.perf_counter()
+            delay = settings.latency + (random.uniform(0, settings.latency_jitter) if settings.latency_jitter else 0)
+            if delay:
+                time.sleep(delay)
+
+            with error_lock:
+                error_draw = error_random.random()
+                rate_limited = over_rate_limit()
+
+            status, has_reviews = self.respond(error_draw, rate_limited)
+            stats.record(status, has_reviews, time.perf_counter() - started)
+
+        def respond(self, error_draw, rate_limited=False):
+            '''
+            Sends the response and returns its status, and whether it was a page with reviews.
+            '''
+
+            if rate_limited or error_draw < settings.error_429_rate:
+                self.send_page(429, '<html><body>Too Many Requests</body></html>', [('Retry-After', '1')])
+                return 429, False
+            if error_draw < settings.error_429_rate + settings.error_5xx_rate:
+                self.send_page(503, '<html><body>Service Unavailable</body></html>')
+                return 503, False
+
+            if self.path == '/':
+                self.send_page(200, FRONT_PAGE)
+                return 200, False
+
+            path_match = APP_PATH.match(self.path)
+            app_num = path_match.group(1) if path_match else None
+            if app_num is None or not app_num.isdigit() or not settings.app_has_reviews(int(app_num)):
+                self.send_response(302)
+                self.send_header('Location', '/')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return 302, False
+
+            if settings.recorded_pages_location is not None:
+                recorded_location = os.path.join(settings.recorded_pages_location, '%s.html' %(app_num))
+                if os.path.exists(recorded_location):
+                    with open(recorded_location, encoding='utf-8') as recorded_file:
+                        self.send_page(200, recorded_file.read())
+                    return 200, True
+
+            self.send_page(200, synthetic_store_page(int(app_num), settings.reviews_per_page, settings.seed))
+            return 200, True
+
+        def log_message(self, format, *args):
+            pass
+
+    return FakeSteamRequestHandler
+
+
+def start_fake_steam(settings=None, host='127.0.0.1', port=0):
+    '''
+    Starts the fake store in a thread and returns the server. server.base_url is what the
+    scraper should use in place of Steam's, and server.stats has the counts.
+    Port 0 lets the operating system pick a free port. Stop it with stop_fake_steam.
+    '''
+
+    settings = settings or FakeSteamSettings()
+    stats = FakeSteamStats()
+    server = ThreadingHTTPServer((host, port), make_request_handler(settings, stats, random.Random(settings.seed)))
+    server.daemon_threads = True
+    server.settings = settings
+    server.stats = stats
+    server.base_url = 'http://%s:%s/app/' %(host, server.server_address[1])
+
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def stop_fake_steam(server):
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,151 @@
+#! usr/bin/env python3
+
+'''
+This module load tests the scraper against benchmarks.fake_steam, for the load_test command.
+
+A number of worker threads take app numbers off a queue and scrape each with the scraper's
+scrape_reviews_for_app, into a temporary db. One worker scrapes the same way get_reviews
+does, without any pacing, so errors are lost pages. Each page's latency is the whole fetch,
+parse and insert, as the scraper sees it.
+
+With adaptive, the workers share one fetch_controller.AimdController instead, as the
+scraper's get_reviews does. It paces and retries the requests, and the report has the rate
+it settled at, its concurrency limit, and how often it backed off and retried. Against a
+store with a rate_limit, that shows the rate finding the limit rather than overrunning it.
+
+Since the fake store decides which apps have reviews from the app number, the report can
+say how many pages with reviews were lost to 429 and 5xx responses, as well as the pages per
+second, the latency percentiles, and the responses and exceptions by kind.
+'''
+
+import collections
+import contextlib
+import io
+import os
+import queue
+import tempfile
+import threading
+import time
+
+import requests
+
+from application import database_manager, fetch_controller, scraper
+from benchmarks import fake_steam
+
+
+def percentile(sorted_values, percent):
+    if not sorted_values:
+        return None
+    return sorted_values[int(round((percent / 100) * (len(sorted_values) - 1)))]
+
+
+def make_adaptive_controller(workers):
+    '''
+    Starts faster than the scraper's controller and climbs quicker, since a load test is short.
+    '''
+
+    return fetch_controller.AimdController(initial_rate=10.0, max_rate=1000.0, additive_increase=1.0,
+                                           max_concurrency=workers)
+
+
+def scrape_worker(db_location, base_url, app_nums, results, lock, controller=None):
+    '''
+    Scrapes app numbers off the queue until it's empty, recording each page's latency and reviews, or its exception.
+    '''
+
+    while True:
+        try:
+            app_num = app_nums.get_nowait()
+        except queue.Empty:
+            return
+
+        started = time.perf_counter()
+        try:
+            reviews_found = scraper.scrape_reviews_for_app(db_location, app_num, base_url, controller)
+            error = None
+        except requests.RequestException as request_error:
+            reviews_found = 0
+            error = type(request_error).__name__
+        latency = time.perf_counter() - started
+
+        with lock:
+            results['latencies'].append(latency)
+            if error is not None:
+                results['exceptions'][error] += 1
+            elif reviews_found:
+                results['review_pages_found'].add(app_num)
+
+
+def run_load_test(pages=200, workers=1, settings=None, start_app_num=scraper.START_SCRAPING_APP_NUM, adaptive=False):
+    '''
+    Scrapes pages app numbers from start_app_num, SCRAPER_INCREMENT apart, with workers threads,
+    against a fake store with the settings. adaptive paces them with a shared controller.
+    Returns the report as a dict.
+    Accessed from run_app.py
+    '''
+
+    settings = settings or fake_steam.FakeSteamSettings()
+    server = fake_steam.start_fake_steam(settings)
+    app_nums = queue.Queue()
+    all_app_nums = [start_app_num + page * scraper.SCRAPER_INCREMENT for page in range(pages)]
+    for app_num in all_app_nums:
+        app_nums.put(app_num)
+
+    results = {'latencies': [], 'exceptions': collections.Counter(), 'review_pages_found': set()}
+    lock = threading.Lock()
+    controller = make_adaptive_controller(workers) if adaptive else None
+
+    try:
+        with tempfile.TemporaryDirectory() as temporary_location:
+            db_location = os.path.join(temporary_location, 'load_test.db')
+            database_manager.create_steam_reviews(db_location)
+
+            threads = [threading.Thread(target=scrape_worker, args=(db_location, server.base_url, app_nums, results, lock, controller))
+                       for _worker in range(workers)]
+            started = time.perf_counter()
+            # The scraper prints a line for every page, which would swamp the report
+            with contextlib.redirect_stdout(io.StringIO()):
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+            seconds = time.perf_counter() - started
+            reviews_scraped = database_manager.count_steam_reviews(db_location)
+    finally:
+        fake_steam.stop_fake_steam(server)
+
+    latencies = sorted(results['latencies'])
+    review_pages_expected = sum(settings.app_has_reviews(app_num) for app_num in all_app_nums)
+    return {
+        'pages': pages,
+        'workers': workers,
+        'seconds': seconds,
+        'pages_per_second': pages / seconds if seconds else None,
+        'p50_latency_ms': percentile(latencies, 50) * 1000 if latencies else None,
+        'p99_latency_ms': percentile(latencies, 99) * 1000 if latencies else None,
+        'max_latency_ms': latencies[-1] * 1000 if latencies else None,
+        'responses': server.stats.summary()['statuses'],
+        'exceptions': dict(results['exceptions']),
+        'review_pages_expected': review_pages_expected,
+        'review_pages_found': len(results['review_pages_found']),
+        'review_pages_lost': review_pages_expected - len(results['review_pages_found']),
+        'reviews_scraped': reviews_scraped,
+        'controller': controller.summary() if controller is not None else None,
+    }
+
+
+def load_test_summary(report):
+    lines = ['%s pages with %s workers in %.2f seconds, %.1f pages/s' %(report['pages'], report['workers'],
+                                                                       report['seconds'], report['pages_per_second'] or 0),
+             'latency p50 %.1f ms, p99 %.1f ms, max %.1f ms' %(report['p50_latency_ms'] or 0, report['p99_latency_ms'] or 0,
+                                                              report['max_latency_ms'] or 0),
+             'responses: %s' %(', '.join('%s x%s' %(status, count) for status, count in sorted(report['responses'].items()))),
+             'exceptions: %s' %(', '.join('%s x%s' %(name, count) for name, count in sorted(report['exceptions'].items())) or 'none'),
+             'pages with reviews: %s of %s found, %s lost to errors, %s reviews scraped' %(
+                 report['review_pages_found'], report['review_pages_expected'], report['review_pages_lost'],
+                 report['reviews_scraped'])]
+    if report['controller'] is not None:
+        controller = report['controller']
+        lines.append('controller: settled at %.1f requests/s, %s in flight, backed off %s times, retried %s times' %(
+            controller['rate'], controller['concurrency_limit'], controller['backoffs'], controller['retries']))
+    return '\n'.join(lines)
@@ -0,0 +1,218 @@
+#! usr/bin/env python3
+
+'''
+This module runs the benchmarks on synthetic data and saves the results as JSON, so a
+commit can be compared with an earlier one.
+
+Each benchmark is run a few times, and the fastest and median times are kept, with how many
+items (pages, rows or reviews) each run handled. The synthetic db is made once for each size
+and seed in benchmarks/data/, since making millions of rows takes a while itself.
+
+    python3 run_app.py benchmark 100000
+
+The results are compared by compare_benchmarks, which doesn't need sklearn to read them.
+'''
+
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+
+import numpy as np
+from bs4 import BeautifulSoup
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.naive_bayes import MultinomialNB
+from sklearn.svm import LinearSVC
+
+from application import database_manager, parallel_tfidf, scraper
+from archive import data_prep
+from benchmarks import synthetic_data
+
+BENCHMARKS_LOCATION = os.path.dirname(os.path.abspath(__file__))
+DATA_LOCATION = os.path.join(BENCHMARKS_LOCATION, 'data')
+RESULTS_LOCATION = os.path.join(BENCHMARKS_LOCATION, 'results')
+
+
+def time_repeats(function, repeats):
+    '''
+    Runs function repeats times and returns the seconds each run took.
+    '''
+
+    seconds = []
+    for _repeat in range(repeats):
+        started = time.perf_counter()
+        function()
+        seconds.append(time.perf_counter() - started)
+
+    return seconds
+
+
+def benchmark_result(seconds, items):
+    return {
+        'best_seconds': min(seconds),
+        'median_seconds': statistics.median(seconds),
+        'items': items,
+        'items_per_second': items / min(seconds) if min(seconds) > 0 else None,
+    }
+
+
+def benchmark_parse(pages=20, reviews_per_page=10, repeats=3):
+    '''
+    Parses synthetic store pages the way the scraper does, from HTML to ScrapedReview records.
+    '''
+
+    page_html = [synthetic_data.make_store_page(reviews_per_page, seed) for seed in range(pages)]
+
+    def parse_pages():
+        for html_page in page_html:
+            scraper.get_reviews_on_page(BeautifulSoup(html_page, 'html.parser'))
+
+    return benchmark_result(time_repeats(parse_pages, repeats), pages)
+
+
+def benchmark_inserts(rows, repeats=3):
+    '''
+    Inserts the same rows one commit at a time, and in one transaction, into a new db each run.
+    Returns the results for both.
+    '''
+
+    results = {}
+    with tempfile.TemporaryDirectory() as temporary_location:
+        db_location = os.path.join(temporary_location, 'inserts.db')
+
+        def insert_single():
+            database_manager.create_steam_reviews(db_location)
+            for row in rows:
+                database_manager.insert_data_steam_reviews(db_location, *row)
+            database_manager.drop_steam_reviews(db_location)
+
+        def insert_bulk():
+            database_manager.create_steam_reviews(db_location)
+            database_manager.insert_many_steam_reviews(db_location, rows)
+            database_manager.drop_steam_reviews(db_location)
+
+        results['insert_single'] = benchmark_result(time_repeats(insert_single, repeats), len(rows))
+        results['insert_bulk'] = benchmark_result(time_repeats(insert_bulk, repeats), len(rows))
+
+    return results
+
+
+def benchmark_training(db_location, reviews_to_retrieve, reviews_to_test, repeats=3, vectorize_workers=None):
+    '''
+    Times each step of training on the synthetic db: retrieving reviews, preparing them,
+    vectorizing, fitting and predicting. Vectorizing is also timed with vectorize_workers
+    processes, every core by default, to compare with the single core.
+    '''
+
+    review_quantity = int(reviews_to_retrieve / 2)
+    results = {}
+
+    results['retrieve_steam_reviews'] = benchmark_result(time_repeats(
+        lambda: database_manager.retrieve_steam_reviews(db_location, 'Not Recommended', 0, review_quantity), repeats),
+        review_quantity)
+
+    prepared = {}
+
+    def prep():
+        prepared['data'] = data_prep.prep_for_classifiers(db_location, reviews_to_retrieve, reviews_to_test)
+
+    results['prep_for_classifiers'] = benchmark_result(time_repeats(prep, repeats), reviews_to_retrieve)
+    training_documents, testing_documents, training_classes, testing_classes = prepared['data']
+
+    vectorized = {}
+
+    def vectorize():
+        vectorizer = TfidfVectorizer()
+        vectorized['training'] = vectorizer.fit_transform(training_documents)
+        vectorized['testing'] = vectorizer.transform(testing_documents)
+
+    results['vectorize'] = benchmark_result(time_repeats(vectorize, repeats), len(training_documents))
+
+    vectorize_workers = vectorize_workers or max(2, os.cpu_count() or 1)
+    results['vectorize_parallel'] = benchmark_result(time_repeats(
+        lambda: parallel_tfidf.fit_transform_parallel(training_documents, vectorize_workers), repeats), len(training_documents))
+    results['vectorize_parallel']['workers'] = vectorize_workers
+
+    for name, classifier_class in (('mnb', MultinomialNB), ('linear_svc', LinearSVC)):
+        fitted = {}
+
+        def fit():
+            fitted['classifier'] = classifier_class().fit(vectorized['training'], training_classes)
+
+        results['fit_%s' %(name)] = benchmark_result(time_repeats(fit, repeats), len(training_documents))
+        results['predict_%s' %(name)] = benchmark_result(time_repeats(
+            lambda: fitted['classifier'].predict(vectorized['testing']), repeats), len(testing_documents))
+
+    return results
+
+
+def current_commit():
+    try:
+        completed = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                   cwd=BENCHMARKS_LOCATION)
+    except OSError:
+        return None
+    return completed.stdout.strip() or None
+
+
+def run_benchmarks(n_rows=100000, seed=0, repeats=3, reviews_to_retrieve=None, insert_rows=2000,
+                   data_location=DATA_LOCATION, results_location=RESULTS_LOCATION):
+    '''
+    Runs every benchmark on a synthetic db of n_rows reviews and saves the results.
+    Training uses a tenth of the rows, up to 50000, unless reviews_to_retrieve is given.
+    Returns the results and where they were saved.
+    Accessed from run_app.py
+    '''
+
+    if reviews_to_retrieve is None:
+        reviews_to_retrieve = min(50000, n_rows // 10)
+    reviews_to_test = reviews_to_retrieve // 10
+
+    os.makedirs(data_location, exist_ok=True)
+    db_location = os.path.join(data_location, 'synthetic_%s_%s.db' %(n_rows, seed))
+    generate_started = time.perf_counter()
+    synthetic_data.generate_steam_reviews_db(db_location, n_rows, seed)
+    generate_seconds = time.perf_counter() - generate_started
+
+    random_state = np.random.RandomState(seed)
+    vocabulary = synthetic_data.make_vocabulary(random_state)
+    insert_rows = synthetic_data.make_review_rows(random_state, vocabulary,
+                                                  synthetic_data.make_word_probabilities(len(vocabulary)), insert_rows)
+
+    benchmarks = {'parse_store_pages': benchmark_parse(repeats=repeats)}
+    benchmarks.update(benchmark_inserts(insert_rows, repeats))
+    benchmarks.update(benchmark_training(db_location, reviews_to_retrieve, reviews_to_test, repeats))
+
+    results = {
+        'timestamp': datetime.datetime.now().isoformat(),
+        'commit': current_commit(),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'n_rows': n_rows,
+        'seed': seed,
+        'repeats': repeats,
+        'reviews_to_retrieve': reviews_to_retrieve,
+        'generate_seconds': generate_seconds,
+        'benchmarks': benchmarks,
+    }
+
+    os.makedirs(results_location, exist_ok=True)
+    results_file_location = os.path.join(results_location, '%s_%s_%s.json' %(
+        datetime.datetime.now().strftime('%Y%m%d_%H%M%S'), results['commit'] or 'unknown', n_rows))
+    with open(results_file_location, 'w') as results_file:
+        json.dump(results, results_file, indent=2)
+
+    return results, results_file_location
+
+
+def results_summary(results):
+    lines = ['%s rows, commit %s' %(results['n_rows'], results['commit'])]
+    for name, result in results['benchmarks'].items():
+        lines.append('%s: %.4fs best, %.4fs median, %.0f items/s' %(name, result['best_seconds'],
+                                                                   result['median_seconds'],
+                                                                   result['items_per_second'] or 0))
+    return '\n'.join(lines)
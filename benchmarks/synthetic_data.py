@@ -0,0 +1,149 @@
+#! usr/bin/env python3
+
+'''
+This module makes synthetic data for the benchmarks, so they can run at any size without Steam.
+
+Reviews are made of words drawn from a Zipf-like distribution over a made up vocabulary,
+with a few words that lean Recommended or Not Recommended, so classifiers have something to
+learn. Review lengths are log-normal like real reviews: most are a sentence or two, a few go on
+for hundreds of words. Around 80% of reviews are Recommended, which is about the share on Steam,
+and some apps have far more reviews than others.
+
+Everything comes from a seeded RandomState, so the same size and seed always make the same data.
+'''
+
+import datetime
+import os
+
+import numpy as np
+
+from application import database_manager
+
+VOCABULARY_SIZE = 20000
+RECOMMENDED_SHARE = 0.8
+MEDIAN_REVIEW_WORDS = 30
+MAX_REVIEW_WORDS = 1500
+
+POSITIVE_WORDS = ['great', 'fun', 'amazing', 'recommend', 'love', 'masterpiece', 'addictive', 'beautiful']
+NEGATIVE_WORDS = ['boring', 'broken', 'refund', 'crash', 'waste', 'buggy', 'overpriced', 'unplayable']
+
+
+def make_vocabulary(random_state, size=VOCABULARY_SIZE):
+    '''
+    Returns made up words of 2 to 10 letters, which the default token pattern keeps.
+    '''
+
+    letters = np.array(list('abcdefghijklmnopqrstuvwxyz'))
+    lengths = random_state.randint(2, 11, size=size)
+    return [''.join(random_state.choice(letters, size=length)) for length in lengths]
+
+
+def make_word_probabilities(size):
+    ranks = np.arange(1, size + 1)
+    weights = 1.0 / ranks
+    return weights / weights.sum()
+
+
+def make_review_texts(random_state, vocabulary, word_probabilities, recommendations):
+    '''
+    Returns a review for each recommendation, with some of the words swapped for words
+    that lean towards that recommendation.
+    '''
+
+    lengths = np.clip(random_state.lognormal(np.log(MEDIAN_REVIEW_WORDS), 1.0, size=len(recommendations)),
+                      1, MAX_REVIEW_WORDS).astype(int)
+    word_ids = random_state.choice(len(vocabulary), size=lengths.sum(), p=word_probabilities)
+    leaning = random_state.random_sample(size=lengths.sum()) < 0.05
+
+    texts = []
+    start = 0
+    for length, recommendation in zip(lengths, recommendations):
+        leaning_words = POSITIVE_WORDS if recommendation == 'Recommended' else NEGATIVE_WORDS
+        words = []
+        for position in range(start, start + length):
+            if leaning[position]:
+                words.append(leaning_words[word_ids[position] % len(leaning_words)])
+            else:
+                words.append(vocabulary[word_ids[position]])
+        texts.append(' '.join(words))
+        start += length
+
+    return texts
+
+
+def make_review_rows(random_state, vocabulary, word_probabilities, n_rows, first_app_num=300000,
+                     recommended_share=RECOMMENDED_SHARE):
+    '''
+    Returns n_rows rows ready for database_manager.insert_many_steam_reviews.
+    '''
+
+    recommendations = np.where(random_state.random_sample(size=n_rows) < recommended_share,
+                               'Recommended', 'Not Recommended')
+    texts = make_review_texts(random_state, vocabulary, word_probabilities, recommendations)
+    # A few apps get most of the reviews, like on Steam
+    app_nums = first_app_num + 5 * random_state.zipf(1.5, size=n_rows).clip(max=100000)
+    days = random_state.randint(0, 365, size=n_rows)
+    first_day = datetime.datetime(2016, 1, 1)
+
+    rows = []
+    for index in range(n_rows):
+        app_num = int(app_nums[index])
+        date_scraped = str(first_day + datetime.timedelta(days=int(days[index])))
+        rows.append(('http://store.steampowered.com/app/%s/' %(app_num), app_num, date_scraped, 0,
+                     str(recommendations[index]), texts[index], 'user_%s' %(random_state.randint(10 ** 9))))
+
+    return rows
+
+
+def generate_steam_reviews_db(db_location, n_rows, seed=0, chunk_size=10000, recommended_share=RECOMMENDED_SHARE):
+    '''
+    Makes a steam_reviews db with n_rows synthetic reviews, a chunk at a time, so 10M rows
+    don't have to fit in memory. An existing db with the same number of rows is kept as it is.
+    '''
+
+    if os.path.exists(db_location):
+        database_manager.create_steam_reviews(db_location)
+        if database_manager.count_steam_reviews(db_location) == n_rows:
+            return db_location
+        os.remove(db_location)
+
+    random_state = np.random.RandomState(seed)
+    vocabulary = make_vocabulary(random_state)
+    word_probabilities = make_word_probabilities(len(vocabulary))
+
+    database_manager.create_steam_reviews(db_location)
+    for start in range(0, n_rows, chunk_size):
+        rows = make_review_rows(random_state, vocabulary, word_probabilities, min(chunk_size, n_rows - start),
+                                recommended_share=recommended_share)
+        database_manager.insert_many_steam_reviews(db_location, rows)
+
+    return db_location
+
+
+def make_store_page(n_reviews, seed=0):
+    '''
+    Returns the HTML of a store page with n_reviews reviews, laid out the way get_reviews_on_page expects.
+    '''
+
+    random_state = np.random.RandomState(seed)
+    vocabulary = make_vocabulary(random_state, 2000)
+    word_probabilities = make_word_probabilities(len(vocabulary))
+    rows = make_review_rows(random_state, vocabulary, word_probabilities, n_reviews)
+
+    review_boxes = []
+    for _url, _app_num, _date_scraped, _classified, recommendation, text, user_name in rows:
+        thumb = 'icon_thumbsUp_v6.png' if recommendation == 'Recommended' else 'icon_thumbsDown_v6.png'
+        review_boxes.append('''<div class="review_box">
+<div class="avatar"><a href="http://steamcommunity.com/id/%s/"><img src="avatar.jpg"></a></div>
+<div class="persona_name"><a href="http://steamcommunity.com/id/%s/">%s</a></div>
+<div class="thumb"><img height="40" src="http://store.akamai.steamstatic.com/public/shared/images/userreviews/%s" width="40"></div>
+<div class="content">
+%s
+</div>
+</div>''' %(user_name, user_name, user_name, thumb, text))
+
+    return '''<html><head><title>Synthetic game on Steam</title></head><body>
+<div class="game_description_snippet">A game that doesn't exist.</div>
+<div class="user_reviews_header">Customer reviews</div>
+%s
+</body></html>''' %('\n'.join(review_boxes))
@@ -1,8 +1,10 @@
 #!/usr/bin/python3
 
+import importlib
+import os
+import subprocess
 import sys
-
-from application import scraper, database_manager, train_classify_data
+import time
 
 if int(sys.version_info.major) < 3:
     python_required_message = 'You must use Python3 with this program, exiting... \n'
@@ -15,42 +17,363 @@ def inputs_feedback():
     Wrong number of inputs. These are valid:
     - python3 run_app.py scrape_reviews continue OR
     - python3 run_app.py scrape_reviews new OR
-    - python3 run_app.py classify_data OR
+    - python3 run_app.py classify_data continue OR
+    - python3 run_app.py classify_data new OR
+    - python3 run_app.py classify_data continue <number of processes> OR
+    - python3 run_app.py daemon OR
+    - python3 run_app.py daemon <seconds between pages> <seconds between classifying> OR
+    - python3 run_app.py train_classifiers OR
+    - python3 run_app.py train_classifiers <classifier names> OR
+    - python3 run_app.py train_classifiers normalized <classifier names> OR
+    - python3 run_app.py train_classifiers <feature reduction> <classifier names> OR
+    - python3 run_app.py train_classifiers exclude_near_duplicates <classifier names> OR
+    - python3 run_app.py train_classifiers ensemble_soft OR
+    - python3 run_app.py train_classifiers ensemble_hard <classifier names> OR
+    - python3 run_app.py train_classifiers --memory-budget <size, like 2G> <classifier names> OR
+    - python3 run_app.py train_classifiers --vectorize-workers <number of processes> <classifier names> OR
+    - python3 run_app.py train_classifiers --stored-features <version> <classifier names> OR
+    - python3 run_app.py find_near_duplicates OR
+    - python3 run_app.py feature_report OR
+    - python3 run_app.py vectorize_features OR
+    - python3 run_app.py vectorize_features <version> OR
+    - python3 run_app.py normalize_reviews OR
+    - python3 run_app.py update_tfidf OR
+    - python3 run_app.py train_streaming OR
+    - python3 run_app.py list_models OR
+    - python3 run_app.py promote_model <version> OR
+    - python3 run_app.py search grid OR
+    - python3 run_app.py search halving <reviews to retrieve> <number of processes> OR
+    - python3 run_app.py cross_validate <reviews to retrieve> <folds> <number of processes> <classifier names> <normalized> OR
+    - python3 run_app.py cross_validate --stored-features <version> <reviews to retrieve> <folds> <number of processes> <classifier names> OR
+    - python3 run_app.py serve OR
+    - python3 run_app.py serve <port> <max wait in ms> OR
     - python3 run_app.py make_report OR
+    - python3 run_app.py export <jsonl, csv or parquet> <options like compression=zstd columns=app_num,user_review_text> OR
+    - python3 run_app.py import_times OR
+    - python3 run_app.py benchmark <number of rows> OR
+    - python3 run_app.py compare_benchmarks <old results file> <new results file> OR
+    - python3 run_app.py load_test <pages> <workers> <latency in ms> <429 rate> <5xx rate> <fixed or adaptive> <rate limit> OR
+    - python3 run_app.py <any of these> --import-time OR
+    - python3 run_app.py <any of these> --profile OR
+    - python3 run_app.py <any of these> --profile --sample-stacks
     '''
 
     return feedback
 
 
-def process_inputs(inputs):
+# Each command is a function taking the modules it needs, the inputs and the db location.
+# The modules are only imported when their command runs, so commands that only need the db
+# don't wait for sklearn, numpy or requests to load. The modules are passed in a dict by
+# their last name, like modules['scraper'].
+
+def scrape_reviews(modules, inputs, db_location):
+    if len(inputs) > 2 and inputs[2] not in ('continue', 'new'):
+        return inputs_feedback()
+    if len(inputs) > 2 and inputs[2] == 'new':
+        modules['database_manager'].create_steam_reviews(db_location)
+        modules['database_manager'].drop_steam_reviews(db_location)
+    modules['scraper'].get_reviews(db_location)
+
+
+def classify_data(modules, inputs, db_location):
+    workers = 1
+    if len(inputs) == 4:
+        workers = int(inputs[3])
+    if len(inputs) == 2 or inputs[2] == 'continue':
+        modules['classify_data'].classify_data(db_location, workers=workers)
+    elif inputs[2] == 'new':
+        modules['database_manager'].create_review_predictions(db_location)
+        modules['database_manager'].reset_review_predictions(db_location)
+        modules['classify_data'].classify_data(db_location, workers=workers)
+    else:
+        return inputs_feedback()
+
+
+def daemon(modules, inputs, db_location):
+    scrape_interval = 1
+    classify_interval = 60
+    if len(inputs) >= 3:
+        scrape_interval = float(inputs[2])
+    if len(inputs) >= 4:
+        classify_interval = float(inputs[3])
+    return modules['daemon'].run_daemon(db_location, scrape_interval, classify_interval)
+
+
+def train_classifiers(modules, inputs, db_location):
+    options = inputs[2:]
+    memory_budget_bytes = None
+    if '--memory-budget' in options:
+        budget_index = options.index('--memory-budget')
+        if budget_index + 1 >= len(options):
+            return inputs_feedback()
+        memory_budget_bytes = modules['memory_budget'].parse_memory_size(options[budget_index + 1])
+        options = options[:budget_index] + options[budget_index + 2:]
+    vectorize_workers = 1
+    if '--vectorize-workers' in options:
+        workers_index = options.index('--vectorize-workers')
+        if workers_index + 1 >= len(options):
+            return inputs_feedback()
+        vectorize_workers = int(options[workers_index + 1])
+        options = options[:workers_index] + options[workers_index + 2:]
+    vectorizer_version = None
+    if '--stored-features' in options:
+        version_index = options.index('--stored-features')
+        if version_index + 1 >= len(options):
+            return inputs_feedback()
+        vectorizer_version = options[version_index + 1]
+        options = options[:version_index] + options[version_index + 2:]
+    normalized = 'normalized' in options
+    exclude_near_duplicates = 'exclude_near_duplicates' in options
+    feature_reductions = [option for option in options if option in modules['feature_selection'].FEATURE_REDUCTIONS]
+    feature_reduction = feature_reductions[0] if feature_reductions else None
+    ensemble_options = {'ensemble_soft': 'soft', 'ensemble_hard': 'hard'}
+    ensemble_voting = next((ensemble_options[option] for option in options if option in ensemble_options), None)
+    classifier_names = [option for option in options
+                        if option not in ('normalized', 'exclude_near_duplicates') and option not in feature_reductions
+                        and option not in ensemble_options]
+    modules['train_classify_data'].classify_reviews(db_location, classifier_names or None, normalized=normalized,
+                                                    feature_reduction=feature_reduction,
+                                                    exclude_near_duplicates=exclude_near_duplicates,
+                                                    memory_budget_bytes=memory_budget_bytes, ensemble_voting=ensemble_voting,
+                                                    vectorize_workers=vectorize_workers, vectorizer_version=vectorizer_version)
+
+
+def find_near_duplicates(modules, inputs, db_location):
+    reviews_hashed, duplicates_found = modules['near_duplicates'].find_near_duplicates(db_location)
+    print('Hashed %s new reviews, %s were near-duplicates' %(reviews_hashed, duplicates_found))
+    return modules['near_duplicates'].near_duplicates_summary(db_location)
+
+
+def make_report(modules, inputs, db_location):
+    return modules['report'].make_report(db_location)
+
+
+def export(modules, inputs, db_location):
+    if len(inputs) < 3 or inputs[2] not in modules['exporter'].EXPORT_FORMATS:
+        return inputs_feedback()
+    export_arguments = modules['exporter'].parse_export_options(inputs[3:])
+    exported = modules['exporter'].export_reviews(db_location, export_format=inputs[2], **export_arguments)
+    return '\n'.join('Exported %s reviews to %s' %(rows_written, file_location) for file_location, rows_written in exported)
+
+
+def feature_report(modules, inputs, db_location):
+    return modules['train_classify_data'].feature_report(db_location)
+
+
+def vectorize_features(modules, inputs, db_location):
+    vectorizer_version = None
+    if len(inputs) >= 3:
+        vectorizer_version = inputs[2]
+    meta = modules['feature_store'].vectorize_to_store(db_location, vectorizer_version)
+    return 'Feature store %s with vectorizer %s has %s rows, %s features and %s values' %(
+        meta['corpus_snapshot'], meta['vectorizer_version'], meta['n_rows'], meta['n_features'], meta['nnz'])
+
+
+def normalize_reviews(modules, inputs, db_location):
+    modules['text_normalizer'].backfill_normalized_reviews(db_location)
+
+
+def update_tfidf(modules, inputs, db_location):
+    reviews_counted = modules['tfidf_statistics'].update_tfidf_statistics(db_location)
+    return 'Added %s reviews to the TF-IDF statistics' %(reviews_counted)
+
+
+def train_streaming(modules, inputs, db_location):
+    modules['streaming_trainer'].train_streaming(db_location)
+
+
+def list_models(modules, inputs, db_location):
+    return modules['model_registry'].models_summary()
+
+
+def promote_model(modules, inputs, db_location):
+    if len(inputs) != 3:
+        return inputs_feedback()
+    modules['model_registry'].promote_model(inputs[2])
+    return 'Promoted model %s' %(inputs[2])
+
+
+def search(modules, inputs, db_location):
+    method = 'halving'
+    reviews_to_retrieve = 5000
+    n_jobs = -1
+    if len(inputs) >= 3:
+        method = inputs[2]
+    if method not in ('grid', 'halving'):
+        return inputs_feedback()
+    if len(inputs) >= 4:
+        reviews_to_retrieve = int(inputs[3])
+    if len(inputs) >= 5:
+        n_jobs = int(inputs[4])
+    return modules['hyperparameter_search'].search(db_location, method, reviews_to_retrieve, n_jobs=n_jobs)
+
+
+def cross_validate(modules, inputs, db_location):
+    reviews_to_retrieve = 5000
+    n_folds = 5
+    n_jobs = -1
+    options = inputs[2:]
+    vectorizer_version = None
+    if '--stored-features' in options:
+        version_index = options.index('--stored-features')
+        if version_index + 1 >= len(options):
+            return inputs_feedback()
+        vectorizer_version = options[version_index + 1]
+        options = options[:version_index] + options[version_index + 2:]
+    normalized = 'normalized' in options
+    options = [option for option in options if option != 'normalized']
+    if len(options) >= 1:
+        reviews_to_retrieve = int(options[0])
+    if len(options) >= 2:
+        n_folds = int(options[1])
+    if len(options) >= 3:
+        n_jobs = int(options[2])
+    classifier_names = options[3:]
+    return modules['cross_validation'].run_cross_validation(db_location, reviews_to_retrieve, n_folds, classifier_names or None,
+                                                            n_jobs, normalized, vectorizer_version)
+
+
+def serve(modules, inputs, db_location):
+    port = 8000
+    max_wait = 0.005
+    if len(inputs) >= 3:
+        port = int(inputs[2])
+    if len(inputs) >= 4:
+        max_wait = float(inputs[3]) / 1000
+    return modules['inference_service'].run_service(port=port, max_wait=max_wait)
+
+
+def benchmark(modules, inputs, db_location):
+    n_rows = 100000
+    if len(inputs) >= 3:
+        n_rows = int(inputs[2])
+    results, results_file_location = modules['run_benchmarks'].run_benchmarks(n_rows)
+    print(modules['run_benchmarks'].results_summary(results))
+    return 'Results saved to %s' %(results_file_location)
+
+
+def compare_benchmarks(modules, inputs, db_location):
+    if len(inputs) != 4:
+        return inputs_feedback()
+    return modules['compare_benchmarks'].compare_result_files(inputs[2], inputs[3])
+
+
+def load_test(modules, inputs, db_location):
+    pages = 200
+    workers = 1
+    if len(inputs) >= 3:
+        pages = int(inputs[2])
+    if len(inputs) >= 4:
+        workers = int(inputs[3])
+    settings = modules['fake_steam'].FakeSteamSettings()
+    if len(inputs) >= 5:
+        settings.latency = float(inputs[4]) / 1000
+    if len(inputs) >= 6:
+        settings.error_429_rate = float(inputs[5])
+    if len(inputs) >= 7:
+        settings.error_5xx_rate = float(inputs[6])
+    adaptive = len(inputs) >= 8 and inputs[7] == 'adaptive'
+    if len(inputs) >= 9:
+        settings.rate_limit = float(inputs[8])
+    report = modules['load_test'].run_load_test(pages, workers, settings, adaptive=adaptive)
+    return modules['load_test'].load_test_summary(report)
+
+
+def import_times(modules, inputs, db_location):
     '''
-    Check the inputs are valid call load the appropriate functions.
+    Imports each command's modules in a new Python process, so nothing is imported already,
+    and reports how long each took, slowest first.
     '''
 
-    db_location = 'database_steam_reviews.db'
-    input_length = len(inputs)
-
-    if inputs[1] == 'scrape_reviews':
-        if input_length == 2:
-            scraper.get_reviews(db_location)
-        elif inputs[2] == 'continue':
-            scraper.get_reviews(db_location)
-        elif inputs[2] == 'new':
-            database_manager.drop_steam_reviews()
-            scraper.get_reviews(db_location)
+    timing_code = ('import importlib, time\n'
+                   'started = time.perf_counter()\n'
+                   'for module_name in %r:\n'
+                   '    importlib.import_module(module_name)\n'
+                   'print(time.perf_counter() - started)')
+
+    results = []
+    for command, (module_names, _function) in COMMANDS.items():
+        if not module_names:
+            continue
+        completed = subprocess.run([sys.executable, '-c', timing_code %(module_names,)], capture_output=True, text=True,
+                                   cwd=os.path.dirname(os.path.abspath(__file__)))
+        if completed.returncode != 0:
+            results.append((float('inf'), '%s: failed, %s' %(command, completed.stderr.strip().splitlines()[-1])))
         else:
-            return inputs_feedback()
+            seconds = float(completed.stdout)
+            results.append((seconds, '%s: %.0f ms' %(command, seconds * 1000)))
 
-    elif inputs[1] == 'classify_data':
-        train_classify_data.classify_reviews(db_location)
+    return '\n'.join(line for _seconds, line in sorted(results, reverse=True))
 
-    else:
+
+COMMANDS = {
+    'scrape_reviews': (('application.database_manager', 'application.scraper'), scrape_reviews),
+    'classify_data': (('application.database_manager', 'application.classify_data'), classify_data),
+    'daemon': (('application.daemon',), daemon),
+    'train_classifiers': (('application.feature_selection', 'application.memory_budget', 'archive.train_classify_data'),
+                          train_classifiers),
+    'find_near_duplicates': (('application.near_duplicates',), find_near_duplicates),
+    'make_report': (('application.report',), make_report),
+    'export': (('application.exporter',), export),
+    'feature_report': (('archive.train_classify_data',), feature_report),
+    'vectorize_features': (('application.feature_store',), vectorize_features),
+    'normalize_reviews': (('application.text_normalizer',), normalize_reviews),
+    'update_tfidf': (('application.tfidf_statistics',), update_tfidf),
+    'train_streaming': (('application.streaming_trainer',), train_streaming),
+    'list_models': (('application.model_registry',), list_models),
+    'promote_model': (('application.model_registry',), promote_model),
+    'search': (('application.hyperparameter_search',), search),
+    'cross_validate': (('application.cross_validation',), cross_validate),
+    'serve': (('application.inference_service',), serve),
+    'benchmark': (('benchmarks.run_benchmarks',), benchmark),
+    'compare_benchmarks': (('benchmarks.compare_benchmarks',), compare_benchmarks),
+    'load_test': (('benchmarks.fake_steam', 'benchmarks.load_test'), load_test),
+    'import_times': ((), import_times),
+}
+
+
+def load_modules(module_names):
+    '''
+    Imports the modules, and returns them by their last name, with the seconds it took.
+    '''
+
+    started = time.perf_counter()
+    modules = {module_name.rsplit('.', 1)[-1]: importlib.import_module(module_name) for module_name in module_names}
+    return modules, time.perf_counter() - started
+
+
+def process_inputs(inputs, report_import_time=False):
+    '''
+    Check the inputs are valid, then import the command's modules and run it.
+    '''
+
+    db_location = 'database_steam_reviews.db'
+
+    if len(inputs) < 2 or inputs[1] not in COMMANDS:
         return inputs_feedback()
 
+    module_names, command = COMMANDS[inputs[1]]
+    modules, import_seconds = load_modules(module_names)
+    if report_import_time:
+        sys.stderr.write('Imported %s for %s in %.0f ms\n' %(', '.join(module_names) or 'nothing', inputs[1],
+                                                             import_seconds * 1000))
+
+    return command(modules, inputs, db_location)
+
 
 def receive_inputs():
     inputs = sys.argv
-    return process_inputs(inputs)
+    report_import_time = '--import-time' in inputs
+    profile = '--profile' in inputs
+    sample_stacks = '--sample-stacks' in inputs
+    inputs = [argument for argument in inputs if argument not in ('--import-time', '--profile', '--sample-stacks')]
+
+    if profile:
+        from application import profiler
+        return profiler.profile_command(process_inputs, inputs, report_import_time, sample_stacks=sample_stacks)
+    return process_inputs(inputs, report_import_time)
 
-print(receive_inputs())
-sys.exit()
+
+if __name__ == '__main__':
+    print(receive_inputs())
+    sys.exit()
@@ -0,0 +1,93 @@
+#! usr/bin/env python3
+
+import os
+import sys
+import unittest
+import atexit
+import shutil
+
+# Here we're moving the context into the parent folder
+parentPath = os.path.abspath("..")
+if parentPath not in sys.path:
+    sys.path.insert(0, parentPath)
+
+from bs4 import BeautifulSoup
+
+from application import database_manager
+from application import scraper
+from benchmarks import compare_benchmarks
+from benchmarks import run_benchmarks
+from benchmarks import synthetic_data
+
+@atexit.register
+def goodbye():
+    try:
+        os.remove('database_test.db')
+    except FileNotFoundError:
+        pass
+    shutil.rmtree('benchmarks_test', ignore_errors=True)
+
+"""
+These tests are for the synthetic data and the benchmark suite.
+"""
+
+class TestSyntheticSteamReviews(unittest.TestCase):
+    '''
+    Tests the synthetic db has the rows asked for, mostly Recommended, and that the same seed makes the same reviews.
+    '''
+
+    def tearDown(self):
+        database_manager.drop_steam_reviews('database_test.db')
+
+    def test(self):
+        db_location = 'database_test.db'
+        synthetic_data.generate_steam_reviews_db(db_location, 1000, seed=3, chunk_size=300)
+        assert database_manager.count_steam_reviews(db_location) == 1000
+
+        recommended_reviews = database_manager.retrieve_steam_reviews(db_location, 'Recommended', 0, 1000)
+        assert 700 < len(recommended_reviews) < 900
+
+        first_review = database_manager.retrieve_last_steam_review(db_location)
+        database_manager.drop_steam_reviews(db_location)
+        synthetic_data.generate_steam_reviews_db(db_location, 1000, seed=3, chunk_size=300)
+        assert database_manager.retrieve_last_steam_review(db_location)[1:] == first_review[1:]
+
+
+class TestSyntheticStorePage(unittest.TestCase):
+    '''
+    Tests the scraper finds every review on a synthetic store page.
+    '''
+
+    def test(self):
+        soup = BeautifulSoup(synthetic_data.make_store_page(10, seed=1), 'html.parser')
+        assert scraper.page_has_reviews(soup) == True
+
+        reviews = scraper.get_reviews_on_page(soup)
+        assert len(reviews) == 10
+        assert set(review.user_recommendation for review in reviews) <= {'Recommended', 'Not Recommended'}
+        assert all(review.user_name.startswith('user_') for review in reviews)
+
+
+class TestRunBenchmarks(unittest.TestCase):
+    '''
+    Tests a small run times every step, saves the results and can be compared with another run.
+    '''
+
+    def test(self):
+        results, results_file_location = run_benchmarks.run_benchmarks(2000, repeats=1, insert_rows=50,
+                                                                       data_location='benchmarks_test',
+                                                                       results_location='benchmarks_test')
+        assert os.path.exists(results_file_location)
+        assert sorted(results['benchmarks']) == sorted(['parse_store_pages', 'insert_single', 'insert_bulk',
+                                                        'retrieve_steam_reviews', 'prep_for_classifiers', 'vectorize', 'vectorize_parallel',
+                                                        'fit_mnb', 'predict_mnb', 'fit_linear_svc', 'predict_linear_svc'])
+
+        slower_results = dict(results, benchmarks={'vectorize': dict(results['benchmarks']['vectorize'])})
+        slower_results['benchmarks']['vectorize']['best_seconds'] *= 2
+        comparison = compare_benchmarks.compare_results(results, slower_results).splitlines()
+        assert len(comparison) == 2
+        assert comparison[1].startswith('vectorize:') and comparison[1].endswith('REGRESSION')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -79,6 +79,26 @@ class TestMnbClassifier(unittest.TestCase):
         assert prediction_one == 'Not Recommended'
         assert prediction_two == 'Recommended'
 
+
+class TestNystroemSvcClassifier(unittest.TestCase):
+    '''
+    Test the approximate kernel classifier trains and predicts like the exact SVC,
+    including when there are fewer reviews than Nystroem components.
+    '''
+
+    def test(self):
+        training_documents = ['It was bad', 'It was great', 'I want to cry myself to sleep', 'Loved it. Would play again'] * 4
+        training_classes = ['Not Recommended', 'Recommended', 'Not Recommended', 'Recommended'] * 4
+
+        vectorizer = TfidfVectorizer()
+        train_vectors = vectorizer.fit_transform(training_documents)
+        test_vectors = vectorizer.transform(['It was bad', 'It was great'])
+
+        classifier = train_classify_data.train_nystroem_svc(train_vectors, training_classes)
+
+        assert list(classifier.predict(test_vectors)) == ['Not Recommended', 'Recommended']
+        assert classifier.steps[0][1].n_components == 16
+
 if __name__ == '__main__':
     unittest.main()
 
@@ -0,0 +1,135 @@
+#! usr/bin/env python3
+
+import os
+import sys
+import shutil
+import unittest
+import sqlite3
+import atexit
+
+# Here we're moving the context into the parent folder
+parentPath = os.path.abspath("..")
+if parentPath not in sys.path:
+    sys.path.insert(0, parentPath)
+
+from application import database_manager
+from application import model_registry
+from application import classify_data
+from application import text_normalizer
+from archive import data_prep
+from archive import train_classify_data
+
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+
+@atexit.register
+def goodbye():
+    try:
+        os.remove('database_test.db')
+    except FileNotFoundError:
+        pass
+    shutil.rmtree('model_registry_test', ignore_errors=True)
+
+"""
+These tests are for the classify_data module.
+"""
+
+class TestClassifyData(unittest.TestCase):
+    '''
+    Tests unclassified reviews get a prediction and are marked as classified,
+    that running again only classifies reviews added since, and that classified reviews can still be trained on.
+    '''
+
+    def setUp(self):
+        db_location = 'database_test.db'
+        registry_location = 'model_registry_test'
+
+        vectorizer = TfidfVectorizer()
+        vectors = vectorizer.fit_transform(['It was bad', 'It was great'] * 4)
+        classifier = LogisticRegression().fit(vectors, ['Not Recommended', 'Recommended'] * 4)
+        version = model_registry.register_model(vectorizer, classifier, {}, {}, registry_location)
+        model_registry.promote_model(version, registry_location)
+
+        database_manager.create_steam_reviews(db_location)
+        database_manager.insert_data_steam_reviews(db_location, 'url_1', 300000, '2011-01-01', 0, 'Not Recommended', 'It was bad', 'Destroyer')
+        database_manager.insert_data_steam_reviews(db_location, 'url_2', 300020, '2011-01-01', 0, 'Recommended', 'It was great', 'Dismantler')
+        database_manager.insert_data_steam_reviews(db_location, 'url_3', 300025, '2011-01-01', 1, 'Recommended', 'It was great', 'Makiavelli')
+
+    def tearDown(self):
+        db_location = 'database_test.db'
+        database_manager.drop_steam_reviews(db_location)
+        with sqlite3.connect(db_location, timeout=20) as db:
+            db.cursor().execute('DROP TABLE review_predictions;')
+        shutil.rmtree('model_registry_test', ignore_errors=True)
+
+    def test(self):
+        db_location = 'database_test.db'
+        registry_location = 'model_registry_test'
+
+        reviews_classified = classify_data.classify_data(db_location, chunk_size=1, registry_location=registry_location)
+        assert reviews_classified == 2
+
+        with sqlite3.connect(db_location, timeout=20) as db:
+            cur = db.cursor()
+            cur.execute('SELECT review_id, predicted_label, model_version FROM review_predictions ORDER BY review_id;')
+            assert cur.fetchall() == [(1, 'Not Recommended', 'v1'), (2, 'Recommended', 'v1')]
+            cur.execute('SELECT COUNT(*) FROM steam_reviews WHERE classified=0;')
+            assert cur.fetchone() == (0,)
+
+        assert classify_data.classify_data(db_location, registry_location=registry_location) == 0
+
+        database_manager.insert_data_steam_reviews(db_location, 'url_4', 300040, '2011-01-01', 0, 'Not Recommended', 'It was bad', 'GiveMeSugar')
+        database_manager.insert_data_steam_reviews(db_location, 'url_5', 300040, '2011-01-01', 0, 'Recommended', 'It was great', 'Sluggish666')
+        reviews_classified = classify_data.classify_data(db_location, workers=2, registry_location=registry_location)
+        assert reviews_classified == 2
+
+        with sqlite3.connect(db_location, timeout=20) as db:
+            cur = db.cursor()
+            cur.execute('SELECT review_id, predicted_label FROM review_predictions WHERE review_id > 3 ORDER BY review_id;')
+            assert cur.fetchall() == [(4, 'Not Recommended'), (5, 'Recommended')]
+
+        recommended_reviews, not_recommended_reviews = data_prep.retrieve_review_batches_balanced(db_location, 10)
+        assert (len(recommended_reviews), len(not_recommended_reviews)) == (3, 2)
+
+
+class TestClassifyWithNormalizedModel(unittest.TestCase):
+    '''
+    Tests a model trained on normalized reviews, then saved, classifies the raw reviews correctly,
+    since its vectorizer normalizes the text itself.
+    '''
+
+    def setUp(self):
+        db_location = 'database_test.db'
+        database_manager.create_steam_reviews(db_location)
+        rows = []
+        for i in range(2250):
+            rows.append(('url_%s' %(i), 300000, '2011-01-01', 0, 'Recommended', 'Loved it.  GREAT!! %s/10' %(i % 10), 'Destroyer'))
+            rows.append(('url_%s' %(i), 300000, '2011-01-01', 0, 'Not Recommended', 'Awful... BORING, Refund?', 'Dismantler'))
+        database_manager.insert_many_steam_reviews(db_location, rows)
+
+    def tearDown(self):
+        db_location = 'database_test.db'
+        database_manager.drop_steam_reviews(db_location)
+        with sqlite3.connect(db_location, timeout=20) as db:
+            db.cursor().execute('DROP TABLE review_predictions;')
+            db.cursor().execute('DROP TABLE steam_review_tokens;')
+        shutil.rmtree('model_registry_test', ignore_errors=True)
+
+    def test(self):
+        db_location = 'database_test.db'
+        registry_location = 'model_registry_test'
+
+        text_normalizer.backfill_normalized_reviews(db_location)
+        train_classify_data.classify_reviews(db_location, ['mnb'], normalized=True, registry_location=registry_location)
+        model_registry.promote_model('v1', registry_location)
+
+        assert classify_data.classify_data(db_location, registry_location=registry_location) == 4500
+        with sqlite3.connect(db_location, timeout=20) as db:
+            cur = db.cursor()
+            cur.execute('''SELECT COUNT(*) FROM review_predictions JOIN steam_reviews ON steam_reviews.id = review_predictions.review_id
+            WHERE predicted_label != user_recommendation;''')
+            assert cur.fetchone() == (0,)
+
+
+if __name__ == '__main__':
+    unittest.main()
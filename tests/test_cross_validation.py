@@ -0,0 +1,90 @@
+#! usr/bin/env python3
+
+import os
+import sys
+import unittest
+import atexit
+
+import numpy as np
+
+# Here we're moving the context into the parent folder
+parentPath = os.path.abspath("..")
+if parentPath not in sys.path:
+    sys.path.insert(0, parentPath)
+
+from application import cross_validation
+from benchmarks import synthetic_data
+
+@atexit.register
+def goodbye():
+    try:
+        os.remove('cross_validation_test.db')
+    except FileNotFoundError:
+        pass
+
+"""
+These tests are for the cross_validation module.
+"""
+
+documents = ['It was bad', 'It was great', 'I want to cry myself to sleep', 'Loved it. Would play again'] * 10
+classes = ['Not Recommended', 'Recommended', 'Not Recommended', 'Recommended'] * 10
+
+
+class TestMakeFolds(unittest.TestCase):
+    '''
+    Tests each review is tested in exactly one fold, and each fold has the same share of each class.
+    '''
+
+    def test(self):
+        folds = cross_validation.make_folds(np.asarray(classes), n_folds=4)
+        assert len(folds) == 4
+        tested = np.concatenate([testing_indices for _training_indices, testing_indices in folds])
+        assert sorted(tested) == list(range(len(classes)))
+        for training_indices, testing_indices in folds:
+            assert len(set(training_indices) & set(testing_indices)) == 0
+            assert sum(classes[index] == 'Recommended' for index in testing_indices) == 5
+
+
+class TestCrossValidate(unittest.TestCase):
+    '''
+    Tests every classifier is scored on every fold, in parallel, with its timings,
+    and unknown classifiers are refused.
+    '''
+
+    def test(self):
+        results = cross_validation.cross_validate(documents, classes, ('mnb', 'logistic_regression'), n_folds=4, n_jobs=2)
+        assert len(results['vectorize_seconds']) == 4
+        for name in ('mnb', 'logistic_regression'):
+            result = results['classifiers'][name]
+            assert len(result['accuracies']) == len(result['fit_seconds']) == len(result['predict_seconds']) == 4
+            assert result['mean_accuracy'] == 100.0 and result['std_accuracy'] == 0.0
+
+        summary = cross_validation.cross_validation_summary(results).splitlines()
+        assert summary[0].startswith('4-fold cross-validation of 40 reviews')
+        assert summary[1].startswith('mnb: 100.0% +/- 0.0')
+        assert len(summary) == 1 + 2 + 1 + 4
+
+        with self.assertRaises(ValueError):
+            cross_validation.cross_validate(documents, classes, ('mnb', 'random_forest'))
+
+
+class TestRunCrossValidation(unittest.TestCase):
+    '''
+    Tests cross-validation runs on balanced reviews from the db.
+    '''
+
+    def setUp(self):
+        synthetic_data.generate_steam_reviews_db('cross_validation_test.db', 600)
+
+    def tearDown(self):
+        os.remove('cross_validation_test.db')
+
+    def test(self):
+        summary = cross_validation.run_cross_validation('cross_validation_test.db', 200, n_folds=3, classifier_names=['mnb'],
+                                                        n_jobs=2)
+        assert summary.startswith('3-fold cross-validation of 200 reviews')
+        assert len(summary.splitlines()) == 1 + 1 + 1 + 3
+
+
+if __name__ == '__main__':
+    unittest.main()
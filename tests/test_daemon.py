@@ -0,0 +1,106 @@
+#! usr/bin/env python3
+
+import os
+import sys
+import shutil
+import unittest
+import sqlite3
+import atexit
+
+# Here we're moving the context into the parent folder
+parentPath = os.path.abspath("..")
+if parentPath not in sys.path:
+    sys.path.insert(0, parentPath)
+
+from application import daemon
+from application import database_manager
+from application import model_registry
+
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+
+@atexit.register
+def goodbye():
+    try:
+        os.remove('database_test.db')
+    except FileNotFoundError:
+        pass
+    shutil.rmtree('model_registry_test', ignore_errors=True)
+
+"""
+These tests are for the daemon module.
+"""
+
+class TestChooseTask(unittest.TestCase):
+    '''
+    Tests a large backlog is classified before scraping, a due page is scraped before a small backlog,
+    and a small backlog waits for a full chunk or the classify interval.
+    '''
+
+    def test(self):
+        settings = {'classify_chunk_size': 100, 'backlog_high': 1000, 'classify_interval': 60}
+        assert daemon.choose_task(5000, -1, 0, True, **settings) == 'classify'
+        assert daemon.choose_task(5000, -1, 0, False, **settings) == 'scrape'
+        assert daemon.choose_task(50, -1, 0, True, **settings) == 'scrape'
+        assert daemon.choose_task(500, 0.5, 0, True, **settings) == 'classify'
+        assert daemon.choose_task(50, 0.5, 0, True, **settings) == 'wait'
+        assert daemon.choose_task(50, 0.5, 61, True, **settings) == 'classify'
+        assert daemon.choose_task(0, None, 61, True, **settings) == 'wait'
+
+
+class TestReviewDaemon(unittest.TestCase):
+    '''
+    Tests the daemon classifies the backlog a chunk at a time with the model it loaded once,
+    and loads the new model when another version is promoted.
+    '''
+
+    def setUp(self):
+        db_location = 'database_test.db'
+        registry_location = 'model_registry_test'
+
+        vectorizer = TfidfVectorizer()
+        vectors = vectorizer.fit_transform(['It was bad', 'It was great'] * 4)
+        classifier = LogisticRegression().fit(vectors, ['Not Recommended', 'Recommended'] * 4)
+        self.model = (vectorizer, classifier)
+        version = model_registry.register_model(vectorizer, classifier, {}, {}, registry_location)
+        model_registry.promote_model(version, registry_location)
+
+        database_manager.create_steam_reviews(db_location)
+        for review_number in range(5):
+            database_manager.insert_data_steam_reviews(db_location, 'url_%s' %(review_number), 300000, '2011-01-01', 0, 'Recommended', 'It was great', 'Destroyer')
+
+    def tearDown(self):
+        db_location = 'database_test.db'
+        database_manager.drop_steam_reviews(db_location)
+        with sqlite3.connect(db_location, timeout=20) as db:
+            db.cursor().execute('DROP TABLE review_predictions;')
+        shutil.rmtree('model_registry_test', ignore_errors=True)
+
+    def test(self):
+        db_location = 'database_test.db'
+        registry_location = 'model_registry_test'
+
+        review_daemon = daemon.ReviewDaemon(db_location, scrape_interval=None, classify_chunk_size=2, backlog_high=4,
+                                            classify_interval=0, registry_location=registry_location)
+        assert review_daemon.app_num == 300005
+
+        counts = review_daemon.run(max_tasks=3)
+        assert counts['reviews_classified'] == 5
+        assert counts['pages_scraped'] == 0
+        assert review_daemon.models_loaded == 1
+        assert database_manager.count_unclassified_steam_reviews(db_location) == 0
+
+        version = model_registry.register_model(*self.model, {}, {}, registry_location)
+        model_registry.promote_model(version, registry_location)
+        database_manager.insert_data_steam_reviews(db_location, 'url_6', 300010, '2011-01-01', 0, 'Not Recommended', 'It was bad', 'Dismantler')
+        assert review_daemon.run_task() == 'classify'
+        assert review_daemon.models_loaded == 2
+
+        with sqlite3.connect(db_location, timeout=20) as db:
+            cur = db.cursor()
+            cur.execute('SELECT model_version, COUNT(*) FROM review_predictions GROUP BY model_version;')
+            assert cur.fetchall() == [('v1', 5), ('v2', 1)]
+
+
+if __name__ == '__main__':
+    unittest.main()
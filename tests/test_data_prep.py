@@ -53,13 +53,11 @@ class TestDataPrepRetrieveEqual(unittest.TestCase):
     def test(self):
         db_location = 'database_test.db'
 
-        recommended_reviews, not_recommended_reviews = data_prep.retrieve_reviews_balanced(db_location, 4)
+        recommended_reviews, not_recommended_reviews = data_prep.retrieve_review_batches_balanced(db_location, 4)
         assert len(recommended_reviews) == 2
         assert len(not_recommended_reviews) == 2
-        assert not_recommended_reviews[0][5] == 'Not Recommended'
-        assert not_recommended_reviews[1][5] == 'Not Recommended'
-        assert recommended_reviews[0][5] == 'Recommended'
-        assert recommended_reviews[1][5] == 'Recommended'
+        assert not_recommended_reviews.classes() == ['Not Recommended', 'Not Recommended']
+        assert recommended_reviews.classes() == ['Recommended', 'Recommended']
 
     def tearDown(self):
         db_location = 'database_test.db'
@@ -84,58 +82,6 @@ class TestDataPrepFormListsForTraining(unittest.TestCase):
         assert len(test_data) == 100
 
 
-class TestDataPrepTransposeLists(unittest.TestCase):
-    '''
-    Tests our data is transposed as expected.
-    '''
-
-    def test(self):
-        training_data = [('row id', 'url_10', 300040, '2011-01-01', 0, 'Recommended', 'It was great', 'Sluggish666')] * 100
-        testing_data = [('row id', 'url', 300000, '2011-01-01', 0, 'Not Recommended', 'It was bad', 'Destroyer')] * 100
-
-        training_data_transposed, testing_data_transposed = data_prep.transpose_data(training_data, testing_data)
-
-        assert training_data_transposed[5][20] == 'Recommended'
-        assert training_data_transposed[6][40] == 'It was great'
-        assert training_data_transposed[5][50] == 'Recommended'
-        assert testing_data_transposed[5][60] == 'Not Recommended'
-        assert testing_data_transposed[6][70] == 'It was bad'
-        assert testing_data_transposed[5][80] == 'Not Recommended'
-
-class TestDataPrepExtractClasses(unittest.TestCase):
-    '''
-    Tests our training_data_classes and testing_data_classes are returned as expected.
-    '''
-
-    def test(self):
-        training_data = [('row id', 'url_10', 300040, '2011-01-01', 0, 'Recommended', 'It was great', 'Sluggish666')] * 100
-        testing_data = [('row id', 'url', 300000, '2011-01-01', 0, 'Not Recommended', 'It was bad', 'Destroyer')] * 100
-
-        training_data_transposed, testing_data_transposed = data_prep.transpose_data(training_data, testing_data)
-
-        training_data_classes, testing_data_classes = data_prep.extract_classes(training_data_transposed, testing_data_transposed)
-
-        assert len(training_data_classes) == 100
-        assert len(testing_data_classes) == 100
-
-
-class TestDataPrepExtractClasses(unittest.TestCase):
-    '''
-    Tests our training_data_documents and testing_data_documents are returned as expected.
-    '''
-
-    def test(self):
-        training_data = [('row id', 'url_10', 300040, '2011-01-01', 0, 'Recommended', 'It was great', 'Sluggish666')] * 100
-        testing_data = [('row id', 'url', 300000, '2011-01-01', 0, 'Not Recommended', 'It was bad', 'Destroyer')] * 100
-
-        training_data_transposed, testing_data_transposed = data_prep.transpose_data(training_data, testing_data)
-
-        training_data_documents, testing_data_documents = data_prep.extract_reviews(training_data_transposed, testing_data_transposed)
-
-        assert len(training_data_documents) == 100
-        assert len(testing_data_documents) == 100
-
-
 class TestDataPrepControllerFunction1(unittest.TestCase):
     '''
     Tests the main controller function processes and returns data. Classifier module will use this.
@@ -13,6 +13,7 @@ if parentPath not in sys.path:
 
 from application import database_manager
 from application import scraper
+from application.review_records import ScrapedReview
 
 from archive import data_prep
 from archive import train_classify_data
@@ -380,41 +381,29 @@ class TestScraperDeleteDuplicateReviews(unittest.TestCase):
 
     def test(self):
         list_of_reviews = [
-            {
-                'user_recommendation': 'Recommended',
-                'user_review_text': 'It is great',
-                'user_name': 'bahumbug'
-            },
-            {
-                'user_recommendation': 'Recommended',
-                'user_review_text': 'It is great',
-                'user_name': 'bahumbug'
-            },
-            {
-                'user_recommendation': 'Not Recommended',
-                'user_review_text': 'This is the worst thing that has ever happened.',
-                'user_name': 'WhatYouWantSonny'
-            },
-            {
-                'user_recommendation': 'Recommended',
-                'user_review_text': 'DAMN BUY THIS GAME',
-                'user_name': 'pimplePopper61'
-            },
-            {
-                'user_recommendation': 'Not Recommended',
-                'user_review_text': 'This is the worst thing that has ever happened.',
-                'user_name': 'WhatYouWantSonny'
-            }
+            ScrapedReview('Recommended', 'It is great', 'bahumbug'),
+            ScrapedReview('Recommended', 'It is great', 'bahumbug'),
+            ScrapedReview('Not Recommended', 'This is the worst thing that has ever happened.', 'WhatYouWantSonny'),
+            ScrapedReview('Recommended', 'DAMN BUY THIS GAME', 'pimplePopper61'),
+            ScrapedReview('Not Recommended', 'This is the worst thing that has ever happened.', 'WhatYouWantSonny'),
         ]
 
         reviews_no_duplicates = scraper.remove_duplicates(list_of_reviews)
         assert len(reviews_no_duplicates) == 3
 
-        try:
-            assert reviews_no_duplicates[0]['user_recommendation'] == 'Recommended'
-            assert reviews_no_duplicates[1]['user_recommendation'] == 'Not Recommended'
-        except TypeError:
-            assert False #this means the responses are not dicts, which means this fails
+        assert reviews_no_duplicates[0].user_recommendation == 'Recommended'
+        assert reviews_no_duplicates[1].user_recommendation == 'Not Recommended'
+        assert reviews_no_duplicates[2].user_name == 'pimplePopper61'
+
+
+class TestSplitIdRange(unittest.TestCase):
+    '''
+    Tests the id ranges cover every id once.
+    '''
+
+    def test(self):
+        assert database_manager.split_id_range(1, 10, 3) == [(1, 4), (5, 8), (9, 10)]
+        assert database_manager.split_id_range(5, 5, 4) == [(5, 5)]
 
 
 if __name__ == '__main__':
@@ -0,0 +1,107 @@
+#! usr/bin/env python3
+
+import os
+import sys
+import shutil
+import unittest
+import atexit
+
+import numpy as np
+
+# Here we're moving the context into the parent folder
+parentPath = os.path.abspath("..")
+if parentPath not in sys.path:
+    sys.path.insert(0, parentPath)
+
+from application import ensemble
+from application import model_registry
+from application.classify_data import predict_with_confidence
+from archive import train_classify_data
+
+from sklearn.dummy import DummyClassifier
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.naive_bayes import MultinomialNB
+from sklearn.svm import LinearSVC
+
+@atexit.register
+def goodbye():
+    shutil.rmtree('model_registry_test', ignore_errors=True)
+
+"""
+These tests are for the ensemble module.
+"""
+
+class TestEnsembleVoting(unittest.TestCase):
+    '''
+    Tests soft and hard voting between trained classifiers on one set of vectors, that the weights
+    change the vote, and that classifiers with different classes can't be put together.
+    '''
+
+    def setUp(self):
+        self.documents = ['It was bad', 'It was great', 'I want to cry myself to sleep', 'Loved it. Would play again'] * 3
+        self.classes = ['Not Recommended', 'Recommended', 'Not Recommended', 'Recommended'] * 3
+        self.vectorizer = TfidfVectorizer()
+        self.vectors = self.vectorizer.fit_transform(self.documents)
+        self.members = [('mnb', train_classify_data.train_mnb(self.vectors, self.classes)),
+                        ('linear_svc', train_classify_data.train_linear_svc(self.vectors, self.classes)),
+                        ('logistic_regression', train_classify_data.train_logistic_regression(self.vectors, self.classes))]
+
+    def test(self):
+        soft = ensemble.EnsembleClassifier.from_fitted(self.members, 'soft')
+        probabilities = soft.predict_proba(self.vectors)
+        assert probabilities.shape == (12, 2)
+        assert np.allclose(probabilities.sum(axis=1), 1)
+        assert list(soft.predict(self.vectors)) == self.classes
+
+        hard = ensemble.EnsembleClassifier.from_fitted(self.members, 'hard')
+        assert list(hard.predict(self.vectors)) == self.classes
+        assert set(np.round(hard.predict_proba(self.vectors).max(axis=1), 3)) <= {0.667, 1.0}
+
+        # A classifier that always says Recommended outvotes the others when it has all the weight
+        always_recommended = DummyClassifier(strategy='constant', constant='Recommended').fit(self.vectors, self.classes)
+        outvoted = ensemble.EnsembleClassifier.from_fitted(self.members + [('always', always_recommended)], 'hard',
+                                                           weights=[1, 1, 1, 10])
+        assert set(outvoted.predict(self.vectors)) == {'Recommended'}
+
+        refitted = ensemble.EnsembleClassifier([(name, classifier) for name, classifier in self.members]).fit(self.vectors, self.classes)
+        assert list(refitted.predict(self.vectors)) == self.classes
+        assert sorted(refitted.member_predictions(self.vectors)) == ['linear_svc', 'logistic_regression', 'mnb']
+
+        with self.assertRaises(ValueError):
+            ensemble.EnsembleClassifier.from_fitted(self.members, 'majority')
+        other_classes = LogisticRegression().fit(self.vectors, ['bad', 'good'] * 6)
+        with self.assertRaises(ValueError):
+            ensemble.EnsembleClassifier.from_fitted(self.members + [('other', other_classes)])
+
+
+class TestRegisteredEnsemble(unittest.TestCase):
+    '''
+    Tests an ensemble saves to the model registry and loads back as one classifier,
+    giving the same predictions and confidences.
+    '''
+
+    def tearDown(self):
+        shutil.rmtree('model_registry_test', ignore_errors=True)
+
+    def test(self):
+        registry_location = 'model_registry_test'
+        documents = ['It was bad', 'It was great', 'I want to cry myself to sleep', 'Loved it. Would play again'] * 3
+        classes = ['Not Recommended', 'Recommended', 'Not Recommended', 'Recommended'] * 3
+        vectorizer = TfidfVectorizer()
+        vectors = vectorizer.fit_transform(documents)
+        members = [('mnb', MultinomialNB().fit(vectors, classes)), ('linear_svc', LinearSVC().fit(vectors, classes))]
+        classifier = ensemble.EnsembleClassifier.from_fitted(members, 'soft', weights=[1, 2])
+
+        version = model_registry.register_model(vectorizer, classifier, {'classifier': 'ensemble'}, {}, registry_location)
+        loaded_vectorizer, loaded_classifier, metadata = model_registry.load_model(version, registry_location)
+        assert metadata['classifier'] == 'EnsembleClassifier'
+
+        predictions, confidences = predict_with_confidence(classifier, vectors)
+        loaded_predictions, loaded_confidences = predict_with_confidence(loaded_classifier, loaded_vectorizer.transform(documents))
+        assert list(loaded_predictions) == list(predictions) == classes
+        assert np.allclose(loaded_confidences, confidences)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+#! usr/bin/env python3
+
+import os
+import sys
+import csv
+import gzip
+import json
+import shutil
+import subprocess
+import unittest
+import atexit
+
+# Here we're moving the context into the parent folder
+parentPath = os.path.abspath("..")
+if parentPath not in sys.path:
+    sys.path.insert(0, parentPath)
+
+from application import database_manager
+from application import exporter
+
+try:
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+@atexit.register
+def goodbye():
+    try:
+        os.remove('database_test.db')
+    except FileNotFoundError:
+        pass
+    shutil.rmtree('export_test', ignore_errors=True)
+
+"""
+These tests are for the exporter module.
+"""
+
+class TestExportReviews(unittest.TestCase):
+    '''
+    Tests every review is exported to gzip JSONL in id order across chunks, that CSV exports keep only the
+    columns and reviews asked for, and that split exports cover every review once between their parts.
+    '''
+
+    def setUp(self):
+        db_location = 'database_test.db'
+        database_manager.create_steam_reviews(db_location)
+        database_manager.insert_data_steam_reviews(db_location, 'url_1', 300000, '2017-01-01 10:00:00', 0, 'Recommended', 'This game is great', 'Destroyer')
+        database_manager.insert_data_steam_reviews(db_location, 'url_2', 300020, '2017-01-02 10:00:00', 0, 'Not Recommended', 'It was bad, "really" bad', 'Dismantler')
+        database_manager.insert_data_steam_reviews(db_location, 'url_3', 300025, '2017-02-01 10:00:00', 0, 'Not Recommended', 'Ünïcode and\nnew lines', 'Makiavelli')
+        database_manager.insert_data_steam_reviews(db_location, 'url_4', 400000, '2017-01-03 10:00:00', 0, 'Not Recommended', 'Too far', 'Elsewhere')
+        database_manager.insert_data_steam_reviews(db_location, 'url_5', 300030, '2017-01-04 10:00:00', 0, 'Recommended', 'Loved it', 'GiveMeSugar')
+
+    def tearDown(self):
+        database_manager.drop_steam_reviews('database_test.db')
+        shutil.rmtree('export_test', ignore_errors=True)
+
+    def test(self):
+        db_location = 'database_test.db'
+        output_location = os.path.join('export_test', 'reviews')
+
+        exported = exporter.export_reviews(db_location, output_location, chunk_size=2)
+        assert exported == [(output_location + '.jsonl.gz', 5)]
+        with gzip.open(output_location + '.jsonl.gz', 'rt', encoding='utf-8') as export_file:
+            reviews = [json.loads(line) for line in export_file]
+        assert [review['id'] for review in reviews] == [1, 2, 3, 4, 5]
+        assert reviews[2]['user_review_text'] == 'Ünïcode and\nnew lines'
+        assert sorted(reviews[0]) == sorted(database_manager.STEAM_REVIEWS_COLUMNS)
+
+        export_arguments = exporter.parse_export_options(['compression=none', 'columns=app_num,user_review_text',
+                                                          'apps=300000-399999', 'dates=2017-01-01:2017-01-31',
+                                                          'class=not_recommended', 'chunk_size=1',
+                                                          'output=%s' %(output_location)])
+        exported = exporter.export_reviews(db_location, export_format='csv', **export_arguments)
+        assert exported == [(output_location + '.csv', 1)]
+        with open(output_location + '.csv', newline='', encoding='utf-8') as export_file:
+            assert list(csv.reader(export_file)) == [['app_num', 'user_review_text'], ['300020', 'It was bad, "really" bad']]
+
+        exported = exporter.export_reviews(db_location, output_location, columns=['id'], workers=2)
+        assert [file_location for file_location, _rows_written in exported] == [output_location + '-00001-of-00002.jsonl.gz',
+                                                                                output_location + '-00002-of-00002.jsonl.gz']
+        exported_ids = []
+        for file_location, rows_written in exported:
+            with gzip.open(file_location, 'rt') as export_file:
+                part_ids = [json.loads(line)['id'] for line in export_file]
+            assert len(part_ids) == rows_written
+            exported_ids.extend(part_ids)
+        assert exported_ids == [1, 2, 3, 4, 5]
+
+        with self.assertRaises(ValueError):
+            exporter.export_reviews(db_location, output_location, columns=['user_review_text; DROP TABLE steam_reviews'])
+        with self.assertRaises(ValueError):
+            exporter.parse_export_options(['apps=300000'])
+
+    @unittest.skipIf(pyarrow is None, 'pyarrow is not installed')
+    def test_parquet(self):
+        db_location = 'database_test.db'
+        output_location = os.path.join('export_test', 'reviews')
+
+        exported = exporter.export_reviews(db_location, output_location, 'parquet', 'zstd', ['id', 'app_num'], chunk_size=2)
+        table = pyarrow.parquet.read_table(exported[0][0])
+        assert table.column('app_num').to_pylist() == [300000, 300020, 300025, 400000, 300030]
+
+
+class TestExporterImportsLightly(unittest.TestCase):
+    '''
+    Tests importing the exporter doesn't load numpy or sklearn, which it doesn't use.
+    '''
+
+    def test(self):
+        code = ('import sys; sys.path.insert(0, %r); import application.exporter; '
+                'print(sorted(name for name in ("sklearn", "numpy") if name in sys.modules))' %(parentPath))
+        completed = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True)
+        assert completed.stdout.splitlines() == ['[]']
+
+
+if __name__ == '__main__':
+    unittest.main()
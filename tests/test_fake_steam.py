@@ -0,0 +1,115 @@
+#! usr/bin/env python3
+
+import os
+import sys
+import shutil
+import unittest
+import atexit
+
+import requests
+
+# Here we're moving the context into the parent folder
+parentPath = os.path.abspath("..")
+if parentPath not in sys.path:
+    sys.path.insert(0, parentPath)
+
+from application import database_manager
+from application import fetch_controller
+from application import scraper
+from benchmarks import fake_steam
+from benchmarks import load_test
+
+@atexit.register
+def goodbye():
+    try:
+        os.remove('database_test.db')
+    except FileNotFoundError:
+        pass
+    shutil.rmtree('fake_steam_test', ignore_errors=True)
+
+"""
+These tests are for the fake Steam store and the scraper load test.
+"""
+
+class TestFakeSteam(unittest.TestCase):
+    '''
+    Tests apps with reviews get a page the scraper can read, others are redirected to a page without
+    reviews, recorded pages are served as they are, and errors are injected at the rates asked for.
+    '''
+
+    def setUp(self):
+        os.makedirs('fake_steam_test', exist_ok=True)
+        with open(os.path.join('fake_steam_test', '42.html'), 'w') as recorded_file:
+            recorded_file.write('<html><body><div class="user_reviews_header">Reviews</div>Recorded</body></html>')
+        self.settings = fake_steam.FakeSteamSettings(review_density=0.5, reviews_per_page=3,
+                                                     recorded_pages_location='fake_steam_test')
+        self.server = fake_steam.start_fake_steam(self.settings)
+
+    def tearDown(self):
+        fake_steam.stop_fake_steam(self.server)
+        shutil.rmtree('fake_steam_test', ignore_errors=True)
+        database_manager.drop_steam_reviews('database_test.db')
+
+    def test(self):
+        app_nums = range(300000, 300100, 5)
+        with_reviews = [app_num for app_num in app_nums if self.settings.app_has_reviews(app_num)]
+        without_reviews = [app_num for app_num in app_nums if not self.settings.app_has_reviews(app_num)]
+        assert with_reviews and without_reviews
+
+        soup = scraper.scrape_app_page(self.server.base_url, with_reviews[0])
+        assert len(scraper.get_reviews_on_page(soup)) == 3
+        response = requests.get('%s%s/' %(self.server.base_url, without_reviews[0]))
+        assert response.history[0].status_code == 302
+        assert scraper.page_has_reviews(scraper.scrape_app_page(self.server.base_url, without_reviews[0])) == False
+        assert 'Recorded' in requests.get('%s42/' %(self.server.base_url)).text
+
+        db_location = 'database_test.db'
+        database_manager.create_steam_reviews(db_location)
+        database_manager.insert_data_steam_reviews(db_location, 'url_1', 299995, '2011-01-01', 0, 'Recommended', 'It was great', 'Destroyer')
+        reviews_found = scraper.get_reviews(db_location, self.server.base_url, max_pages=20,
+                                            controller=fetch_controller.AimdController(initial_rate=1000, max_rate=1000))
+        assert reviews_found == 3 * len(with_reviews)
+        assert database_manager.count_steam_reviews(db_location) == 1 + reviews_found
+
+        self.settings.error_429_rate = 1.0
+        response = requests.get('%s%s/' %(self.server.base_url, with_reviews[0]))
+        assert response.status_code == 429
+        assert response.headers['Retry-After'] == '1'
+        self.settings.error_429_rate = 0.0
+        self.settings.error_5xx_rate = 1.0
+        assert requests.get(self.server.base_url).status_code == 503
+
+        statuses = self.server.stats.summary()['statuses']
+        assert statuses[429] == 1 and statuses[503] == 1
+
+
+class TestLoadTest(unittest.TestCase):
+    '''
+    Tests the load test scrapes every page, and counts the pages with reviews lost to errors.
+    With adaptive pacing against a rate limited store, the controller backs off and retries.
+    '''
+
+    def test(self):
+        report = load_test.run_load_test(40, workers=4, settings=fake_steam.FakeSteamSettings(review_density=1.0,
+                                                                                              reviews_per_page=2))
+        assert report['review_pages_expected'] == report['review_pages_found'] == 40
+        assert report['reviews_scraped'] == 80
+        assert report['responses'] == {200: 40}
+        assert report['pages_per_second'] > 0
+
+        report = load_test.run_load_test(40, workers=2, settings=fake_steam.FakeSteamSettings(review_density=1.0,
+                                                                                              error_5xx_rate=1.0))
+        assert report['review_pages_lost'] == 40
+        assert report['responses'] == {503: 40}
+        assert 'lost to errors' in load_test.load_test_summary(report)
+
+        report = load_test.run_load_test(20, workers=4, adaptive=True,
+                                         settings=fake_steam.FakeSteamSettings(review_density=1.0, rate_limit=5))
+        assert report['responses'][429] > 0
+        assert report['controller']['backoffs'] > 0 and report['controller']['retries'] > 0
+        assert report['review_pages_found'] + report['review_pages_lost'] == 20
+        assert 'settled at' in load_test.load_test_summary(report)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+#! usr/bin/env python3
+
+import os
+import sys
+import unittest
+import warnings
+
+# Here we're moving the context into the parent folder
+parentPath = os.path.abspath("..")
+if parentPath not in sys.path:
+    sys.path.insert(0, parentPath)
+
+from application import feature_selection
+
+from archive import train_classify_data
+
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.feature_selection import mutual_info_classif
+
+"""
+These tests are for the feature_selection module.
+"""
+
+training_documents = ['It was bad', 'It was great', 'I want to cry myself to sleep', 'Loved it. Would play again', 'Zzyzx bad'] * 4
+training_classes = ['Not Recommended', 'Recommended', 'Not Recommended', 'Recommended', 'Not Recommended'] * 4
+testing_documents = ['It was bad', 'Would play']
+testing_classes = ['Not Recommended', 'Recommended']
+
+
+class TestReduceFeatures(unittest.TestCase):
+    '''
+    Tests the selector keeps k features, and that the selector and classifier together
+    predict from the vectorizer's output.
+    '''
+
+    def test(self):
+        feature_reduction = {'selector': 'chi2', 'k': 3}
+        training_vectors, test_vectors, vectorizer, selector = feature_selection.reduce_features(feature_reduction, training_documents,
+                                                                                                 training_classes, testing_documents)
+        assert training_vectors.shape == (20, 3)
+        assert test_vectors.shape == (2, 3)
+
+        classifier = train_classify_data.train_logistic_regression(training_vectors, training_classes)
+        pipeline = feature_selection.with_selector(selector, classifier)
+        assert list(pipeline.predict(vectorizer.transform(testing_documents))) == testing_classes
+
+
+class TestCompareFeatureReductions(unittest.TestCase):
+    '''
+    Tests each reduction and classifier is reported, and pruning shrinks the matrix.
+    '''
+
+    def test(self):
+        feature_reductions = {'none': {}, 'max_features_5': {'max_features': 5}, 'mutual_info_4': {'selector': 'mutual_info', 'k': 4}}
+        trainers = [('mnb', train_classify_data.train_mnb), ('linear_svc', train_classify_data.train_linear_svc)]
+        reports = feature_selection.compare_feature_reductions(training_documents, training_classes, testing_documents, testing_classes,
+                                                               trainers, feature_reductions)
+
+        assert len(reports) == 6
+        widths = {report['reduction']: report['shape'][1] for report in reports}
+        assert widths['max_features_5'] == 5
+        assert widths['mutual_info_4'] == 4
+        assert widths['none'] > 5
+        assert all(report['nnz'] > 0 for report in reports)
+
+
+class TestMutualInfoPresence(unittest.TestCase):
+    '''
+    Tests mutual_info scores terms by whether reviews have them, without sklearn warning
+    that it was given continuous values.
+    '''
+
+    def test(self):
+        vectorizer = TfidfVectorizer()
+        training_vectors = vectorizer.fit_transform(training_documents)
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            scores = feature_selection.SELECTOR_SCORES['mutual_info'](training_vectors, training_classes)
+
+        presence_scores = mutual_info_classif(training_vectors > 0, training_classes, discrete_features=True)
+        assert scores.shape == (training_vectors.shape[1],)
+        assert abs(scores - presence_scores).max() < 1e-12
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,178 @@
+#! usr/bin/env python3
+
+import os
+import sys
+import shutil
+import unittest
+import atexit
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+# Here we're moving the context into the parent folder
+parentPath = os.path.abspath("..")
+if parentPath not in sys.path:
+    sys.path.insert(0, parentPath)
+
+from application import cross_validation
+from application import database_manager
+from application import feature_store
+from application import model_registry
+from application.review_records import USER_REVIEW_TEXT
+
+from archive import train_classify_data
+from benchmarks import synthetic_data
+
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+
+@atexit.register
+def goodbye():
+    for db_location in ('database_test.db', 'feature_store_test.db'):
+        try:
+            os.remove(db_location)
+        except FileNotFoundError:
+            pass
+    shutil.rmtree('feature_store_test', ignore_errors=True)
+    shutil.rmtree('model_registry_test', ignore_errors=True)
+
+"""
+These tests are for the feature_store module.
+"""
+
+class TestAppendAndSliceRows(unittest.TestCase):
+    '''
+    Tests rows appended in two parts slice back out the same as the matrix they came from.
+    '''
+
+    def tearDown(self):
+        shutil.rmtree('feature_store_test', ignore_errors=True)
+
+    def test(self):
+        store_location = 'feature_store_test'
+        matrix = csr_matrix(np.array([[0, 1.5, 0], [0, 0, 0], [2.0, 0, 3.0], [0, 0, 4.5], [1.0, 1.0, 1.0]]))
+
+        feature_store.create_matrix(store_location, 'corpus', 'v1', 3)
+        feature_store.append_rows(store_location, 'corpus', 'v1', matrix[:2], [10, 11])
+        meta = feature_store.append_rows(store_location, 'corpus', 'v1', matrix[2:], [12, 13, 14])
+        assert meta['n_rows'] == 5
+        assert meta['nnz'] == matrix.nnz
+        assert meta['last_row_id'] == 14
+
+        stored_matrix = feature_store.open_matrix(store_location, 'corpus', 'v1')
+        assert isinstance(stored_matrix['data'], np.memmap)
+        assert list(stored_matrix['row_ids']) == [10, 11, 12, 13, 14]
+        assert (feature_store.slice_rows(stored_matrix, 0, 5) != matrix).nnz == 0
+        assert (feature_store.slice_rows(stored_matrix, 1, 4) != matrix[1:4]).nnz == 0
+        assert (feature_store.slice_rows(stored_matrix, 4, 10) != matrix[4:]).nnz == 0
+        assert (feature_store.read_rows(stored_matrix, [14, 10, 12]) != matrix[[4, 0, 2]]).nnz == 0
+
+        snapshot = feature_store.open_matrix(store_location, 'corpus', 'v1', last_review_id=12)
+        assert snapshot['n_rows'] == 3
+        assert snapshot['nnz'] == matrix[:3].nnz
+        assert (feature_store.slice_rows(snapshot, 0, 5) != matrix[:3]).nnz == 0
+        with self.assertRaises(ValueError):
+            feature_store.read_rows(snapshot, [13])
+        with self.assertRaises(ValueError):
+            feature_store.open_matrix(store_location, 'corpus', 'v1', last_review_id=15)
+
+
+class TestVectorizeToStore(unittest.TestCase):
+    '''
+    Tests reviews are vectorized into the store with a registered vectorizer, and that only
+    new reviews are vectorized the second time.
+    '''
+
+    def setUp(self):
+        db_location = 'database_test.db'
+        database_manager.create_steam_reviews(db_location)
+        database_manager.insert_data_steam_reviews(db_location, 'url_1', 300000, '2011-01-01', 0, 'Not Recommended', 'It was bad', 'Destroyer')
+        database_manager.insert_data_steam_reviews(db_location, 'url_2', 300020, '2011-01-01', 0, 'Recommended', 'It was great', 'Dismantler')
+        database_manager.insert_data_steam_reviews(db_location, 'url_3', 300025, '2011-01-01', 0, 'Recommended', 'OMG', 'Makiavelli')
+
+        self.vectorizer = TfidfVectorizer()
+        vectors = self.vectorizer.fit_transform(['It was bad', 'It was great'])
+        classifier = LogisticRegression().fit(vectors, ['Not Recommended', 'Recommended'])
+        version = model_registry.register_model(self.vectorizer, classifier, {}, {}, 'model_registry_test')
+        model_registry.promote_model(version, 'model_registry_test')
+
+    def tearDown(self):
+        db_location = 'database_test.db'
+        database_manager.drop_steam_reviews(db_location)
+        shutil.rmtree('feature_store_test', ignore_errors=True)
+        shutil.rmtree('model_registry_test', ignore_errors=True)
+
+    def test(self):
+        db_location = 'database_test.db'
+        meta = feature_store.vectorize_to_store(db_location, chunk_size=2, store_location='feature_store_test',
+                                                registry_location='model_registry_test')
+        assert meta['n_rows'] == 3
+        assert meta['corpus_snapshot'] == feature_store.corpus_name(db_location)
+        assert meta['corpus_snapshot'] != feature_store.corpus_name(os.path.join('elsewhere', db_location))
+
+        database_manager.insert_data_steam_reviews(db_location, 'url_4', 300040, '2011-01-01', 0, 'Recommended', 'great', 'GiveMeSugar')
+        meta = feature_store.vectorize_to_store(db_location, store_location='feature_store_test',
+                                                registry_location='model_registry_test')
+        assert meta['n_rows'] == 4
+
+        stored_matrix = feature_store.open_matrix('feature_store_test', meta['corpus_snapshot'], 'v1')
+        expected = self.vectorizer.transform(['It was bad', 'It was great', 'OMG', 'great'])
+        assert abs(feature_store.slice_rows(stored_matrix, 0, 4) - expected).max() < 1e-12
+
+        # After a drop the ids start again, so the stored rows aren't these reviews any more
+        database_manager.drop_steam_reviews(db_location)
+        database_manager.create_steam_reviews(db_location)
+        for number, review in enumerate(['bad', 'bad bad', 'was great', 'It was bad', 'great']):
+            database_manager.insert_data_steam_reviews(db_location, 'url_%s' %(number), 300000, '2011-01-01', 0, 'Recommended', review, 'Sluggish666')
+        meta = feature_store.vectorize_to_store(db_location, store_location='feature_store_test',
+                                                registry_location='model_registry_test')
+        assert meta['n_rows'] == 5
+
+        stored_matrix = feature_store.open_matrix('feature_store_test', meta['corpus_snapshot'], 'v1')
+        expected = self.vectorizer.transform(['bad', 'bad bad', 'was great', 'It was bad', 'great'])
+        assert abs(feature_store.slice_rows(stored_matrix, 0, 5) - expected).max() < 1e-12
+
+
+class TestTrainFromStore(unittest.TestCase):
+    '''
+    Tests classifiers are trained and cross-validated on the stored vectors of a registered vectorizer,
+    and the trained models are saved with that vectorizer.
+    '''
+
+    def setUp(self):
+        synthetic_data.generate_steam_reviews_db('feature_store_test.db', 600)
+        documents = [row[USER_REVIEW_TEXT] for rows in database_manager.stream_steam_reviews('feature_store_test.db', 1000) for row in rows]
+        self.vectorizer = TfidfVectorizer().fit(documents)
+        classifier = LogisticRegression().fit(self.vectorizer.transform(documents[:2]), ['Not Recommended', 'Recommended'])
+        model_registry.register_model(self.vectorizer, classifier, {}, {}, 'model_registry_test')
+
+    def tearDown(self):
+        os.remove('feature_store_test.db')
+        shutil.rmtree('feature_store_test', ignore_errors=True)
+        shutil.rmtree('model_registry_test', ignore_errors=True)
+
+    def test(self):
+        db_location = 'feature_store_test.db'
+        train_classify_data.classify_reviews(db_location, ['mnb'], registry_location='model_registry_test', vectorizer_version='v1',
+                                             store_location='feature_store_test')
+
+        stored_matrix = feature_store.open_matrix('feature_store_test', feature_store.corpus_name(db_location), 'v1')
+        assert stored_matrix['n_rows'] == 600
+
+        vectorizer, _classifier, metadata = model_registry.load_model('v2', 'model_registry_test')
+        assert metadata['manifest']['feature_store'] == {'corpus_snapshot': feature_store.corpus_name(db_location),
+                                                         'vectorizer_version': 'v1', 'last_review_id': 600}
+        assert vectorizer.vocabulary_ == self.vectorizer.vocabulary_
+
+        summary = cross_validation.run_cross_validation(db_location, 200, n_folds=3, classifier_names=['mnb'], n_jobs=1,
+                                                        vectorizer_version='v1', store_location='feature_store_test',
+                                                        registry_location='model_registry_test')
+        assert summary.startswith('3-fold cross-validation of 200 reviews')
+
+        with self.assertRaises(ValueError):
+            train_classify_data.classify_reviews(db_location, ['mnb'], feature_reduction='chi2_2000', registry_location='model_registry_test',
+                                                 vectorizer_version='v1', store_location='feature_store_test')
+
+
+if __name__ == '__main__':
+    unittest.main()
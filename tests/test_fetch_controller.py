@@ -0,0 +1,116 @@
+#! usr/bin/env python3
+
+import os
+import sys
+import unittest
+
+import requests
+
+# Here we're moving the context into the parent folder
+parentPath = os.path.abspath("..")
+if parentPath not in sys.path:
+    sys.path.insert(0, parentPath)
+
+from application import fetch_controller
+from benchmarks import fake_steam
+
+"""
+These tests are for the AIMD controller that paces the scraper's requests.
+"""
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestAimdController(unittest.TestCase):
+    '''
+    Tests the rate goes up additively on healthy responses, halves on failures and rising latency
+    but only once per round trip, and holds requests back for a Retry-After.
+    '''
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.controller = fetch_controller.AimdController(initial_rate=2.0, max_rate=2.5, additive_increase=0.25,
+                                                          clock=self.clock)
+
+    def respond(self, seconds_later, latency=None, failed=False, retry_after=None):
+        self.clock.now += seconds_later
+        self.controller.acquire()
+        self.controller.release(latency, failed, retry_after)
+
+    def test(self):
+        controller = self.controller
+        assert controller.concurrency_limit() == 1
+        controller.acquire()
+        assert controller.seconds_until_ready() == 0.5
+        controller.release(0.1)
+        assert controller.rate == 2.25
+        self.respond(0.5, 0.1)
+        self.respond(0.5, 0.1)
+        assert controller.rate == 2.5
+
+        # Two failures arriving together only back off once
+        self.respond(1, failed=True)
+        assert controller.rate == 1.25
+        controller.in_flight += 1
+        controller.release(failed=True)
+        assert controller.rate == 1.25
+        assert controller.summary()['backoffs'] == 1
+
+        # Once a round trip has passed, latency well over the lowest seen backs off too
+        self.respond(1, 2.0)
+        assert controller.rate == 0.625
+
+        self.respond(10, failed=True, retry_after=30)
+        assert controller.seconds_until_ready() == 30
+        assert controller.rate == 0.3125
+        summary = controller.summary()
+        assert summary['failures'] == 3 and summary['successes'] == 4
+        assert summary['concurrency_limit'] == 1
+
+
+class TestFetch(unittest.TestCase):
+    '''
+    Tests fetch retries 5xx responses until one gets through, and raises once the attempts run out.
+    Errors that aren't retried still give back the request's slot.
+    '''
+
+    def setUp(self):
+        self.settings = fake_steam.FakeSteamSettings(review_density=1.0, error_5xx_rate=0.5, seed=3)
+        self.server = fake_steam.start_fake_steam(self.settings)
+
+    def tearDown(self):
+        fake_steam.stop_fake_steam(self.server)
+
+    def test(self):
+        controller = fetch_controller.AimdController(initial_rate=1000, max_rate=1000, min_rate=100)
+        url = '%s300000/' %(self.server.base_url)
+        for _request in range(10):
+            response = fetch_controller.fetch(controller, url, max_attempts=20, backoff_base=0.001)
+            assert response.status_code == 200
+        assert controller.summary()['retries'] > 0
+        assert controller.summary()['backoffs'] > 0
+
+        self.settings.error_5xx_rate = 1.0
+        with self.assertRaises(requests.HTTPError):
+            fetch_controller.fetch(controller, url, max_attempts=3, backoff_base=0.001)
+        statuses = self.server.stats.summary()['statuses']
+        assert statuses[200] == 10
+        assert statuses[503] == controller.summary()['failures']
+
+        # A URL with no scheme raises MissingSchema, a RequestException that isn't a timeout or connection error
+        single_controller = fetch_controller.AimdController(initial_rate=1000, max_rate=1000, min_rate=100)
+        for _request in range(2):
+            with self.assertRaises(requests.RequestException):
+                fetch_controller.fetch(single_controller, 'not-a-url', max_attempts=3, backoff_base=0.001)
+            assert single_controller.in_flight == 0
+        assert single_controller.summary()['failures'] == 2
+
+
+if __name__ == '__main__':
+    unittest.main()
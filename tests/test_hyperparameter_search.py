@@ -0,0 +1,75 @@
+#! usr/bin/env python3
+
+import os
+import sys
+import unittest
+
+# Here we're moving the context into the parent folder
+parentPath = os.path.abspath("..")
+if parentPath not in sys.path:
+    sys.path.insert(0, parentPath)
+
+from application import hyperparameter_search
+
+"""
+These tests are for the hyperparameter_search module.
+"""
+
+training_documents = ['It was bad', 'It was great', 'I want to cry myself to sleep', 'Loved it. Would play again'] * 30
+training_classes = ['Not Recommended', 'Recommended', 'Not Recommended', 'Recommended'] * 30
+testing_documents = ['It was bad', 'Loved it']
+testing_classes = ['Not Recommended', 'Recommended']
+
+vectorizer_grid = {'ngram_range': [(1, 1), (1, 2)]}
+classifier_grids = {
+    'mnb': hyperparameter_search.CLASSIFIER_GRIDS['mnb'],
+    'logistic_regression': hyperparameter_search.CLASSIFIER_GRIDS['logistic_regression'],
+}
+
+
+class TestGridSearchVectorizesOncePerVectorizerSetting(unittest.TestCase):
+    '''
+    Tests every candidate is scored, while the reviews are only vectorized once
+    for each set of vectorizer parameters, and the best can be scored on the test reviews.
+    '''
+
+    def test(self):
+        candidates = hyperparameter_search.make_candidates(vectorizer_grid, classifier_grids)
+        assert len(candidates) == 16
+
+        results, cache = hyperparameter_search.grid_search(training_documents, training_classes, testing_documents,
+                                                           testing_classes, candidates, n_jobs=2,
+                                                           classifier_grids=classifier_grids)
+        assert len(results) == 16
+        assert cache['misses'] == 2
+        assert results[0]['accuracy'] == 100.0
+        assert results[0]['accuracy'] >= results[-1]['accuracy']
+
+        best = hyperparameter_search.score_on_test(results[0], training_documents, training_classes,
+                                                   ['It was great', 'I want to cry'], ['Recommended', 'Not Recommended'],
+                                                   classifier_grids)
+        assert best['test_accuracy'] == 100.0
+        assert best['accuracy'] == results[0]['accuracy']
+
+
+class TestSuccessiveHalvingDropsCandidates(unittest.TestCase):
+    '''
+    Tests each round keeps a third of the candidates and trains them on more reviews,
+    until one is left.
+    '''
+
+    def test(self):
+        candidates = hyperparameter_search.make_candidates(vectorizer_grid, classifier_grids)
+
+        results, all_results, cache = hyperparameter_search.successive_halving(training_documents, training_classes,
+                                                                               testing_documents, testing_classes,
+                                                                               candidates, factor=3, min_reviews=10,
+                                                                               n_jobs=1, classifier_grids=classifier_grids)
+        assert [len(round_results) for round_results in all_results] == [16, 6, 2, 1]
+        reviews_per_round = [round_results[0]['reviews_trained'] for round_results in all_results]
+        assert reviews_per_round == sorted(reviews_per_round)
+        assert len(results) == 1
+
+
+if __name__ == '__main__':
+    unittest.main()
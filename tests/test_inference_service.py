@@ -0,0 +1,128 @@
+#! usr/bin/env python3
+
+import os
+import sys
+import json
+import shutil
+import threading
+import unittest
+import urllib.error
+import urllib.request
+import atexit
+
+# Here we're moving the context into the parent folder
+parentPath = os.path.abspath("..")
+if parentPath not in sys.path:
+    sys.path.insert(0, parentPath)
+
+from application import model_registry
+from application import inference_service
+
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+
+@atexit.register
+def goodbye():
+    shutil.rmtree('model_registry_test', ignore_errors=True)
+
+"""
+These tests are for the inference_service module.
+"""
+
+def train_test_model():
+    vectorizer = TfidfVectorizer()
+    vectors = vectorizer.fit_transform(['It was bad', 'It was great'] * 4)
+    classifier = LogisticRegression().fit(vectors, ['Not Recommended', 'Recommended'] * 4)
+    return vectorizer, classifier
+
+
+class TestMicroBatcherCoalescesRequests(unittest.TestCase):
+    '''
+    Tests requests sent at the same time are predicted together, and each gets its own results back.
+    '''
+
+    def test(self):
+        vectorizer, classifier = train_test_model()
+        batcher = inference_service.MicroBatcher(vectorizer, classifier, 'v1', max_batch_size=100, max_wait=0.2)
+
+        results = {}
+        def send(i):
+            results[i] = batcher.classify(['It was bad'] * (i % 2) + ['It was great'])
+
+        threads = [threading.Thread(target=send, args=(i,)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert [prediction['label'] for prediction in results[1]] == ['Not Recommended', 'Recommended']
+        assert [prediction['label'] for prediction in results[2]] == ['Recommended']
+
+        stats = batcher.stats.summary()
+        assert stats['requests'] == 8
+        assert stats['reviews'] == 12
+        assert stats['batches'] < 8
+
+
+class TestServiceOverHttp(unittest.TestCase):
+    '''
+    Tests the service classifies single and batched reviews sent as JSON, and reports its stats.
+    Reviews that aren't a list of strings get a 400, and a classifier that fails gets a 500, both with a JSON error.
+    '''
+
+    def setUp(self):
+        vectorizer, classifier = train_test_model()
+        version = model_registry.register_model(vectorizer, classifier, {}, {}, 'model_registry_test')
+        model_registry.promote_model(version, 'model_registry_test')
+
+        self.server = inference_service.make_server(port=0, registry_location='model_registry_test')
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = 'http://127.0.0.1:%s' %(self.server.server_address[1])
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree('model_registry_test', ignore_errors=True)
+
+    def post(self, body):
+        request = urllib.request.Request(self.url + '/classify', data=json.dumps(body).encode('utf-8'),
+                                         headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(request) as response:
+            return json.loads(response.read().decode('utf-8'))
+
+    def post_error(self, body):
+        try:
+            self.post(body)
+        except urllib.error.HTTPError as error:
+            return error.code, json.loads(error.read().decode('utf-8'))
+        assert False
+
+    def test(self):
+        response = self.post({'review': 'It was bad'})
+        assert response['model_version'] == 'v1'
+        assert response['predictions'][0]['label'] == 'Not Recommended'
+
+        response = self.post({'reviews': ['It was great', 'It was bad']})
+        assert [prediction['label'] for prediction in response['predictions']] == ['Recommended', 'Not Recommended']
+
+        with urllib.request.urlopen(self.url + '/stats') as response:
+            stats = json.loads(response.read().decode('utf-8'))
+        assert stats['requests'] == 2
+        assert stats['reviews'] == 3
+        assert stats['p99_latency_ms'] >= stats['p50_latency_ms']
+
+        for body in [{'reviews': 'It was bad'}, {'reviews': ['It was bad', 3]}, {'review': None}]:
+            status, response = self.post_error(body)
+            assert status == 400 and 'error' in response
+
+        class BrokenClassifier:
+            def predict_proba(self, vectors):
+                raise RuntimeError('out of memory')
+
+        self.server.batcher.classifier = BrokenClassifier()
+        status, response = self.post_error({'review': 'Never classified before'})
+        assert status == 500 and 'out of memory' in response['error']
+
+
+if __name__ == '__main__':
+    unittest.main()
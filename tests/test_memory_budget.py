@@ -0,0 +1,128 @@
+#! usr/bin/env python3
+
+import os
+import sys
+import subprocess
+import time
+import unittest
+import atexit
+
+# Here we're moving the context into the parent folder
+parentPath = os.path.abspath("..")
+if parentPath not in sys.path:
+    sys.path.insert(0, parentPath)
+
+from application import database_manager
+from application import memory_budget
+from benchmarks import synthetic_data
+
+@atexit.register
+def goodbye():
+    try:
+        os.remove('database_test.db')
+    except FileNotFoundError:
+        pass
+
+"""
+These tests are for the memory_budget module.
+"""
+
+class TestParseMemorySize(unittest.TestCase):
+    '''
+    Tests sizes with and without units are turned into bytes, and anything else is refused.
+    '''
+
+    def test(self):
+        assert memory_budget.parse_memory_size('512M') == 512 * 1024 ** 2
+        assert memory_budget.parse_memory_size('2gb') == 2 * 1024 ** 3
+        assert memory_budget.parse_memory_size('1.5K') == 1536
+        assert memory_budget.parse_memory_size('1000') == 1000
+        with self.assertRaises(ValueError):
+            memory_budget.parse_memory_size('lots')
+
+
+class TestPlanTraining(unittest.TestCase):
+    '''
+    Tests a large budget trains on every review size, fewer features or reviews are estimated to
+    need less memory, and a budget below what's already in use fails straight away with the estimate.
+    '''
+
+    def setUp(self):
+        synthetic_data.generate_steam_reviews_db('database_test.db', 2000, seed=1)
+
+    def tearDown(self):
+        database_manager.drop_steam_reviews('database_test.db')
+
+    def test(self):
+        db_location = 'database_test.db'
+        training_sizes = range(500, 4500, 500)
+        names = ['mnb', 'linear_svc']
+
+        plan = memory_budget.plan_training(db_location, 64 * 1024 ** 3, names, training_sizes)
+        assert plan['reviews_to_train'] == 4000
+        assert plan['max_features'] is None
+        assert plan['estimate']['peak_bytes'] <= 64 * 1024 ** 3
+
+        corpus = plan['corpus']
+        full_estimate = memory_budget.estimate_training_memory(corpus, 4000, None, names)
+        capped_estimate = memory_budget.estimate_training_memory(corpus, 4000, 1000, names)
+        fewer_estimate = memory_budget.estimate_training_memory(corpus, 1000, None, names)
+        assert capped_estimate['n_features'] == 1000 < full_estimate['n_features']
+        assert capped_estimate['stages']['fit mnb'] < full_estimate['stages']['fit mnb']
+        assert fewer_estimate['peak_bytes'] < full_estimate['peak_bytes']
+
+        with self.assertRaises(ValueError) as raised:
+            memory_budget.plan_training(db_location, 1024, names, training_sizes)
+        assert 'The smallest run, 500 reviews' in str(raised.exception)
+
+
+class TestRssMonitor(unittest.TestCase):
+    '''
+    Tests each stage's peak RSS is recorded, and a stage over the budget raises ValueError.
+    '''
+
+    def test(self):
+        monitor = memory_budget.RssMonitor(interval=0.001)
+        monitor.start()
+        with monitor.stage('allocate'):
+            allocated = bytearray(50 * 1024 ** 2)
+            del allocated
+        monitor.stop()
+
+        stage = monitor.stages[0]
+        assert stage['stage'] == 'allocate'
+        assert stage['peak_bytes'] >= stage['start_bytes'] + 40 * 1024 ** 2
+        assert 'allocate' in monitor.summary()
+
+        with self.assertRaises(ValueError):
+            with memory_budget.RssMonitor(budget_bytes=1).stage('anything'):
+                pass
+
+
+@unittest.skipUnless(os.path.exists('/proc/self/stat'), 'Child processes are found through /proc')
+class TestRssMonitorChildren(unittest.TestCase):
+    '''
+    Tests the memory of a child process counts towards the stage's peak RSS.
+    '''
+
+    def test(self):
+        monitor = memory_budget.RssMonitor(interval=0.001)
+        monitor.start()
+        with monitor.stage('child'):
+            # The bytes are written, so they're resident rather than pages of zeros that were never touched
+            child = subprocess.Popen([sys.executable, '-c', 'import sys; allocated = b"x" * (80 * 1024 ** 2); '
+                                      'print("allocated", flush=True); sys.stdin.read()'],
+                                     stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+            assert child.stdout.readline().strip() == b'allocated'
+            assert child.pid in memory_budget.child_pids(os.getpid())
+            assert memory_budget.rss_with_children_bytes([child.pid]) >= memory_budget.current_rss_bytes() + 70 * 1024 ** 2
+            # The monitor looks for children again, and samples while this one is still there
+            monitor.children_found = None
+            time.sleep(0.1)
+            child.communicate()
+        monitor.stop()
+
+        assert monitor.stages[0]['peak_bytes'] >= memory_budget.current_rss_bytes() + 60 * 1024 ** 2
+
+if __name__ == '__main__':
+    unittest.main()
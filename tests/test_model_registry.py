@@ -0,0 +1,152 @@
+#! usr/bin/env python3
+
+import os
+import sys
+import shutil
+import unittest
+import atexit
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# Here we're moving the context into the parent folder
+parentPath = os.path.abspath("..")
+if parentPath not in sys.path:
+    sys.path.insert(0, parentPath)
+
+from application import model_registry
+
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+
+@atexit.register
+def goodbye():
+    shutil.rmtree('model_registry_test', ignore_errors=True)
+
+"""
+These tests are for the model_registry module.
+"""
+
+class TestRegisterAndLoadModel(unittest.TestCase):
+    '''
+    Tests a saved vectorizer and classifier load back, with their arrays mapped into memory,
+    and give the same predictions as before they were saved.
+    '''
+
+    def setUp(self):
+        self.documents = ['It was bad', 'It was great', 'I want to cry myself to sleep', 'Loved it. Would play again'] * 3
+        self.classes = ['Not Recommended', 'Recommended', 'Not Recommended', 'Recommended'] * 3
+
+    def tearDown(self):
+        shutil.rmtree('model_registry_test', ignore_errors=True)
+
+    def test(self):
+        registry_location = 'model_registry_test'
+        vectorizer = TfidfVectorizer()
+        vectors = vectorizer.fit_transform(self.documents)
+        classifier = LogisticRegression().fit(vectors, self.classes)
+
+        version = model_registry.register_model(vectorizer, classifier, {'reviews_trained': 12}, {'accuracy': 100.0}, registry_location)
+        assert version == 'v1'
+
+        loaded_vectorizer, loaded_classifier, metadata = model_registry.load_model(version, registry_location)
+        assert metadata['manifest'] == {'reviews_trained': 12}
+        assert isinstance(loaded_vectorizer.idf_, np.memmap)
+        assert isinstance(loaded_classifier.coef_, np.memmap)
+
+        loaded_vectors = loaded_vectorizer.transform(self.documents)
+        assert (loaded_vectors != vectors).nnz == 0
+        assert list(loaded_classifier.predict(loaded_vectors)) == list(classifier.predict(vectors))
+
+        # One long term doesn't make every other term take as much space
+        long_vectorizer = TfidfVectorizer().fit(self.documents + ['a' * 100000])
+        version = model_registry.register_model(long_vectorizer, classifier, {}, {}, registry_location)
+        vectorizer_location = os.path.join(registry_location, version, 'vectorizer.joblib')
+        assert os.path.getsize(vectorizer_location) < 110000
+
+
+class TestRegisterConcurrently(unittest.TestCase):
+    '''
+    Tests models registered at the same time each get their own version, and all are in the index.
+    '''
+
+    def tearDown(self):
+        shutil.rmtree('model_registry_test', ignore_errors=True)
+
+    def test(self):
+        registry_location = 'model_registry_test'
+        vectorizer = TfidfVectorizer()
+        vectors = vectorizer.fit_transform(['It was bad', 'It was great'])
+        classifier = LogisticRegression().fit(vectors, ['Not Recommended', 'Recommended'])
+
+        with ThreadPoolExecutor(4) as executor:
+            versions = list(executor.map(lambda run: model_registry.register_model(vectorizer, classifier, {'run': run}, {},
+                                                                                   registry_location), range(8)))
+        assert sorted(versions) == sorted('v%s' %(number) for number in range(1, 9))
+        assert len(model_registry.list_models(registry_location)) == 8
+        assert not os.path.exists(os.path.join(registry_location, 'registry.lock'))
+
+
+class TestRegisterAfterFailedSave(unittest.TestCase):
+    '''
+    Tests a save that fails partway leaves nothing behind, so the next model still registers as the same version.
+    '''
+
+    def tearDown(self):
+        shutil.rmtree('model_registry_test', ignore_errors=True)
+
+    def test(self):
+        registry_location = 'model_registry_test'
+        vectorizer = TfidfVectorizer()
+        vectors = vectorizer.fit_transform(['It was bad', 'It was great'])
+        classifier = LogisticRegression().fit(vectors, ['Not Recommended', 'Recommended'])
+
+        # A lambda can't be pickled, so the vectorizer is saved and then the classifier fails
+        with self.assertRaises(Exception):
+            model_registry.register_model(vectorizer, lambda vectors: vectors, {}, {}, registry_location)
+        assert not os.path.exists(os.path.join(registry_location, 'v1'))
+        assert not os.path.exists(os.path.join(registry_location, 'v1.partial'))
+
+        assert model_registry.register_model(vectorizer, classifier, {}, {}, registry_location) == 'v1'
+        assert model_registry.register_model(vectorizer, classifier, {}, {}, registry_location) == 'v2'
+        assert [model['version'] for model in model_registry.list_models(registry_location)] == ['v1', 'v2']
+
+
+class TestPromoteModel(unittest.TestCase):
+    '''
+    Tests the promoted version is the one loaded when no version is asked for,
+    and that an unknown version can't be promoted.
+    '''
+
+    def tearDown(self):
+        shutil.rmtree('model_registry_test', ignore_errors=True)
+
+    def test(self):
+        registry_location = 'model_registry_test'
+        vectorizer = TfidfVectorizer()
+        vectors = vectorizer.fit_transform(['It was bad', 'It was great'])
+        classifier = LogisticRegression().fit(vectors, ['Not Recommended', 'Recommended'])
+
+        model_registry.register_model(vectorizer, classifier, {}, {}, registry_location)
+        model_registry.register_model(vectorizer, classifier, {}, {}, registry_location)
+
+        try:
+            model_registry.load_model(registry_location=registry_location)
+            assert False
+        except ValueError:
+            pass
+
+        model_registry.promote_model('v2', registry_location)
+        _vectorizer, _classifier, metadata = model_registry.load_model(registry_location=registry_location)
+        assert metadata['version'] == 'v2'
+        assert [model['promoted'] for model in model_registry.list_models(registry_location)] == [False, True]
+
+        try:
+            model_registry.promote_model('v3', registry_location)
+            assert False
+        except ValueError:
+            pass
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+#! usr/bin/env python3
+
+import os
+import sys
+import unittest
+import sqlite3
+import atexit
+
+# Here we're moving the context into the parent folder
+parentPath = os.path.abspath("..")
+if parentPath not in sys.path:
+    sys.path.insert(0, parentPath)
+
+from application import database_manager
+from application import near_duplicates
+from archive import data_prep
+
+@atexit.register
+def goodbye():
+    try:
+        os.remove('database_test.db')
+    except FileNotFoundError:
+        pass
+
+"""
+These tests are for the near_duplicates module.
+"""
+
+class TestFindNearDuplicates(unittest.TestCase):
+    '''
+    Tests a review with one word changed is flagged against the earlier review, across runs,
+    that unrelated reviews aren't, and that copies with opposite recommendations are left out of training.
+    '''
+
+    def setUp(self):
+        db_location = 'database_test.db'
+        database_manager.create_steam_reviews(db_location)
+        database_manager.insert_data_steam_reviews(db_location, 'url_1', 300000, '2011-01-01', 0, 'Recommended', 'This game is a masterpiece of open world design with a great story, great characters and hundreds of hours of things to do', 'Destroyer')
+        database_manager.insert_data_steam_reviews(db_location, 'url_2', 300020, '2011-01-01', 0, 'Not Recommended', 'It crashed every ten minutes and the developers never answered a single bug report', 'Dismantler')
+        database_manager.insert_data_steam_reviews(db_location, 'url_3', 300025, '2011-01-01', 0, 'Recommended', 'I want to cry myself to sleep', 'Makiavelli')
+
+    def tearDown(self):
+        db_location = 'database_test.db'
+        database_manager.drop_steam_reviews(db_location)
+        with sqlite3.connect(db_location, timeout=20) as db:
+            cur = db.cursor()
+            cur.execute('DROP TABLE review_minhashes;')
+            cur.execute('DROP TABLE review_lsh_bands;')
+            cur.execute('DROP TABLE review_near_duplicates;')
+
+    def test(self):
+        db_location = 'database_test.db'
+        assert near_duplicates.find_near_duplicates(db_location) == (3, 0)
+
+        database_manager.insert_data_steam_reviews(db_location, 'url_4', 300040, '2011-01-01', 0, 'Not Recommended', 'This game is a masterpiece of open world design with a great story, great characters and hundreds of hours of things to do!!', 'Copycat')
+        database_manager.insert_data_steam_reviews(db_location, 'url_5', 300040, '2011-01-01', 0, 'Recommended', 'This game is a masterpiece of open world design with a great story, great characters and hundreds of hours of things to do', 'Copycat2')
+        assert near_duplicates.find_near_duplicates(db_location, chunk_size=1) == (2, 2)
+        assert near_duplicates.find_near_duplicates(db_location) == (0, 0)
+
+        flagged = database_manager.retrieve_near_duplicates(db_location)
+        assert [(review_id, duplicate_of, conflicting) for review_id, duplicate_of, _similarity, conflicting in flagged] == [(4, 1, 1), (5, 1, 0)]
+        assert near_duplicates.cluster_near_duplicates(flagged) == [[1, 4, 5]]
+
+        recommended_reviews, not_recommended_reviews = data_prep.retrieve_review_batches_balanced(db_location, 10,
+                                                                                                  exclude_near_duplicates=True)
+        assert list(recommended_reviews.ids) == [3]
+        assert list(not_recommended_reviews.ids) == [2]
+
+        # After a drop the ids start again, so nothing found for the old reviews is kept for the new ones
+        database_manager.drop_steam_reviews(db_location)
+        database_manager.create_steam_reviews(db_location)
+        database_manager.insert_data_steam_reviews(db_location, 'url_6', 300045, '2011-01-01', 0, 'Recommended', 'Short and sweet', 'Newcomer')
+        assert near_duplicates.find_near_duplicates(db_location) == (1, 0)
+        assert database_manager.retrieve_near_duplicates(db_location) == []
+
+
+class TestManyCopies(unittest.TestCase):
+    '''
+    Tests each copy of a review pasted many times is flagged once, against the first review,
+    rather than against every earlier copy.
+    '''
+
+    def tearDown(self):
+        db_location = 'database_test.db'
+        database_manager.drop_steam_reviews(db_location)
+        with sqlite3.connect(db_location, timeout=20) as db:
+            cur = db.cursor()
+            cur.execute('DROP TABLE review_minhashes;')
+            cur.execute('DROP TABLE review_lsh_bands;')
+            cur.execute('DROP TABLE review_near_duplicates;')
+
+    def test(self):
+        db_location = 'database_test.db'
+        database_manager.create_steam_reviews(db_location)
+        database_manager.insert_many_steam_reviews(db_location, [('url_%s' %(index), 300000, '2011-01-01', 0, 'Recommended', 'good game', 'Copycat')
+                                                                 for index in range(3000)])
+        assert near_duplicates.find_near_duplicates(db_location, chunk_size=700) == (3000, 2999)
+
+        flagged = database_manager.retrieve_near_duplicates(db_location)
+        assert set(duplicate_of for _review_id, duplicate_of, _similarity, _conflicting in flagged) == {1}
+        with sqlite3.connect(db_location, timeout=20) as db:
+            assert db.cursor().execute('SELECT COUNT(*) FROM review_lsh_bands;').fetchone() == (near_duplicates.BANDS,)
+
+
+class TestMinhashSimilarity(unittest.TestCase):
+    '''
+    Tests the signatures estimate the Jaccard similarity of the shingles.
+    '''
+
+    def test(self):
+        words = ['word%s' %(index) for index in range(200)]
+        shingles = near_duplicates.make_shingles(' '.join(words))
+        other_shingles = near_duplicates.make_shingles(' '.join(words[:100] + ['changed'] + words[101:]))
+        jaccard = len(shingles & other_shingles) / len(shingles | other_shingles)
+
+        similarity = near_duplicates.estimated_similarity(near_duplicates.minhash_signature(shingles),
+                                                          near_duplicates.minhash_signature(other_shingles))
+        assert abs(similarity - jaccard) < 0.15
+        assert near_duplicates.make_shingles('OMG') == {'omg'}
+
+
+if __name__ == '__main__':
+    unittest.main()
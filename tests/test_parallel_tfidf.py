@@ -0,0 +1,80 @@
+#! usr/bin/env python3
+
+import os
+import sys
+import unittest
+
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+# Here we're moving the context into the parent folder
+parentPath = os.path.abspath("..")
+if parentPath not in sys.path:
+    sys.path.insert(0, parentPath)
+
+from application import parallel_tfidf, text_normalizer
+from benchmarks import synthetic_data
+
+"""
+These tests are for the parallel_tfidf module.
+"""
+
+def make_documents(n_documents):
+    random_state = np.random.RandomState(0)
+    vocabulary = synthetic_data.make_vocabulary(random_state, size=500)
+    recommendations = ['Recommended', 'Not Recommended'] * (n_documents // 2)
+    return synthetic_data.make_review_texts(random_state, vocabulary, synthetic_data.make_word_probabilities(len(vocabulary)),
+                                            recommendations)
+
+
+def same_matrix(first, second):
+    return (first.shape == second.shape and np.array_equal(first.indptr, second.indptr)
+            and np.array_equal(first.indices, second.indices) and np.array_equal(first.data, second.data))
+
+
+class TestSplitDocuments(unittest.TestCase):
+    '''
+    Tests the slices are contiguous, cover every document and differ in size by one at most.
+    '''
+
+    def test(self):
+        slices = parallel_tfidf.split_documents(list(range(10)), 4)
+        assert slices == [[0, 1, 2], [3, 4, 5], [6, 7], [8, 9]]
+        assert parallel_tfidf.split_documents(['a'], 2) == [['a'], []]
+
+
+class TestFitTransformParallel(unittest.TestCase):
+    '''
+    Tests the vectors and vectorizer are the same as TfidfVectorizer's, to the last bit, with pruning,
+    max_features, binary, dtype and the pretokenized parameters, and with any number of workers.
+    The settings the workers can't honour raise.
+    '''
+
+    def test(self):
+        documents = make_documents(400)
+        settings = [{}, {'min_df': 2, 'max_df': 0.5}, {'min_df': 2, 'max_features': 50}, {'max_features': 30, 'sublinear_tf': True},
+                    {'binary': True, 'max_features': 40}, {'dtype': np.float32, 'min_df': 2},
+                    dict(text_normalizer.PRETOKENIZED_VECTORIZER_PARAMS, ngram_range=(1, 2))]
+        for vectorizer_params in settings:
+            serial_vectorizer = TfidfVectorizer(**vectorizer_params)
+            serial_vectors = serial_vectorizer.fit_transform(documents)
+            for workers in (2, 3):
+                vectors, vectorizer = parallel_tfidf.fit_transform_parallel(documents, workers, **vectorizer_params)
+                assert same_matrix(vectors, serial_vectors), (vectorizer_params, workers)
+                assert vectors.dtype == serial_vectors.dtype
+                assert list(vectorizer.get_feature_names_out()) == list(serial_vectorizer.get_feature_names_out())
+                assert np.array_equal(vectorizer.idf_, serial_vectorizer.idf_)
+                assert same_matrix(vectorizer.transform(documents[:20]), serial_vectorizer.transform(documents[:20]))
+
+        with self.assertRaises(ValueError):
+            parallel_tfidf.fit_transform_parallel(['a', 'b'], 2)
+        with self.assertRaises(ValueError):
+            parallel_tfidf.fit_transform_parallel(documents, 2, min_df=10, max_df=5)
+        with self.assertRaises(ValueError):
+            parallel_tfidf.fit_transform_parallel(documents, 2, use_idf=False)
+        with self.assertRaises(ValueError):
+            parallel_tfidf.fit_transform_parallel(documents, 2, vocabulary=['fun'])
+
+
+if __name__ == '__main__':
+    unittest.main()
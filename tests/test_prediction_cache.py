@@ -0,0 +1,103 @@
+#! usr/bin/env python3
+
+import os
+import sys
+import unittest
+import sqlite3
+import atexit
+
+# Here we're moving the context into the parent folder
+parentPath = os.path.abspath("..")
+if parentPath not in sys.path:
+    sys.path.insert(0, parentPath)
+
+from application import classify_data
+from application import prediction_cache
+from application.text_normalizer import PRETOKENIZED_VECTORIZER_PARAMS
+
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+
+@atexit.register
+def goodbye():
+    try:
+        os.remove('database_test.db')
+    except FileNotFoundError:
+        pass
+
+"""
+These tests are for the prediction_cache module.
+"""
+
+class TestTextKey(unittest.TestCase):
+    '''
+    Tests texts that only differ in case and punctuation share a key when the vectorizer can't tell them apart,
+    and don't when it can.
+    '''
+
+    def test(self):
+        assert prediction_cache.text_key('Good  game!') == prediction_cache.text_key('good game')
+        assert prediction_cache.text_key('Good  game!', normalize=False) != prediction_cache.text_key('good game', normalize=False)
+        assert prediction_cache.keys_normalized_text(TfidfVectorizer()) == True
+        assert prediction_cache.keys_normalized_text(TfidfVectorizer(**PRETOKENIZED_VECTORIZER_PARAMS)) == False
+        assert prediction_cache.keys_normalized_text(TfidfVectorizer(analyzer='char')) == False
+
+
+class TestPredictWithCache(unittest.TestCase):
+    '''
+    Tests cached predictions match uncached ones, repeated and cached texts aren't predicted again,
+    predictions are kept in the db between caches, and the db keeps the most recently used.
+    '''
+
+    def setUp(self):
+        self.vectorizer = TfidfVectorizer()
+        vectors = self.vectorizer.fit_transform(['It was bad', 'It was great'] * 4)
+        self.classifier = LogisticRegression().fit(vectors, ['Not Recommended', 'Recommended'] * 4)
+
+    def tearDown(self):
+        with sqlite3.connect('database_test.db', timeout=20) as db:
+            db.cursor().execute('DROP TABLE IF EXISTS prediction_cache;')
+
+    def test(self):
+        db_location = 'database_test.db'
+        documents = ['It was bad', 'It was great', 'it was BAD!!', 'It was great']
+
+        cache = prediction_cache.PredictionCache(db_location)
+        predictions, confidences = classify_data.predict_with_cache(cache, self.vectorizer, self.classifier, 'v1', documents)
+        expected_predictions, expected_confidences = classify_data.predict_with_confidence(self.classifier, self.vectorizer.transform(documents))
+        assert predictions == [str(prediction) for prediction in expected_predictions]
+        assert confidences == [float(confidence) for confidence in expected_confidences]
+        assert (cache.hits, cache.misses) == (2, 2)
+
+        classify_data.predict_with_cache(cache, self.vectorizer, self.classifier, 'v1', ['IT WAS GREAT'])
+        assert cache.hit_rate() == 0.6
+
+        new_cache = prediction_cache.PredictionCache(db_location, max_entries=3)
+        classify_data.predict_with_cache(new_cache, self.vectorizer, self.classifier, 'v1', ['It was great'])
+        assert (new_cache.hits, new_cache.misses) == (1, 0)
+        classify_data.predict_with_cache(new_cache, self.vectorizer, self.classifier, 'v2', ['It was great', 'It was ok'])
+        assert (new_cache.hits, new_cache.misses) == (1, 2)
+
+        with sqlite3.connect(db_location, timeout=20) as db:
+            cur = db.cursor()
+            cur.execute('SELECT model_version, COUNT(*) FROM prediction_cache GROUP BY model_version;')
+            # The v1 prediction for 'It was bad' was the least recently used
+            assert cur.fetchall() == [('v1', 1), ('v2', 2)]
+
+        # The table is only counted every trim_interval predictions after the first save
+        trimming_cache = prediction_cache.PredictionCache(db_location, max_entries=3, trim_interval=4)
+        classify_data.predict_with_cache(trimming_cache, self.vectorizer, self.classifier, 'v3', ['fun', 'dull'])
+        classify_data.predict_with_cache(trimming_cache, self.vectorizer, self.classifier, 'v3', ['fast', 'slow'])
+        with sqlite3.connect(db_location, timeout=20) as db:
+            assert db.cursor().execute('SELECT COUNT(*) FROM prediction_cache;').fetchone() == (5,)
+        classify_data.predict_with_cache(trimming_cache, self.vectorizer, self.classifier, 'v3', ['cheap', 'pricey'])
+        with sqlite3.connect(db_location, timeout=20) as db:
+            assert db.cursor().execute('SELECT COUNT(*) FROM prediction_cache;').fetchone() == (3,)
+
+        small_cache = prediction_cache.PredictionCache(memory_entries=1)
+        classify_data.predict_with_cache(small_cache, self.vectorizer, self.classifier, 'v1', documents)
+        assert len(small_cache.memory) == 1
+
+
+if __name__ == '__main__':
+    unittest.main()
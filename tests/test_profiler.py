@@ -0,0 +1,141 @@
+#! usr/bin/env python3
+
+import os
+import sys
+import unittest
+import atexit
+import shutil
+import threading
+import time
+
+# Here we're moving the context into the parent folder
+parentPath = os.path.abspath("..")
+if parentPath not in sys.path:
+    sys.path.insert(0, parentPath)
+
+from application import database_manager
+from application import profiler
+
+@atexit.register
+def goodbye():
+    try:
+        os.remove('database_test.db')
+    except FileNotFoundError:
+        pass
+    shutil.rmtree('profile_test', ignore_errors=True)
+
+"""
+These tests are for the profiler module.
+"""
+
+def profiled_command(db_location):
+    database_manager.create_steam_reviews(db_location)
+    database_manager.insert_data_steam_reviews(db_location, 'url_1', 300000, '2011-01-01', 0, 'Recommended', 'It was great', 'Destroyer')
+    with profiler.phase('vectorize'):
+        vectors = [list(range(100000))]
+        with profiler.phase('fit'):
+            time.sleep(0.02)
+    database_manager.drop_steam_reviews(db_location)
+    return len(vectors)
+
+
+class TestProfileCommand(unittest.TestCase):
+    '''
+    Tests the phases are counted, nested phases count towards both, the files are written,
+    and the hooks are off again afterwards.
+    '''
+
+    def test(self):
+        result = profiler.profile_command(profiled_command, 'database_test.db', output_location='profile_test',
+                                          sample_stacks=True, sample_interval=0.001)
+        assert result == 1
+        assert profiler._profile_state is None
+
+        for file_name in ('profile.prof', 'summary.txt', 'stacks.txt'):
+            assert os.path.exists(os.path.join('profile_test', file_name))
+
+        with open(os.path.join('profile_test', 'summary.txt')) as summary_file:
+            summary = summary_file.read().splitlines()
+        phase_lines = {line.split(', ')[0]: line.split(', ') for line in summary if line.startswith(profiler.PHASES)}
+        assert phase_lines['db'][1] == '1'
+        assert phase_lines['vectorize'][1] == '1'
+        assert float(phase_lines['vectorize'][2]) >= float(phase_lines['fit'][2]) >= 0.02
+        # The list of 100000 ints made in vectorize is well over 1MiB
+        assert float(phase_lines['vectorize'][3].split()[0]) > 1.0
+
+        with profiler.phase('fit'):
+            pass
+
+
+def threaded_command():
+    worker_in_phase, command_finished = threading.Event(), threading.Event()
+
+    def worker():
+        with profiler.phase('fetch'):
+            worker_in_phase.set()
+            command_finished.wait()
+
+    thread = threading.Thread(target=worker)
+    with profiler.phase('vectorize'):
+        vectors = [list(range(100000))]
+        n_vectors = len(vectors)
+        del vectors
+        # The worker's phase starts and is still running while this thread's phases start and finish
+        thread.start()
+        worker_in_phase.wait()
+        with profiler.phase('fit'):
+            pass
+    command_finished.set()
+    thread.join()
+    return n_vectors
+
+
+class TestProfileThreads(unittest.TestCase):
+    '''
+    Tests phases in other threads are counted without touching the profiling thread's running phases,
+    so its peak memory is still measured.
+    '''
+
+    def test(self):
+        result = profiler.profile_command(threaded_command, output_location='profile_test')
+        assert result == 1
+
+        with open(os.path.join('profile_test', 'summary.txt')) as summary_file:
+            summary = summary_file.read().splitlines()
+        phase_lines = {line.split(', ')[0]: line.split(', ') for line in summary if line.startswith(profiler.PHASES)}
+        assert phase_lines['fetch'][1] == phase_lines['fit'][1] == phase_lines['vectorize'][1] == '1'
+        assert float(phase_lines['vectorize'][3].split()[0]) > 1.0
+
+
+def phases_after_peak_command():
+    with profiler.phase('vectorize'):
+        vectors = [list(range(100000))]
+        n_vectors = len(vectors)
+        del vectors
+    # Each phase resets tracemalloc's peak, so these would hide vectorize's peak from the command's
+    with profiler.phase('fit'):
+        pass
+    with profiler.phase('db'):
+        pass
+    return n_vectors
+
+
+class TestOverallPeak(unittest.TestCase):
+    '''
+    Tests the command's peak memory is at least the largest phase's, with phases run after that peak.
+    '''
+
+    def test(self):
+        result = profiler.profile_command(phases_after_peak_command, output_location='profile_test')
+        assert result == 1
+
+        with open(os.path.join('profile_test', 'summary.txt')) as summary_file:
+            summary = summary_file.read().splitlines()
+        overall_peak = float(summary[0].split('peak memory ')[1].split()[0])
+        phase_peaks = [float(line.split(', ')[3].split()[0]) for line in summary if line.startswith(profiler.PHASES)]
+        assert max(phase_peaks) > 1.0
+        assert overall_peak >= max(phase_peaks)
+
+
+if __name__ == '__main__':
+    unittest.main()
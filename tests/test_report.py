@@ -0,0 +1,87 @@
+#! usr/bin/env python3
+
+import os
+import sys
+import unittest
+import sqlite3
+import atexit
+import shutil
+
+# Here we're moving the context into the parent folder
+parentPath = os.path.abspath("..")
+if parentPath not in sys.path:
+    sys.path.insert(0, parentPath)
+
+from application import database_manager
+from application import report
+
+@atexit.register
+def goodbye():
+    try:
+        os.remove('database_test.db')
+    except FileNotFoundError:
+        pass
+    shutil.rmtree('report_test', ignore_errors=True)
+
+"""
+These tests are for the report module, and the report tables database_manager keeps.
+"""
+
+class TestReportTables(unittest.TestCase):
+    '''
+    Tests the counts kept by the triggers match the reviews and predictions after inserts,
+    deletes and replaced predictions, and that the report is written.
+    '''
+
+    def setUp(self):
+        db_location = 'database_test.db'
+        database_manager.create_steam_reviews(db_location)
+        database_manager.create_review_predictions(db_location)
+        database_manager.insert_data_steam_reviews(db_location, 'url_1', 300000, '2011-01-01 10:00:00', 0, 'Recommended', 'It was great', 'Destroyer')
+        database_manager.insert_data_steam_reviews(db_location, 'url_2', 300000, '2011-01-01 11:00:00', 0, 'Not Recommended', 'It was bad', 'Dismantler')
+        database_manager.insert_data_steam_reviews(db_location, 'url_3', 300025, '2011-01-02 10:00:00', 0, 'Not Recommended', 'OMG' * 100, 'Makiavelli')
+        database_manager.insert_data_steam_reviews(db_location, 'url_4', 300025, '2011-01-02 10:00:00', 0, 'Not Recommended', 'OMG' * 100, 'Makiavelli')
+
+    def tearDown(self):
+        db_location = 'database_test.db'
+        database_manager.drop_steam_reviews(db_location)
+        with sqlite3.connect(db_location, timeout=20) as db:
+            cur = db.cursor()
+            cur.execute('DROP TABLE review_predictions;')
+            cur.execute('DROP TABLE report_app_counts;')
+            cur.execute('DROP TABLE report_daily_counts;')
+            cur.execute('DROP TABLE report_length_counts;')
+            cur.execute('DROP TABLE report_classification_counts;')
+
+    def test(self):
+        db_location = 'database_test.db'
+        database_manager.remove_duplicates_steam_reviews(db_location)
+
+        assert database_manager.retrieve_report_app_counts(db_location) == [(300000, 'Not Recommended', 1, 10.0), (300000, 'Recommended', 1, 12.0), (300025, 'Not Recommended', 1, 300.0)]
+        assert database_manager.retrieve_report_daily_counts(db_location) == [('2011-01-01', 'Not Recommended', 1), ('2011-01-01', 'Recommended', 1), ('2011-01-02', 'Not Recommended', 1)]
+        assert database_manager.retrieve_report_length_counts(db_location) == [(0, 'Not Recommended', 1), (0, 'Recommended', 1), (300, 'Not Recommended', 1)]
+
+        database_manager.insert_review_predictions(db_location, [(1, 'Recommended', 0.9, 'v1', '2011-02-01 10:00:00'),
+                                                                 (2, 'Recommended', 0.6, 'v1', '2011-02-01 10:00:00'),
+                                                                 (4, 'Not Recommended', 0.8, 'v1', '2011-02-01 10:00:00')])
+        database_manager.insert_review_predictions(db_location, [(2, 'Not Recommended', 0.7, 'v2', '2011-02-02 10:00:00')])
+        assert database_manager.retrieve_report_classification_accuracy(db_location) == [('v1', '2011-02-01', 2, 2), ('v2', '2011-02-02', 1, 1)]
+
+        database_manager.reset_review_predictions(db_location)
+        assert database_manager.retrieve_report_classification_accuracy(db_location) == []
+
+        # Dropping steam_reviews drops its triggers, which are made again with the counts rebuilt from a scan
+        database_manager.drop_steam_reviews(db_location)
+        database_manager.create_steam_reviews(db_location)
+        database_manager.insert_data_steam_reviews(db_location, 'url_5', 300040, '2011-01-03', 0, 'Recommended', 'It was great', 'GiveMeSugar')
+        assert database_manager.retrieve_report_app_counts(db_location) == [(300040, 'Recommended', 1, 12.0)]
+
+        assert report.make_report(db_location, 'report_test', 'model_registry_test') == 'Report of 1 reviews written to report_test/report.html'
+        with open('report_test/apps.csv') as csv_file:
+            assert csv_file.read().splitlines() == ['app_num,user_recommendation,reviews,mean_length', '300040,Recommended,1,12.0']
+        with open('report_test/report.html') as html_file:
+            assert '<td>300040</td>' in html_file.read()
+
+
+if __name__ == '__main__':
+    unittest.main()
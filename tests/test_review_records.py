@@ -0,0 +1,93 @@
+#! usr/bin/env python3
+
+import os
+import sys
+import unittest
+import atexit
+
+# Here we're moving the context into the parent folder
+parentPath = os.path.abspath("..")
+if parentPath not in sys.path:
+    sys.path.insert(0, parentPath)
+
+from application import database_manager
+from application import review_records
+
+from archive import data_prep
+
+@atexit.register
+def goodbye():
+    try:
+        os.remove('database_test.db')
+    except FileNotFoundError:
+        pass
+
+"""
+These tests are for the review_records module, and the db and data_prep functions that use it.
+"""
+
+class TestReviewBatch(unittest.TestCase):
+    '''
+    Tests a batch keeps its columns in arrays, and slices and adds up like a list of rows.
+    '''
+
+    def test(self):
+        rows = [(3, 300000, 'Recommended', 'It was great'), (2, 300005, 'Not Recommended', 'It was bad'),
+                (1, 300010, 'Recommended', 'OMG')]
+        batch = review_records.ReviewBatch.from_rows(iter(rows))
+        assert len(batch) == 3
+        assert list(batch.ids) == [3, 2, 1] and batch.ids.typecode == 'q'
+        assert list(batch.app_nums) == [300000, 300005, 300010]
+        assert list(batch.labels) == [1, 0, 1] and batch.labels.typecode == 'b'
+        assert batch.classes() == ['Recommended', 'Not Recommended', 'Recommended']
+
+        joined = batch[2:] + batch[:1]
+        assert list(joined.ids) == [1, 3]
+        assert joined.texts == ['OMG', 'It was great']
+        assert joined.classes() == ['Recommended', 'Recommended']
+        assert len(batch) == 3
+
+        with self.assertRaises(TypeError):
+            batch[0]
+        with self.assertRaises(AttributeError):
+            batch.extra = 1
+
+
+class TestReviewRecordsFromDb(unittest.TestCase):
+    '''
+    Tests rows come back as ReviewRows, batches hold the same reviews, and data_prep prepares
+    the same documents and classes from batches as from rows.
+    '''
+
+    def setUp(self):
+        db_location = 'database_test.db'
+        database_manager.create_steam_reviews(db_location)
+        rows = [('url_%s' %(number), 300000 + number, '2011-01-01', 0, recommendation, 'Review %s' %(number), 'user_%s' %(number))
+                for number, recommendation in enumerate(['Recommended', 'Not Recommended'] * 6)]
+        database_manager.insert_many_steam_reviews(db_location, iter(rows))
+
+    def tearDown(self):
+        database_manager.drop_steam_reviews('database_test.db')
+
+    def test(self):
+        db_location = 'database_test.db'
+        last_review = database_manager.retrieve_last_steam_review(db_location)
+        assert isinstance(last_review, review_records.ReviewRow)
+        assert last_review.app_num == 300011 and last_review.user_recommendation == 'Not Recommended'
+        assert last_review[review_records.USER_REVIEW_TEXT] == 'Review 11'
+
+        rows = database_manager.retrieve_steam_reviews(db_location, 'Recommended', 0, 4)
+        batch = database_manager.retrieve_steam_review_batch(db_location, 'Recommended', 4)
+        assert list(batch.ids) == [row.id for row in rows]
+        assert batch.texts == [row.user_review_text for row in rows]
+
+        recommended_rows = database_manager.retrieve_steam_reviews(db_location, 'Recommended', None, 5)
+        not_recommended_rows = database_manager.retrieve_steam_reviews(db_location, 'Not Recommended', None, 5)
+        training_rows, testing_rows = data_prep.form_training_test_lists(recommended_rows, not_recommended_rows, 4)
+        from_rows = ([row.user_review_text for row in training_rows], [row.user_review_text for row in testing_rows],
+                     [row.user_recommendation for row in training_rows], [row.user_recommendation for row in testing_rows])
+        assert data_prep.prep_for_classifiers(db_location, 10, 4) == from_rows
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+#! usr/bin/env python3
+
+import os
+import sys
+import unittest
+import subprocess
+import atexit
+import json
+import shutil
+
+# Here we're moving the context into the parent folder
+parentPath = os.path.abspath("..")
+if parentPath not in sys.path:
+    sys.path.insert(0, parentPath)
+
+import run_app
+
+@atexit.register
+def goodbye():
+    shutil.rmtree('run_app_test', ignore_errors=True)
+
+"""
+These tests are for the command registry in run_app.
+"""
+
+class TestCommandsImportLazily(unittest.TestCase):
+    '''
+    Tests a command only imports its own modules, so list_models and compare_benchmarks don't
+    load sklearn, numpy or requests, and that every command's modules can be imported.
+    '''
+
+    def test(self):
+        run_app_location = os.path.abspath(run_app.__file__)
+        os.makedirs('run_app_test', exist_ok=True)
+        code = ('import sys; sys.path.insert(0, %r); sys.argv = ["run_app.py", "list_models"]; import run_app; '
+                'print(run_app.receive_inputs()); '
+                'print(sorted(name for name in ("sklearn", "numpy", "requests", "bs4") if name in sys.modules))'
+                %(os.path.dirname(run_app_location)))
+        completed = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, cwd='run_app_test')
+        assert completed.stdout.splitlines() == ['No models have been registered yet.', '[]']
+
+        results = {'commit': 'abc1234', 'n_rows': 100, 'benchmarks': {'vectorize': {'best_seconds': 1.0}}}
+        for file_name in ('old.json', 'new.json'):
+            with open(os.path.join('run_app_test', file_name), 'w') as results_file:
+                json.dump(results, results_file)
+        code = ('import sys; sys.path.insert(0, %r); sys.argv = ["run_app.py", "compare_benchmarks", "old.json", "new.json"]; '
+                'import run_app; print(run_app.receive_inputs()); '
+                'print(sorted(name for name in ("sklearn", "numpy", "requests", "bs4") if name in sys.modules))'
+                %(os.path.dirname(run_app_location)))
+        completed = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, cwd='run_app_test')
+        assert completed.stdout.splitlines()[-2:] == ['vectorize: 1.0000s -> 1.0000s (+0.0%)', '[]']
+
+        for command, (module_names, _function) in run_app.COMMANDS.items():
+            modules, import_seconds = run_app.load_modules(module_names)
+            assert sorted(modules) == sorted(module_name.rsplit('.', 1)[-1] for module_name in module_names)
+
+        assert run_app.process_inputs(['run_app.py']) == run_app.inputs_feedback()
+        assert run_app.process_inputs(['run_app.py', 'scrape_steam']) == run_app.inputs_feedback()
+        assert run_app.process_inputs(['run_app.py', 'promote_model']) == run_app.inputs_feedback()
+
+
+if __name__ == '__main__':
+    unittest.main()
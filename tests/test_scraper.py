@@ -13,18 +13,23 @@ if parentPath not in sys.path:
 
 from application import database_manager
 from application import scraper
+from benchmarks import fake_steam
 
 from archive import data_prep
 from archive import train_classify_data
 
 from sklearn.feature_extraction.text import TfidfVectorizer
 
+# A local stand-in for the Steam store, where every app has reviews, so the tests don't need the network
+fake_steam_server = fake_steam.start_fake_steam(fake_steam.FakeSteamSettings(review_density=1.0))
+
 @atexit.register
 def goodbye():
     try:
         os.remove('database_test.db')
     except FileNotFoundError:
         pass
+    fake_steam.stop_fake_steam(fake_steam_server)
 
 """
 These tests check the scraper is taking content down from the web as it should.
@@ -38,7 +43,7 @@ class TestScrapeOneGamePage(unittest.TestCase):
     '''
 
     def test(self):
-        request_response = scraper.scrape_app_page('http://store.steampowered.com/app/', 334190)
+        request_response = scraper.scrape_app_page(fake_steam_server.base_url, 334190)
         assert hasattr(request_response, 'title')
         assert hasattr(request_response, 'body')
 
@@ -51,7 +56,7 @@ class TestScrapedPageHasReviews(unittest.TestCase):
     '''
 
     def test(self):
-        request_response = scraper.scrape_app_page('http://store.steampowered.com/app/', 80)
+        request_response = scraper.scrape_app_page(fake_steam_server.base_url, 80)
         assert scraper.page_has_reviews(request_response) == True
 
 
@@ -62,7 +67,7 @@ class TestScrapedPageHasNoReviews(unittest.TestCase):
     '''
 
     def test(self):
-        request_response = scraper.scrape_app_page('http://store.steampowered.com/app/', 's')
+        request_response = scraper.scrape_app_page(fake_steam_server.base_url, 's')
         assert scraper.page_has_reviews(request_response) == False
 
 
@@ -72,7 +77,7 @@ class TestScraperGetAllReviews(unittest.TestCase):
     '''
 
     def test(self):
-        request_response = scraper.scrape_app_page('http://store.steampowered.com/app/', 500)
+        request_response = scraper.scrape_app_page(fake_steam_server.base_url, 500)
         reviews = scraper.get_reviews_on_page(request_response)
         assert len(reviews) > 0
 
@@ -116,12 +121,12 @@ class TestScraperReviewFormatting(unittest.TestCase):
     '''
 
     def test(self):
-        request_response = scraper.scrape_app_page('http://store.steampowered.com/app/', 500)
+        request_response = scraper.scrape_app_page(fake_steam_server.base_url, 500)
         reviews = scraper.get_reviews_on_page(request_response)
 
-        assert len(reviews[0]['user_recommendation']) > 0
-        assert len(reviews[0]['user_review_text']) > 0
-        assert len(reviews[0]['user_name']) > 0
+        assert len(reviews[0].user_recommendation) > 0
+        assert len(reviews[0].user_review_text) > 0
+        assert len(reviews[0].user_name) > 0
 
 
 if __name__ == '__main__':
@@ -0,0 +1,119 @@
+#! usr/bin/env python3
+
+import os
+import sys
+import shutil
+import unittest
+import sqlite3
+import atexit
+
+# Here we're moving the context into the parent folder
+parentPath = os.path.abspath("..")
+if parentPath not in sys.path:
+    sys.path.insert(0, parentPath)
+
+from application import database_manager
+from application import model_registry
+from application import streaming_trainer
+
+@atexit.register
+def goodbye():
+    for file_location in ['database_test.db', 'streaming_checkpoint_test.pkl']:
+        try:
+            os.remove(file_location)
+        except FileNotFoundError:
+            pass
+    shutil.rmtree('model_registry_test', ignore_errors=True)
+
+"""
+These tests are for the streaming_trainer module.
+"""
+
+class TestStreamReviewsInChunks(unittest.TestCase):
+    '''
+    Tests the db hands back every review once, in id order, in chunks no larger than asked for.
+    '''
+
+    def setUp(self):
+        db_location = 'database_test.db'
+        database_manager.create_steam_reviews(db_location)
+        for i in range(7):
+            database_manager.insert_data_steam_reviews(db_location, 'url_%s' %(i), 300000, '2011-01-01', 0, 'Recommended', 'It was great', 'Destroyer')
+
+    def tearDown(self):
+        db_location = 'database_test.db'
+        database_manager.drop_steam_reviews(db_location)
+
+    def test(self):
+        db_location = 'database_test.db'
+        chunks = list(database_manager.stream_steam_reviews(db_location, 3))
+        assert [len(chunk) for chunk in chunks] == [3, 3, 1]
+        assert [row[0] for chunk in chunks for row in chunk] == [1, 2, 3, 4, 5, 6, 7]
+
+        chunks = list(database_manager.stream_steam_reviews(db_location, 3, start_id=2, end_id=5))
+        assert [row[0] for chunk in chunks for row in chunk] == [3, 4, 5]
+
+
+class TestStreamingTrainer(unittest.TestCase):
+    '''
+    Tests the streaming trainer learns from chunks, saves a checkpoint and can continue from it,
+    only registers its models again when there were new reviews to train on, and starts over
+    once the reviews are dropped and the ids start again.
+    '''
+
+    def setUp(self):
+        db_location = 'database_test.db'
+        database_manager.create_steam_reviews(db_location)
+        for i in range(10):
+            database_manager.insert_data_steam_reviews(db_location, 'url_2', 300020, '2011-01-01', 0, 'Not Recommended', 'It was bad', 'Dismantler')
+            database_manager.insert_data_steam_reviews(db_location, 'url_9', 300040, '2011-01-01', 0, 'Recommended', 'It was great', 'GiveMeSugar')
+        database_manager.insert_data_steam_reviews(db_location, 'url_3', 300040, '2011-01-01', 0, 'Issue detecting recommendation', 'OMG', 'Makiavelli')
+
+    def tearDown(self):
+        db_location = 'database_test.db'
+        database_manager.drop_steam_reviews(db_location)
+        os.remove('streaming_checkpoint_test.pkl')
+        shutil.rmtree('model_registry_test', ignore_errors=True)
+
+    def test(self):
+        db_location = 'database_test.db'
+        checkpoint_location = 'streaming_checkpoint_test.pkl'
+        checkpoint = streaming_trainer.train_streaming(db_location, chunk_size=4, checkpoint_every=2,
+                                                       checkpoint_location=checkpoint_location, n_features=2 ** 10,
+                                                       registry_location=None)
+
+        assert checkpoint['reviews_trained'] == 20
+        assert checkpoint['last_id'] == 21
+        assert os.path.exists(checkpoint_location)
+
+        vectorizer = streaming_trainer.make_hashing_vectorizer(2 ** 10)
+        test_vectors = vectorizer.transform(['It was bad', 'It was great'])
+        for classifier in checkpoint['classifiers'].values():
+            assert list(classifier.predict(test_vectors)) == ['Not Recommended', 'Recommended']
+
+        database_manager.insert_data_steam_reviews(db_location, 'url_9', 300040, '2011-01-01', 0, 'Recommended', 'It was great', 'GiveMeSugar')
+        checkpoint = streaming_trainer.train_streaming(db_location, chunk_size=4, checkpoint_every=2,
+                                                       checkpoint_location=checkpoint_location, n_features=2 ** 10,
+                                                       registry_location=None)
+        assert checkpoint['reviews_trained'] == 21
+        assert checkpoint['last_id'] == 22
+
+        registry_location = 'model_registry_test'
+        database_manager.insert_data_steam_reviews(db_location, 'url_2', 300020, '2011-01-01', 0, 'Not Recommended', 'It was bad', 'Dismantler')
+        for _run in range(2):
+            streaming_trainer.train_streaming(db_location, chunk_size=4, checkpoint_location=checkpoint_location,
+                                              n_features=2 ** 10, registry_location=registry_location)
+        assert len(model_registry.list_models(registry_location)) == 3
+
+        database_manager.drop_steam_reviews(db_location)
+        database_manager.create_steam_reviews(db_location)
+        for i in range(3):
+            database_manager.insert_data_steam_reviews(db_location, 'url_4', 300050, '2011-01-01', 0, 'Recommended', 'So much fun', 'Newcomer')
+        checkpoint = streaming_trainer.train_streaming(db_location, chunk_size=4, checkpoint_location=checkpoint_location,
+                                                       n_features=2 ** 10, registry_location=None)
+        assert checkpoint['reviews_trained'] == 3
+        assert checkpoint['last_id'] == 3
+
+
+if __name__ == '__main__':
+    unittest.main()
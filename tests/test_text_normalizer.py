@@ -0,0 +1,96 @@
+#! usr/bin/env python3
+
+import os
+import sys
+import unittest
+import sqlite3
+import atexit
+
+# Here we're moving the context into the parent folder
+parentPath = os.path.abspath("..")
+if parentPath not in sys.path:
+    sys.path.insert(0, parentPath)
+
+from application import database_manager
+from application import text_normalizer
+
+from archive import data_prep
+
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+@atexit.register
+def goodbye():
+    try:
+        os.remove('database_test.db')
+    except FileNotFoundError:
+        pass
+
+"""
+These tests are for the text_normalizer module.
+"""
+
+class TestNormalizeReviewText(unittest.TestCase):
+    '''
+    Tests normalizing lowercases the text, drops the whitespace left by string_parser and
+    single characters, and gives the same features as a default vectorizer on the raw text.
+    '''
+
+    def test(self):
+        assert text_normalizer.normalize_review_text('  Loved it.   Would   PLAY again \n 10/10 ') == 'loved it would play again 10 10'
+
+        raw_documents = ['  Loved it.   Would   PLAY again \n 10/10 ', 'It was BAD, a waste of $20', 'When I get out of this padded cell']
+        normalized_documents = [text_normalizer.normalize_review_text(document) for document in raw_documents]
+
+        raw_vectorizer = TfidfVectorizer()
+        raw_vectors = raw_vectorizer.fit_transform(raw_documents)
+        normalized_vectorizer = TfidfVectorizer(**text_normalizer.PRETOKENIZED_VECTORIZER_PARAMS)
+        normalized_vectors = normalized_vectorizer.fit_transform(normalized_documents)
+
+        assert raw_vectorizer.vocabulary_ == normalized_vectorizer.vocabulary_
+        assert (raw_vectors != normalized_vectors).nnz == 0
+
+
+class TestNormalizeStoredReviews(unittest.TestCase):
+    '''
+    Tests the backfill normalizes every review once, new reviews are normalized incrementally,
+    and data_prep can hand the normalized reviews to the classifiers. Once steam_reviews is dropped,
+    the normalized texts go with it, rather than being handed out for new reviews with the same ids.
+    '''
+
+    def setUp(self):
+        db_location = 'database_test.db'
+        database_manager.create_steam_reviews(db_location)
+        database_manager.insert_data_steam_reviews(db_location, 'url_1', 300000, '2011-01-01', 0, 'Not Recommended', 'It was   BAD', 'Destroyer')
+        database_manager.insert_data_steam_reviews(db_location, 'url_2', 300000, '2011-01-01', 0, 'Recommended', 'It was GREAT', 'Dismantler')
+
+    def tearDown(self):
+        db_location = 'database_test.db'
+        database_manager.drop_steam_reviews(db_location)
+        with sqlite3.connect(db_location, timeout=20) as db:
+            db.cursor().execute('DROP TABLE steam_review_tokens;')
+
+    def test(self):
+        db_location = 'database_test.db'
+        assert text_normalizer.backfill_normalized_reviews(db_location) == 2
+        assert text_normalizer.backfill_normalized_reviews(db_location) == 0
+
+        database_manager.insert_data_steam_reviews(db_location, 'url_3', 300020, '2011-01-01', 0, 'Not Recommended', 'Awful!!', 'Makiavelli')
+        database_manager.insert_data_steam_reviews(db_location, 'url_4', 300020, '2011-01-01', 0, 'Recommended', 'Loved it', 'GiveMeSugar')
+        assert text_normalizer.normalize_new_reviews(db_location) == 2
+        assert text_normalizer.normalize_new_reviews(db_location) == 0
+
+        training_documents, testing_documents, training_classes, testing_classes = data_prep.prep_for_classifiers(db_location, 4, 2, normalized=True)
+        assert sorted(training_documents) == ['it was bad', 'it was great']
+        assert sorted(testing_documents) == ['awful', 'loved it']
+
+        database_manager.drop_steam_reviews(db_location)
+        database_manager.create_steam_reviews(db_location)
+        database_manager.insert_data_steam_reviews(db_location, 'url_5', 300040, '2011-01-01', 0, 'Not Recommended', 'So SLOW', 'Sluggish666')
+        database_manager.insert_data_steam_reviews(db_location, 'url_6', 300040, '2011-01-01', 0, 'Recommended', 'So FAST', 'Destroyer')
+        assert text_normalizer.normalize_new_reviews(db_location) == 2
+        training_documents, _testing_documents, _training_classes, _testing_classes = data_prep.prep_for_classifiers(db_location, 2, 0, normalized=True)
+        assert sorted(training_documents) == ['so fast', 'so slow']
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+#! usr/bin/env python3
+
+import os
+import sys
+import unittest
+import sqlite3
+import atexit
+
+# Here we're moving the context into the parent folder
+parentPath = os.path.abspath("..")
+if parentPath not in sys.path:
+    sys.path.insert(0, parentPath)
+
+from application import database_manager
+from application import text_normalizer
+from application import tfidf_statistics
+
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+@atexit.register
+def goodbye():
+    try:
+        os.remove('database_test.db')
+    except FileNotFoundError:
+        pass
+
+"""
+These tests are for the tfidf_statistics module.
+"""
+
+class TestIncrementalTfidfStatistics(unittest.TestCase):
+    '''
+    Tests statistics updated in two batches give the same vectors as a TfidfVectorizer
+    fitted on every review at once.
+    '''
+
+    def setUp(self):
+        db_location = 'database_test.db'
+        database_manager.create_steam_reviews(db_location)
+        database_manager.insert_data_steam_reviews(db_location, 'url_1', 300000, '2011-01-01', 0, 'Not Recommended', 'It was great', 'Destroyer')
+        database_manager.insert_data_steam_reviews(db_location, 'url_2', 300020, '2011-01-01', 0, 'Not Recommended', 'It was bad', 'Dismantler')
+        database_manager.insert_data_steam_reviews(db_location, 'url_3', 300025, '2011-01-01', 0, 'Not Recommended', 'OMG', 'Makiavelli')
+
+    def tearDown(self):
+        db_location = 'database_test.db'
+        database_manager.drop_steam_reviews(db_location)
+        with sqlite3.connect(db_location, timeout=20) as db:
+            cur = db.cursor()
+            cur.execute('DROP TABLE steam_review_tokens;')
+            cur.execute('DROP TABLE term_document_frequencies;')
+            cur.execute('DROP TABLE tfidf_statistics;')
+
+    def test(self):
+        db_location = 'database_test.db'
+        assert tfidf_statistics.update_tfidf_statistics(db_location) == 3
+
+        database_manager.insert_data_steam_reviews(db_location, 'url_4', 300040, '2011-01-01', 0, 'Recommended', 'I want to cry myself to sleep', 'GiveMeSugar')
+        database_manager.insert_data_steam_reviews(db_location, 'url_5', 300040, '2011-01-01', 0, 'Recommended', 'It was bad, when I get out of this padded cell I will bake a cake', 'Sluggish666')
+        assert tfidf_statistics.update_tfidf_statistics(db_location, chunk_size=1) == 2
+        assert tfidf_statistics.update_tfidf_statistics(db_location) == 0
+        assert database_manager.retrieve_tfidf_statistics(db_location) == (5, 5)
+
+        all_reviews = ['It was great', 'It was bad', 'OMG', 'I want to cry myself to sleep', 'It was bad, when I get out of this padded cell I will bake a cake']
+        fitted_vectorizer = TfidfVectorizer()
+        fitted_vectorizer.fit(all_reviews)
+
+        new_reviews = ['It was bad, I want a cake', 'great sleep']
+        loaded_vectorizer = tfidf_statistics.load_tfidf_vectorizer(db_location)
+        loaded_vectors = loaded_vectorizer.transform([text_normalizer.normalize_review_text(review) for review in new_reviews])
+        fitted_vectors = fitted_vectorizer.transform(new_reviews)
+
+        assert loaded_vectorizer.vocabulary_ == fitted_vectorizer.vocabulary_
+        assert abs(loaded_vectors - fitted_vectors).max() < 1e-12
+
+
+class TestStatisticsAfterDrop(unittest.TestCase):
+    '''
+    Tests the statistics start again when steam_reviews is dropped, rather than keeping counts
+    from reviews that are gone.
+    '''
+
+    def tearDown(self):
+        db_location = 'database_test.db'
+        database_manager.drop_steam_reviews(db_location)
+        with sqlite3.connect(db_location, timeout=20) as db:
+            cur = db.cursor()
+            cur.execute('DROP TABLE steam_review_tokens;')
+            cur.execute('DROP TABLE term_document_frequencies;')
+            cur.execute('DROP TABLE tfidf_statistics;')
+
+    def test(self):
+        db_location = 'database_test.db'
+        database_manager.create_steam_reviews(db_location)
+        database_manager.insert_data_steam_reviews(db_location, 'url_1', 300000, '2011-01-01', 0, 'Recommended', 'Ghost town', 'Destroyer')
+        database_manager.insert_data_steam_reviews(db_location, 'url_2', 300005, '2011-01-01', 0, 'Recommended', 'Ghost ship', 'Dismantler')
+        assert tfidf_statistics.update_tfidf_statistics(db_location) == 2
+
+        database_manager.drop_steam_reviews(db_location)
+        database_manager.create_steam_reviews(db_location)
+        database_manager.insert_data_steam_reviews(db_location, 'url_3', 300010, '2011-01-01', 0, 'Recommended', 'Great game', 'Makiavelli')
+        assert tfidf_statistics.update_tfidf_statistics(db_location) == 1
+        assert database_manager.retrieve_tfidf_statistics(db_location) == (1, 1)
+
+        loaded_vectorizer = tfidf_statistics.load_tfidf_vectorizer(db_location)
+        assert sorted(loaded_vectorizer.vocabulary_) == ['game', 'great']
+
+
+if __name__ == '__main__':
+    unittest.main()